@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from django.contrib.auth import get_user_model
 
@@ -69,4 +70,35 @@ class Page(models.Model):
     wpm = models.FilePathField(path="Records", allow_files=True, match=".*\.json$", recursive=True, null=True)
 
     def __str__(self):
-        return f"{self.page_type} for {self.business.name if self.business else 'Unknown Business'}"
\ No newline at end of file
+        return f"{self.page_type} for {self.business.name if self.business else 'Unknown Business'}"
+
+class PageBuildJob(models.Model):
+    """Progress of the background job that builds a page's HTML, CSS and screenshot."""
+    STATUS_CHOICES = [
+        ("pending", "pending"),
+        ("running", "running"),
+        ("done", "done"),
+        ("failed", "failed"),
+    ]
+    ARTIFACTS = ("html", "css", "screenshot")
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    page = models.ForeignKey("Page", on_delete=models.CASCADE, related_name="build_jobs")
+    html_status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    css_status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    screenshot_status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    html_error = models.TextField(null=True, blank=True)
+    css_error = models.TextField(null=True, blank=True)
+    screenshot_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def status(self):
+        states = {getattr(self, f"{name}_status") for name in self.ARTIFACTS}
+        if states & {"pending", "running"}:
+            return "running" if states != {"pending"} else "pending"
+        return "failed" if "failed" in states else "done"
+
+    def __str__(self):
+        return f"Build job {self.id} for page {self.page_id}"
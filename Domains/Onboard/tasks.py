@@ -0,0 +1,75 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from celery import shared_task
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from Domains.Onboard.models import Page, PageBuildJob
+from Domains.Toolkit.page_cache import fetch_page
+from Domains.Toolkit.parsers import make_soup
+from Domains.Toolkit.services import build_css_artifact, save_raw_html_artifact, save_screenshot
+
+log = logging.getLogger(__name__)
+
+
+def _set_status(job_id, artifact, state, error=None):
+    PageBuildJob.objects.filter(id=job_id).update(**{
+        f"{artifact}_status": state,
+        f"{artifact}_error": error,
+        "updated_at": timezone.now(),
+    })
+
+
+def _run_step(job_id, artifact, step, *args):
+    # Each thread loads its own Page and closes its own DB connection.
+    close_old_connections()
+    try:
+        _set_status(job_id, artifact, "running")
+        page = Page.objects.select_related("business").get(build_jobs__id=job_id)
+        step(page, *args)
+        _set_status(job_id, artifact, "done")
+    except Exception as e:
+        log.exception(f"build job {job_id} | {artifact} failed")
+        _set_status(job_id, artifact, "failed", str(e))
+    finally:
+        connection.close()
+
+
+def _html_and_css(job_id):
+    """Downloads the page once, then writes the HTML and CSS artifacts side by side."""
+    close_old_connections()
+    try:
+        _set_status(job_id, "html", "running")
+        _set_status(job_id, "css", "running")
+        page = PageBuildJob.objects.select_related("page").get(id=job_id).page
+        snapshot = fetch_page(page.url)
+        if snapshot.status_code != 200:
+            raise ValueError(f"Failed to fetch HTML content (status {snapshot.status_code})")
+        soup = make_soup(snapshot.content)
+    except Exception as e:
+        log.exception(f"build job {job_id} | page fetch failed")
+        _set_status(job_id, "html", "failed", str(e))
+        _set_status(job_id, "css", "failed", str(e))
+        return
+    finally:
+        connection.close()
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        pool.submit(_run_step, job_id, "html", save_raw_html_artifact, snapshot, soup)
+        pool.submit(_run_step, job_id, "css", build_css_artifact, snapshot, soup)
+
+
+@shared_task
+def build_page_artifacts(job_id):
+    """
+    Builds the HTML, CSS and screenshot artifacts of a freshly onboarded
+    page in parallel, recording per-artifact progress on the PageBuildJob.
+    The screenshot does not need the page download, so it starts at once.
+    """
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        pool.submit(_run_step, job_id, "screenshot", save_screenshot)
+        pool.submit(_html_and_css, job_id)
+    job = PageBuildJob.objects.get(id=job_id)
+    log.info(f"build job {job_id} | page {job.page_id} | {job.status}")
+    return job.status
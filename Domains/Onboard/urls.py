@@ -1,10 +1,11 @@
 from django.urls import path
-from .views import UserOnboardingAPIView, BusinessOnboardingAPIView, PageOnboardingAPIView, ScreenshotUploadAPIView, PageDeleteAPIView
+from .views import UserOnboardingAPIView, BusinessOnboardingAPIView, PageOnboardingAPIView, PageBuildStatusAPIView, ScreenshotUploadAPIView, PageDeleteAPIView
 
 urlpatterns = [
     path('user-onboard/', UserOnboardingAPIView.as_view(), name='user-onboard'),
     path('business-onboard/', BusinessOnboardingAPIView.as_view(), name='business-onboard'),
     path('page-onboard/', PageOnboardingAPIView.as_view(), name='page-onboard'),
+    path('page-onboard/<uuid:job_id>/status/', PageBuildStatusAPIView.as_view(), name='page-onboard-status'),
     path("upload-screenshot/", ScreenshotUploadAPIView.as_view(), name="upload-screenshot"),
     path('pages/<int:page_id>/<str:page_type>/',  PageDeleteAPIView.as_view(),   name='page-delete'),
 ]
\ No newline at end of file
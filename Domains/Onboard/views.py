@@ -1,19 +1,20 @@
 import jwt
 import os
-import json
+import logging
 from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from .models import Business, Page, RoleModel
-import requests
+from .models import Business, Page, PageBuildJob, RoleModel
+from .tasks import build_page_artifacts
 from rest_framework.parsers import MultiPartParser
 from django.core.validators import URLValidator
 from django.core.exceptions import ValidationError
-from bs4 import BeautifulSoup
+from django.urls import reverse
 
 User = get_user_model()
+log = logging.getLogger(__name__)
 
 def get_user_from_token(token):
     try:
@@ -143,31 +144,6 @@ class PageOnboardingAPIView(APIView):
                 "screenshot_path": None
             }, status=status.HTTP_200_OK)
 
-        try:
-            resp = requests.head(url, timeout=5, allow_redirects=True)
-            if resp.status_code >= 400:
-                return Response({
-                    "id": None,
-                    "page_type": page_type,
-                    "url": None,
-                    "business": business.id,
-                    "user_id": user.id,
-                    "html_path": None,
-                    "css_path": None,
-                    "screenshot_path": None
-                }, status=status.HTTP_200_OK)
-        except requests.RequestException:
-            return Response({
-                "id": None,
-                "page_type": page_type,
-                "url": None,
-                "business": business.id,
-                "user_id": user.id,
-                "html_path": None,
-                "css_path": None,
-                "screenshot_path": None
-            }, status=status.HTTP_200_OK)
-
         page = Page.objects.create(
             page_type=page_type,
             url=url,
@@ -175,82 +151,62 @@ class PageOnboardingAPIView(APIView):
             user=user
         )
 
-        # Fetch HTML content directly
-        try:
-            response = requests.get(page.url)
-            if response.status_code != 200:
-                return Response({"error": "Failed to fetch HTML content"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            html_content = response.text
-            if not html_content:
-                return Response({"error": "No HTML content found"}, status=status.HTTP_404_NOT_FOUND)
-
-            # Save HTML content to file
-            html_dir = os.path.join(settings.BASE_DIR, 'Records', 'html_data', str(business.id))
-            os.makedirs(html_dir, exist_ok=True)
-            html_path = os.path.join(html_dir, f'{page.id}.json')
-            
-            # Create an HTML structure similar to what PageHTMLAPIView creates
-            soup = BeautifulSoup(html_content, "html.parser")
-            
-            html_extract = {
-                "url": page.url,
-                "title": soup.title.string.strip() if soup.title and soup.title.string else None,
-                "raw_html": html_content,
-            }
-            
-            with open(html_path, 'w', encoding='utf-8') as f:
-                json.dump(html_extract, f, ensure_ascii=False, indent=2)
-            
-            # Store the relative path
-            page.html = os.path.relpath(html_path, settings.BASE_DIR)
-            page.save()
-
-            css_resp = requests.get(f"http://proto-api-kg9r.onrender.com/toolkit/business-css/?page_id={page.id}")
-            if css_resp.ok:
-                css_data = css_resp.json()
-                css_dir = os.path.join(settings.BASE_DIR, 'Records', 'CSS', str(business.id), str(page.id))
-                os.makedirs(css_dir, exist_ok=True)
-                css_path = os.path.join(css_dir, 'business_css.json')
-                with open(css_path, 'w', encoding='utf-8') as f:
-                    json.dump(css_data, f, ensure_ascii=False, indent=2)
-                page.css = os.path.relpath(css_path, settings.BASE_DIR)
-
+        # HTML, CSS and screenshot are built by a worker; the client polls
+        # the job. Without a broker the job runs inside the request.
+        job = PageBuildJob.objects.create(page=page)
+        queued = False
+        if settings.ONBOARDING_ASYNC:
             try:
-                ss_api_resp = requests.get(
-                    f"http://proto-api-kg9r.onrender.com/toolkit/take-screenshot/?page_id={page.id}",
-                    timeout=120
-                )
-                if ss_api_resp.ok:
-                    data = ss_api_resp.json()
-                    shot_url = data.get("screenshot_url")
-                    if shot_url:
-                        down = requests.get(shot_url, timeout=120)
-                        if down.ok:
-                            ss_dir = os.path.join(settings.BASE_DIR, 'Records', 'SS', str(business.id))
-                            os.makedirs(ss_dir, exist_ok=True)
-                            ss_path = os.path.join(ss_dir, f'screenshot_{page.id}.png')
-                            with open(ss_path, 'wb') as f:
-                                f.write(down.content)
-                            page.screenshot = os.path.relpath(ss_path, settings.BASE_DIR)
-            except (requests.RequestException, ValueError):
-                pass
-
-            page.save()
+                build_page_artifacts.delay(str(job.id))
+                queued = True
+            except Exception:
+                log.exception(f"page {page.id} | could not queue build job, running inline")
+        if not queued:
+            build_page_artifacts(str(job.id))
+            job.refresh_from_db()
+            page.refresh_from_db()
 
-            return Response({
-                "id": page.id,
-                "page_type": page.page_type,
-                "url": page.url,
-                "business": business.id,
-                "user_id": user.id,
-                "html_path": page.html,
-                "css_path": page.css,
-                "screenshot_path": page.screenshot
-            }, status=status.HTTP_201_CREATED)
+        return Response({
+            "id": page.id,
+            "page_type": page.page_type,
+            "url": page.url,
+            "business": business.id,
+            "user_id": user.id,
+            "html_path": page.html,
+            "css_path": page.css,
+            "screenshot_path": page.screenshot,
+            "job_id": str(job.id),
+            "status": job.status,
+            "status_url": reverse("page-onboard-status", args=[job.id]),
+        }, status=status.HTTP_202_ACCEPTED if queued else status.HTTP_201_CREATED)
+
+
+class PageBuildStatusAPIView(APIView):
+    """GET /onboard/page-onboard/<job_id>/status/"""
+
+    def get(self, request, job_id):
+        try:
+            job = PageBuildJob.objects.select_related("page").get(id=job_id)
+        except PageBuildJob.DoesNotExist:
+            return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        except requests.RequestException as e:
-            return Response({"error": f"Failed to fetch HTML: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        page = job.page
+        paths = {"html": page.html, "css": page.css, "screenshot": page.screenshot}
+        return Response({
+            "job_id": str(job.id),
+            "page_id": page.id,
+            "status": job.status,
+            "artifacts": {
+                name: {
+                    "status": getattr(job, f"{name}_status"),
+                    "path": paths[name] if getattr(job, f"{name}_status") == "done" else None,
+                    "error": getattr(job, f"{name}_error"),
+                }
+                for name in PageBuildJob.ARTIFACTS
+            },
+            "created_at": job.created_at,
+            "updated_at": job.updated_at,
+        }, status=status.HTTP_200_OK)
 
 
 class ScreenshotUploadAPIView(APIView):
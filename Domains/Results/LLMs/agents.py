@@ -1,50 +1,318 @@
 # agents.py
-import os, json, csv
-from dotenv import load_dotenv
-from openai import OpenAI
+import json, csv
+from django.conf import settings
 import Domains.Results.LLMs.prompts as prompts 
 import re 
 import Domains.Results.LLMs.criteria as criteria
-import logging, time, json
+import functools, logging, time, json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from openai import RateLimitError
+from Domains.Results.LLMs.gateway import asend, route, send
+from Domains.Results.LLMs.payloads import build_payload
+from Domains.Results.LLMs.response_cache import get_cache, request_key
+from Domains.Results.LLMs import usage
+from Domains.Results.LLMs.schemas import (
+    UBA_FORMULATION_SCHEMA, WEB_SEARCH_SCHEMA, response_format, structured, ui_evaluation_schema, ui_repair_schema,
+)
+from Domains.Toolkit.executors import get_executor
 
 log = logging.getLogger("ux_eval")
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-temp, max_tok = 0.1, 500
+# (calls, use_cache) of the innermost record_calls() block; a ContextVar so
+# concurrent requests on one event loop do not see each other's calls
+_calls = ContextVar("llm_calls", default=(None, True))
+_MISS = object()     # _cached_result() of an entry that no longer parses
 
+
+@contextmanager
+def record_calls(use_cache=True):
+    """
+    Collects {agent, provider, model, fallback, cached, seconds, prompt_tokens,
+    completion_tokens, structured, parse_failed, retry}
+    for every completion made inside the block (by this thread, or by the
+    coroutines it awaits). use_cache=False sends the requests even when the
+    cache has an answer.
+    """
+    calls = []
+    token = _calls.set((calls, use_cache))
+    try:
+        yield calls
+    finally:
+        _calls.reset(token)
+
+
+def _record(**call):
+    usage.record(**call)
+    calls, _ = _calls.get()
+    if calls is not None:
+        calls.append(call)
+
+
+@dataclass
+class Completion:
+    """The chat completion an agent asks for; run by _complete / _acomplete."""
+    agent: str
+    model: str                  # the agent's primary model (gateway.MODEL_REGISTRY)
+    request: dict = field(default_factory=dict)
+    parse: object = None        # content -> result; raising keeps the answer out of the cache
+    cache: bool = True
+    lane: str = "default"       # scheduler priority: "interactive", "default" or "batch"
+    repair: object = None       # parse error -> Completion whose result (as JSON, parse() must accept it)
+                                # replaces the answer, or None to re-ask
+
+
+def _completion(agent, parse=None, cache=True, lane="default", repair=None, **request):
+    """Completion of `request` with the agent's registered model and parameters."""
+    primary = route(agent).primary
+    return Completion(agent, primary.model, {**primary.params, **request}, parse, cache, lane, repair)
+
+
+def _output_format(agent, name, schema):
+    """Request arguments constraining the answer to `schema`, when the agent is in LLM_STRUCTURED_OUTPUTS."""
+    return {"response_format": response_format(name, schema)} if structured(agent) else {}
+
+
+def _cache_lookup(call):
+    """(cache, key, cached content) for a Completion; (None, None, None) when it bypasses the cache."""
+    if not call.cache:
+        return None, None, None
+    cache = get_cache()
+    key = request_key(call.model, prompts.PROMPT_VERSIONS[call.agent], call.request)
+    _, use_cache = _calls.get()
+    return cache, key, cache.get(call.agent, key) if use_cache else None
+
+
+class UnparseableAnswer(ValueError):
+    """An answer its agent's parse() rejected, even after LLM_PARSE_RETRIES re-asks."""
+    def __init__(self, error, content):
+        super().__init__(str(error))
+        self.error = error
+        self.content = content
+
+
+def _retry_request(call, error):
+    """The request again, with the rejected answer and why, so the model can correct it."""
+    messages = [*call.request["messages"],
+                {"role": "assistant", "content": error.content},
+                {"role": "user", "content": f"That answer could not be used: {error}. "
+                                            "Answer again, following the required JSON format exactly."}]
+    return {**call.request, "messages": messages}
+
+
+def _finish(call, cache, key, reply, latency, retry=False):
+    content = reply.response.choices[0].message.content
+    tokens = reply.response.usage
+    log.info(f"{call.agent} | ok | {reply.provider}:{reply.model} | {latency:.2f}s | "
+             f"prompt={getattr(tokens, 'prompt_tokens', None)} → completion={getattr(tokens, 'completion_tokens', None)}")
+    error = None
+    try:
+        result = call.parse(content) if call.parse else content
+    except Exception as e:
+        error = UnparseableAnswer(e, content)
+        log.warning(f"{call.agent} | unparseable answer{' after retry' if retry else ''} | {e}")
+    _record(agent=call.agent, provider=reply.provider, model=reply.model, fallback=reply.fallback, cached=False,
+            seconds=latency, prompt_tokens=getattr(tokens, "prompt_tokens", 0),
+            completion_tokens=getattr(tokens, "completion_tokens", 0),
+            structured=structured(call.agent), parse_failed=error is not None, retry=retry)
+    if error is not None:
+        raise error
+
+    # a fallback's answer is not kept under the primary model's key: the next call asks the primary again
+    if cache is not None and not reply.fallback:
+        cache.set(key, content)
+    return result
+
+
+def _cached_result(call, cache, key, cached):
+    """The parsed cached answer, or _MISS when it no longer parses (it is then dropped from the cache)."""
+    try:
+        result = call.parse(cached) if call.parse else cached
+    except Exception as e:
+        log.warning(f"{call.agent} | cached answer does not parse, dropped | {e}")
+        cache.discard(call.agent, key)
+        return _MISS
+    log.info(f"{call.agent} | cache hit")
+    _record(agent=call.agent, provider=None, model=call.model, fallback=False, cached=True, seconds=0.0,
+            prompt_tokens=0, completion_tokens=0, structured=structured(call.agent), parse_failed=False, retry=False)
+    return result
+
+
+def _repair(call, error):
+    """The Completion repairing an answer that failed with `error`, when the agent has one for it."""
+    repair = call.repair(error.error) if call.repair else None
+    if repair is not None:
+        log.info(f"{call.agent} | repairing the answer with {repair.agent}")
+    return repair
+
+
+def _store_repaired(cache, key, reply, result):
+    # kept under the original request's key, so the same inputs are not evaluated and repaired again
+    if cache is not None and not reply.fallback:
+        cache.set(key, json.dumps(result, ensure_ascii=False))
+    return result
+
+
+def _complete(call):
+    """
+    Runs a Completion through the response cache and the gateway (its
+    primary model, or the fallback when the primary is down or slow).
+    Returns the message content, or call.parse(content) when given. An
+    answer that fails to parse is not cached; when call.repair has a
+    Completion for the error, that one's result is returned and cached
+    instead, otherwise the model is asked again, with the parse error, up to
+    LLM_PARSE_RETRIES times before UnparseableAnswer is raised.
+    """
+    cache, key, cached = _cache_lookup(call)
+    if cached is not None and (result := _cached_result(call, cache, key, cached)) is not _MISS:
+        return result
+
+    request, retries = call.request, getattr(settings, "LLM_PARSE_RETRIES", 1)
+    for attempt in range(retries + 1):
+        t0 = time.time()
+        try:
+            reply = send(call.agent, request, call.lane)
+        except RateLimitError as e:
+            log.error(f"{call.agent} | rate-limit: {e}")
+            raise
+        try:
+            return _finish(call, cache, key, reply, time.time() - t0, retry=attempt > 0)
+        except UnparseableAnswer as e:
+            repair = _repair(call, e)
+            if repair is not None:
+                return _store_repaired(cache, key, reply, _complete(repair))
+            if attempt == retries:
+                raise
+            request = _retry_request(call, e)
+
+
+async def _acomplete(call):
+    """_complete() on the async client: the request is awaited on the event loop instead of holding a thread."""
+    cache, key, cached = await get_executor("llm").run(_cache_lookup, call)
+    if cached is not None and (result := _cached_result(call, cache, key, cached)) is not _MISS:
+        return result
+
+    request, retries = call.request, getattr(settings, "LLM_PARSE_RETRIES", 1)
+    for attempt in range(retries + 1):
+        t0 = time.time()
+        try:
+            reply = await asend(call.agent, request, call.lane)
+        except RateLimitError as e:
+            log.error(f"{call.agent} | rate-limit: {e}")
+            raise
+        try:
+            return await get_executor("llm").run(_finish, call, cache, key, reply, time.time() - t0, attempt > 0)
+        except UnparseableAnswer as e:
+            repair = _repair(call, e)
+            if repair is not None:
+                return await get_executor("llm").run(_store_repaired, cache, key, reply, await _acomplete(repair))
+            if attempt == retries:
+                raise
+            request = _retry_request(call, e)
+
+
+def llm_agent(build):
+    """
+    Turns `build(*args)`, which returns the agent's Completion, into the
+    agent: calling it runs the completion on the sync clients and returns
+    its result; `agent.aio(*args)` does the same on the async clients. The
+    request is built in the "parse" pool there, since building it can mean
+    parsing HTML or re-encoding screenshots.
+    """
+    @functools.wraps(build)
+    def agent(*args, **kwargs):
+        return _complete(build(*args, **kwargs))
+
+    async def aio(*args, **kwargs):
+        return await _acomplete(await get_executor("parse").run(build, *args, **kwargs))
+
+    agent.aio = aio
+    return agent
+
+def _image_parts(image, agent):
+    """
+    Message parts for a screenshot: a base64 PNG string is sent as is; a
+    Screenshot (Domains/Toolkit/screenshots.py) sends the variants that fit
+    the agent's LLM_IMAGE_TOKEN_BUDGET.
+    """
+    if isinstance(image, str):
+        return [{"type":"image_url","image_url":{"url":f"data:image/png;base64,{image}"}}]
+    budgets = getattr(settings, "LLM_IMAGE_TOKEN_BUDGET", {})
+    variants = image.pick(budgets.get(agent, budgets.get("default", 1600)))
+    log.info(f"{agent} | screenshot {', '.join(v.name for v in variants)} | ~{sum(v.tokens for v in variants)} tokens")
+    parts = []
+    if len(variants) > 1 and not variants[0].label:
+        parts.append({"type":"text","text":f"The screenshot follows as {len(variants)} vertical slices, top to bottom."})
+    for variant in variants:
+        if variant.label:
+            parts.append({"type":"text","text":f"Screenshot region: {variant.label}"})
+        parts.append({"type":"image_url","image_url":{"url":f"data:{variant.mime};base64,{image.b64(variant)}"}})
+    return parts
+
+@llm_agent
 def describe_structure(image_b64, html_json, css_json):
+    """`html_json`/`css_json` are the stored extracts; build_payload() fits them to the token budget."""
+    html_text, css_text, tokens = build_payload(html_json, css_json)
+    log.info(f"describe_structure | payload {tokens} tokens")
     content = [
         {"type":"text","text":prompts.ui_structure_prompt},
-        {"type":"image_url","image_url":{"url":f"data:image/png;base64,{image_b64}"}},
-        {"type":"text","text":json.dumps(html_json)},
-        {"type":"text","text":json.dumps(css_json)},
+        *_image_parts(image_b64, "describe_structure"),
+        {"type":"text","text":html_text},
+        {"type":"text","text":css_text},
     ]
     msgs = [
         {"role":"system","content":prompts.ui_structure_system_message},
         {"role":"user","content":content},
     ]
-    resp = client.chat.completions.create(
-        model="gpt-4.1-mini-2025-04-14", messages=msgs, temperature=temp, max_tokens=max_tok
-    )
-    return resp.choices[0].message.content
+    return _completion("describe_structure", messages=msgs)
 
+@llm_agent
 def describe_styling(image_b64, html_json, css_json):
+    """`html_json`/`css_json` are the stored extracts; build_payload() fits them to the token budget."""
+    html_text, css_text, tokens = build_payload(html_json, css_json)
+    log.info(f"describe_styling | payload {tokens} tokens")
     content = [
         {"type":"text","text":prompts.ui_styling_prompt},
-        {"type":"image_url","image_url":{"url":f"data:image/png;base64,{image_b64}"}},
-        {"type":"text","text":json.dumps(html_json)},
-        {"type":"text","text":json.dumps(css_json)},
+        *_image_parts(image_b64, "describe_styling"),
+        {"type":"text","text":html_text},
+        {"type":"text","text":css_text},
     ]
     msgs = [
         {"role":"system","content":prompts.ui_styling_system_message},
         {"role":"user","content":content},
     ]
-    resp = client.chat.completions.create(
-        model="gpt-4.1-mini", messages=msgs, temperature=temp, max_tokens=max_tok
-    )
-    return resp.choices[0].message.content
+    return _completion("describe_styling", messages=msgs)
+
+
+@llm_agent
+def describe_page(image_b64, html_json, css_json):
+    """
+    describe_structure and describe_styling in one call: the screenshot and
+    the extracts are sent once. Returns {"structure_report", "styling_report"}
+    as the two separate calls would (each report as JSON text).
+    """
+    html_text, css_text, tokens = build_payload(html_json, css_json)
+    log.info(f"describe_page | payload {tokens} tokens")
+    content = [
+        {"type":"text","text":prompts.ui_describer_prompt},
+        *_image_parts(image_b64, "describe_page"),
+        {"type":"text","text":html_text},
+        {"type":"text","text":css_text},
+    ]
+    msgs = [
+        {"role":"system","content":prompts.ui_describer_system_message},
+        {"role":"user","content":content},
+    ]
+
+    def parse(raw):
+        reports = json.loads(raw)
+        missing = {"structure_report", "styling_report"} - set(reports)
+        if missing:
+            raise ValueError(f"Combined description is missing {sorted(missing)}")
+        return {key: json.dumps(reports[key], ensure_ascii=False) for key in ("structure_report", "styling_report")}
+
+    return _completion("describe_page", parse=parse, messages=msgs, response_format={"type": "json_object"})
 
 
 # def evaluate_ui(
@@ -74,6 +342,7 @@ def describe_styling(image_b64, html_json, css_json):
 #     )
 #     return resp.choices[0].message.content
 
+@llm_agent
 def formulate_ui(evaluation_json: dict) -> str:
     content = [
         {"type": "text", "text": prompts.ui_formulator_prompt},
@@ -83,12 +352,18 @@ def formulate_ui(evaluation_json: dict) -> str:
         {"role": "system", "content": prompts.ui_formulator_system_message},
         {"role": "user",   "content": content},
     ]
-    resp = client.chat.completions.create(
-        model="gpt-4.1-mini", messages=msgs, temperature=temp, max_tokens=max_tok
-    )
-    return resp.choices[0].message.content
+    return _completion("formulate_ui", messages=msgs)
+
+
+def _json_or_text(content):
+    # If it’s JSON, parse it; otherwise leave as string
+    try:
+        return json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        return content
 
 
+@llm_agent
 def evaluate_uba(uba_path):
     # 1. Load the UBA file
     if uba_path.lower().endswith(".csv"):
@@ -108,43 +383,35 @@ def evaluate_uba(uba_path):
         {"role": "user", "content": content},
     ]
 
-    # 3. Call the model
-    resp = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=messages,
-    )
-
-    # 4. Extract the raw string (not the method!)
-    report_str = resp.choices[0].message.content
+    # 3. Call the model (or reuse the cached answer); JSON answers are parsed
+    return _completion("evaluate_uba", parse=_json_or_text, lane="batch", messages=messages)
 
-    # 5. If it’s JSON, parse it; otherwise leave as string
-    try:
-        report = json.loads(report_str)
-    except (json.JSONDecodeError, TypeError):
-        report = report_str
 
-    return report
+def _resources(content):
+    # the assistant content is already JSON matching your schema
+    return json.loads(content).get("resources", [])
 
 
+@llm_agent
 def web_search_agent(problem: str) -> list[dict]:
     """
     Takes a single UBA 'problem' string and returns
     a list of {source, summary} dicts using OpenAI’s
     search-preview model for live web results.
     """
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini-search-preview",   # built-in web-search model
+    return _completion(
+        "web_search_agent",             # a built-in web-search model
+        parse=_resources,
+        lane="batch",
         messages=[
             {"role": "system",  "content": prompts.web_search_system_message},
             {"role": "user",    "content": problem}
-        ]
-        # Note: no response_format parameter here
+        ],
+        # the search models take no json_object response_format, only a JSON schema
+        **_output_format("web_search_agent", "web_search_resources", WEB_SEARCH_SCHEMA),
     )
 
-    # The assistant content is already JSON matching your schema
-    payload = json.loads(resp.choices[0].message.content)
-    return payload.get("resources", [])
-
+@llm_agent
 def evaluate_web_metrics(raw_metrics: dict) -> str:
     """
     1. Parse input metrics (strings like "1.2 s", "390 ms", etc.)
@@ -180,7 +447,6 @@ def evaluate_web_metrics(raw_metrics: dict) -> str:
         }
     }
 
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
     messages = [
         {"role": "system", "content": prompts.web_metrics_evaluator_system_message},
         {"role": "user",   "content": [
@@ -188,13 +454,7 @@ def evaluate_web_metrics(raw_metrics: dict) -> str:
             {"type": "text", "text": json.dumps({"web_metrics": cleaned})}
         ]}
     ]
-    resp = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=messages,
-        temperature=0.2,
-        max_tokens=700
-    )
-    return resp.choices[0].message.content
+    return _completion("evaluate_web_metrics", messages=messages)
     
     # Convert Markdown links to HTML links to make them clickable in the response
     output_text = resp.output_text
@@ -204,6 +464,7 @@ def evaluate_web_metrics(raw_metrics: dict) -> str:
     return output_text
 
 
+@llm_agent
 def uba_formulator(raw_report):
     """
     Transform a UBA report into plain‐language summaries as JSON.
@@ -214,54 +475,30 @@ def uba_formulator(raw_report):
         {"role": "user",    "content": prompts.uba_formulator_prompt + report_str},
     ]
 
-    resp = client.chat.completions.create(
-        model="o3-mini-2025-01-31",
-        messages=messages,
-    )
-    content = resp.choices[0].message.content.strip()
-    try:
-        return json.loads(content)   # <-- parse JSON here
-    except json.JSONDecodeError:
-        raise ValueError(f"LLM didn’t return valid JSON:\n{content}")
+    return _completion("uba_formulator", parse=_parse_formulation, lane="batch", messages=messages,
+                       **_output_format("uba_formulator", "uba_formulation", UBA_FORMULATION_SCHEMA))
 
-def evaluate_ui(ui_report, screenshot_b64, business_type, page_type):
-    system_msg = prompts.build_ui_evaluator_system_message(page_type)
 
-    content = [
-        {"type": "text", "text": prompts.ui_evaluator_prompt},
-        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{screenshot_b64}"}},
-        {"type": "text", "text": json.dumps(ui_report)},
-        {"type": "text", "text": f"Business type: {business_type}"},
-        {"type": "text", "text": f"Page type: {page_type}"},
-    ]
-
-    t0 = time.time()
+def _parse_formulation(content):
+    content = content.strip()
     try:
-        resp = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=[{"role": "system", "content": system_msg},
-                      {"role": "assistant", "content": json.dumps({
-                          k: v["summary"]
-                          for k, v in criteria.CRITERIA_BY_PAGE_TYPE[page_type].items()
-                      })},
-                      {"role": "user", "content": content}],
-            temperature=temp,
-            max_tokens=max_tok,
-        )
-    except RateLimitError as e:
-        log.error(f"{page_type} | rate-limit: {e}")
-        raise
+        formulation = json.loads(content)   # <-- parse JSON here
+    except json.JSONDecodeError:
+        raise ValueError(f"LLM didn’t return valid JSON:\n{content}")
+    if not isinstance(formulation, dict):
+        raise ValueError(f"LLM didn’t return a JSON object:\n{content}")
+    # structured answers list the observations; they are stored as {"observation n": summary}
+    if list(formulation) == ["observations"] and isinstance(formulation["observations"], list):
+        return {f"observation {n}": text for n, text in enumerate(formulation["observations"], start=1)}
+    return formulation
 
-    latency = time.time() - t0
-    usage   = resp.usage  # if the SDK exposes token counts
-    log.info(f"{page_type} | ok | {latency:.2f}s | prompt={usage.prompt_tokens} "
-             f"→ completion={usage.completion_tokens}")
+def _expected_categories(page_type):
+    """Category names of an evaluation of `page_type`: the global ones, then the page type's."""
+    return [*criteria.CRITERIA_BY_PAGE_TYPE["global"], *criteria.CRITERIA_BY_PAGE_TYPE[page_type]]
 
-    raw = resp.choices[0].message.content
-    result = json.loads(raw)
 
-    GLOBAL_KEYS = criteria.CRITERIA_BY_PAGE_TYPE["global"].keys()
-    expected = set(GLOBAL_KEYS) | set(criteria.CRITERIA_BY_PAGE_TYPE[page_type].keys())
+def _validate_evaluation(result, page_type):
+    expected = set(_expected_categories(page_type))
     found    = {c["name"] for c in result.get("categories", [])}
     if expected != found:
         missing = expected - found
@@ -270,9 +507,104 @@ def evaluate_ui(ui_report, screenshot_b64, business_type, page_type):
         raise ValueError(
             f"Model returned wrong categories. missing={list(missing)}, extra={list(extra)}"
         )
-
     return result
 
+
+class MissingCategories(ValueError):
+    """An evaluation whose categories are valid but incomplete; repair_ui_evaluation scores the rest."""
+    def __init__(self, evaluation, missing):
+        super().__init__(f"Model returned wrong categories. missing={missing}, extra=[]")
+        self.evaluation = evaluation
+        self.missing = missing
+
+
+def _repair_evaluation(ui_report, screenshot_b64, business_type, page_type, error):
+    """
+    The Completion scoring only the categories a MissingCategories
+    evaluation lacks, merged into it. It is sent the UI report instead of
+    the screenshot, which goes only when there is no report; None for any
+    other parse error, so the evaluation is asked for again.
+    """
+    if not isinstance(error, MissingCategories):
+        return None
+    partial, missing = error.evaluation, error.missing
+    scored = {c["name"]: c["score"] for c in partial["categories"]}
+    content = [
+        {"type": "text", "text": prompts.ui_evaluation_repair_prompt},
+        *(_image_parts(screenshot_b64, "repair_ui_evaluation") if not ui_report else []),
+        {"type": "text", "text": json.dumps(ui_report)},
+        {"type": "text", "text": f"Business type: {business_type}"},
+        {"type": "text", "text": f"Page type: {page_type}"},
+        {"type": "text", "text": f"Scores already given: {json.dumps(scored)}"},
+    ]
+
+    def merge(raw):
+        repaired = {c["name"]: c for c in json.loads(raw).get("categories", []) if c.get("name") in missing}
+        by_name = {**{c["name"]: c for c in partial["categories"]}, **repaired}
+        categories = [by_name[name] for name in _expected_categories(page_type) if name in by_name]
+        scores = [c["score"] for c in categories]
+        merged = {**partial, "overall_score": round(sum(scores) / len(scores), 1), "categories": categories}
+        return _validate_evaluation(merged, page_type)
+
+    return _completion(
+        "repair_ui_evaluation",
+        parse=merge,
+        lane="batch",
+        messages=[{"role": "system", "content": prompts.build_ui_repair_system_message(page_type, missing)},
+                  {"role": "user", "content": content}],
+        **_output_format("repair_ui_evaluation", "ui_evaluation_repair", ui_repair_schema(missing)),
+    )
+
+
+@llm_agent
+def evaluate_ui(ui_report, screenshot_b64, business_type, page_type):
+    """
+    The page's evaluation, one category per global and page-type criterion.
+    Unknown and repeated categories are dropped; when some are missing, the
+    valid ones are kept and repair_ui_evaluation scores only the others.
+    """
+    system_msg = prompts.build_ui_evaluator_system_message(page_type)
+
+    content = [
+        {"type": "text", "text": prompts.ui_evaluator_prompt},
+        *_image_parts(screenshot_b64, "evaluate_ui"),
+        {"type": "text", "text": json.dumps(ui_report)},
+        {"type": "text", "text": f"Business type: {business_type}"},
+        {"type": "text", "text": f"Page type: {page_type}"},
+    ]
+
+    def parse(raw):
+        result = json.loads(raw)
+        expected = _expected_categories(page_type)
+        by_name = {}
+        for category in result.get("categories", []):
+            if category.get("name") in expected:
+                by_name.setdefault(category["name"], category)
+        dropped = len(result.get("categories", [])) - len(by_name)
+        if dropped:
+            log.warning(f"{page_type} | dropped {dropped} unknown or repeated categories")
+        missing = [name for name in expected if name not in by_name]
+        if missing and by_name:
+            log.warning(f"{page_type} | missing categories {missing} | repairing")
+            raise MissingCategories({**result, "categories": list(by_name.values())}, missing)
+        result["categories"] = [by_name[name] for name in expected if name in by_name]
+        return _validate_evaluation(result, page_type)
+
+    return _completion(
+        "evaluate_ui",
+        parse=parse,
+        lane="batch",
+        repair=functools.partial(_repair_evaluation, ui_report, screenshot_b64, business_type, page_type),
+        messages=[{"role": "system", "content": system_msg},
+                  {"role": "assistant", "content": json.dumps({
+                      k: v["summary"]
+                      for k, v in criteria.CRITERIA_BY_PAGE_TYPE[page_type].items()
+                  })},
+                  {"role": "user", "content": content}],
+        **_output_format("evaluate_ui", "ui_evaluation", ui_evaluation_schema(page_type)),
+    )
+
+@llm_agent
 def chat_completion(messages: list[dict[str, str]]) -> str:
     """
     messages = [
@@ -280,10 +612,9 @@ def chat_completion(messages: list[dict[str, str]]) -> str:
         *client_messages*   # user / assistant pairs forwarded from the UI
     ]
     """
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",          # fast + cheap; swap later if needed
+    return _completion(
+        "chat_completion",
+        cache=False,                  # conversations are not repeated
+        lane="interactive",           # ahead of queued evaluations
         messages=messages,
-        temperature=0.7,
-        max_tokens=500,
     )
-    return resp.choices[0].message.content
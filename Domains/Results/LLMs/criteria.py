@@ -694,3 +694,19 @@ CRITERIA_BY_PAGE_TYPE = {
         }
     }
 }
+
+
+# Screenshot regions (Domains/Toolkit/regions.py) each criterion is judged on;
+# "fold" is the first viewport.
+REGIONS_BY_CRITERION = {
+    "navigation_findability":                ["header", "footer"],
+    "visual_design_aesthetics":              ["fold"],
+    "visual_hierarchy_focus":                ["fold"],
+    "primary_cta_effectiveness":             ["fold", "hero"],
+    "product_discovery_category_highlights": ["hero", "product_grid"],
+    "listing_content_info_density":          ["product_grid"],
+    "filtering_sorting_functionality":       ["filters", "product_grid"],
+    "product_info_description_quality":      ["product_details"],
+    "product_imagery_media":                 ["gallery"],
+    "product_card_pricing_availability":     ["product_details"],
+}
@@ -0,0 +1,297 @@
+"""
+LLM gateway: providers, the model registry and fallback routing.
+
+Providers (LLM_PROVIDERS) are OpenAI-compatible chat APIs: OpenAI, and
+Groq through its OpenAI-compatible endpoint, so both go through the same
+SDK, raise the same errors and follow the scheduler's retry rules. A
+provider has one sync client per process and one async client per event
+loop, each keeping its own connection pool.
+
+MODEL_REGISTRY maps every agent to its provider, model and request
+parameters (agents.py merges them into its requests), and optionally to a
+fallback {"provider", "model", "params"}, whose params go on top;
+LLM_MODELS overrides entries per agent. send() runs an agent's request on
+its primary through the scheduler. When the primary is down (still
+failing after LLM_FALLBACK_ATTEMPTS tries, or timing out after the
+entry's "timeout") the fallback answers; when it is down or slow (a call
+took longer than "slow_after"), the agent goes to its fallback first for
+LLM_FALLBACK_COOLDOWN seconds before the primary is tried again.
+
+Each API call's latency is recorded per provider and model; stats() has
+the counts and p50/p95 of the last LATENCY_WINDOW calls.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, OpenAI
+
+from Domains.Results.LLMs.scheduler import RETRYABLE, LLMRateLimited, aschedule, schedule
+
+log = logging.getLogger("ux_eval")
+
+load_dotenv()
+
+PROVIDERS = {
+    "openai": {"api_key_env": "OPENAI_API_KEY"},
+    "groq":   {"api_key_env": "GROQ_API_KEY", "base_url": "https://api.groq.com/openai/v1"},
+}
+GROQ_TEXT = {"provider": "groq", "model": "llama-3.3-70b-versatile"}
+GROQ_JSON = {**GROQ_TEXT, "params": {"response_format": {"type": "json_object"}}}   # JSON mode, it takes no schema
+
+# The vision agents have no fallback: their screenshots are sent as several
+# WebP images, more than the Groq vision models accept per request.
+MODEL_REGISTRY = {
+    "describe_structure":   {"model": "gpt-4.1-mini-2025-04-14", "params": {"temperature": 0.1, "max_tokens": 500}},
+    "describe_styling":     {"model": "gpt-4.1-mini", "params": {"temperature": 0.1, "max_tokens": 500}},
+    "describe_page":        {"model": "gpt-4.1-mini", "params": {"temperature": 0.1, "max_tokens": 1000}},
+    "evaluate_ui":          {"model": "gpt-4.1-mini", "params": {"temperature": 0.1, "max_tokens": 500}},
+    "formulate_ui":         {"model": "gpt-4.1-mini", "params": {"temperature": 0.1, "max_tokens": 500},
+                             "fallback": GROQ_TEXT},
+    "evaluate_uba":         {"model": "gpt-4.1-mini", "fallback": GROQ_TEXT},
+    "web_search_agent":     {"model": "gpt-4o-mini-search-preview"},    # built-in web search, no equivalent
+    "evaluate_web_metrics": {"model": "gpt-4.1-mini", "params": {"temperature": 0.2, "max_tokens": 700},
+                             "fallback": GROQ_TEXT},
+    "repair_ui_evaluation": {"model": "gpt-4.1-mini", "params": {"temperature": 0.1, "max_tokens": 500},
+                             "fallback": GROQ_JSON},
+    "uba_formulator":       {"model": "o3-mini-2025-01-31", "fallback": GROQ_JSON},
+    "chat_completion":      {"model": "gpt-4o-mini", "params": {"temperature": 0.7, "max_tokens": 500},
+                             "timeout": 20, "slow_after": 8, "fallback": GROQ_TEXT},
+}
+LATENCY_WINDOW = 500    # latest calls per provider and model kept for the percentiles
+FAILOVER = (*RETRYABLE, LLMRateLimited)
+
+
+@dataclass(frozen=True)
+class Target:
+    provider: str
+    model: str
+    params: dict = field(default_factory=dict)
+    timeout: float = None
+
+
+@dataclass(frozen=True)
+class Route:
+    primary: Target
+    fallback: Target = None
+    slow_after: float = None
+
+
+@dataclass
+class Reply:
+    """A chat completion response and where it came from."""
+    response: object
+    provider: str
+    model: str
+    fallback: bool = False
+
+
+def route(agent):
+    """The agent's Route: MODEL_REGISTRY[agent] with LLM_MODELS[agent] on top."""
+    entry = dict(MODEL_REGISTRY.get(agent, {}))
+    override = getattr(settings, "LLM_MODELS", {}).get(agent, {})
+    params = {**entry.get("params", {}), **override.get("params", {})}
+    entry.update(override, params=params)
+    if "model" not in entry:
+        raise KeyError(f"No model registered for agent {agent!r}")
+
+    fallback = entry.get("fallback")
+    if fallback:
+        fallback = Target(fallback.get("provider", "openai"), fallback["model"], fallback.get("params", {}),
+                          fallback.get("timeout", entry.get("timeout")))
+    return Route(Target(entry.get("provider", "openai"), entry["model"], params, entry.get("timeout")),
+                 fallback or None, entry.get("slow_after"))
+
+
+def _provider(name):
+    config = {**PROVIDERS, **getattr(settings, "LLM_PROVIDERS", {})}
+    return config[name]
+
+
+def available(provider):
+    """Whether `provider` is configured, i.e. its API key is set."""
+    return bool(os.getenv(_provider(provider)["api_key_env"]))
+
+
+class LatencyStats:
+    def __init__(self):
+        self.seconds = deque(maxlen=LATENCY_WINDOW)
+        self.counts = dict.fromkeys(("calls", "errors", "fallbacks"), 0)
+
+    def summary(self):
+        ordered = sorted(self.seconds)
+
+        def percentile(q):
+            return round(ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))] * 1000) if ordered else None
+
+        return {**self.counts, "p50_ms": percentile(0.5), "p95_ms": percentile(0.95)}
+
+
+class Gateway:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._async_clients = weakref.WeakKeyDictionary()   # event loop -> {provider: AsyncOpenAI}
+        self._latency = {}
+        self._fallback_until = {}
+
+    def client(self, provider):
+        """The process-wide sync client of `provider`."""
+        with self._lock:
+            if provider not in self._clients:
+                self._clients[provider] = self._make_client(OpenAI, provider)
+            return self._clients[provider]
+
+    def async_client(self, provider):
+        """
+        The async client of `provider` for the running event loop. Under ASGI
+        (proto_api/asgi.py) a process has one loop, so all in-flight requests
+        share one client and its connection pool; an httpx pool cannot be used
+        from another loop, hence one client per loop.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._async_clients.setdefault(loop, {})
+            if provider not in clients:
+                clients[provider] = self._make_client(AsyncOpenAI, provider)
+            return clients[provider]
+
+    @staticmethod
+    def _make_client(cls, provider):
+        config = _provider(provider)
+        # retries are left to the scheduler (scheduler.py), which also knows the rate limits
+        return cls(api_key=os.getenv(config["api_key_env"]), base_url=config.get("base_url"), max_retries=0)
+
+    def _targets(self, agent, route):
+        """(target, is_primary) in the order to try them."""
+        targets = [(route.primary, True)]
+        if route.fallback and available(route.fallback.provider):
+            with self._lock:
+                tripped = self._fallback_until.get(agent, 0) > time.monotonic()
+            targets.insert(0 if tripped else 1, (route.fallback, False))
+        return targets
+
+    def _trip(self, agent, reason):
+        cooldown = getattr(settings, "LLM_FALLBACK_COOLDOWN", 60)
+        with self._lock:
+            self._fallback_until[agent] = time.monotonic() + cooldown
+        log.warning(f"{agent} | primary {reason} | fallback first for {cooldown}s")
+
+    def _observe(self, agent, target, seconds, ok, fallback):
+        with self._lock:
+            stats = self._latency.setdefault((target.provider, target.model), LatencyStats())
+            stats.counts["calls"] += 1
+            if ok:
+                stats.seconds.append(seconds)
+            else:
+                stats.counts["errors"] += 1
+            if fallback:
+                stats.counts["fallbacks"] += 1
+        log.debug(f"{agent} | {target.provider}:{target.model} | {'ok' if ok else 'error'} | {seconds:.2f}s")
+
+    def _attempts(self, targets, n):
+        # a target with another one behind it gives up sooner, so the next one answers while it still helps
+        return getattr(settings, "LLM_FALLBACK_ATTEMPTS", 2) if n < len(targets) - 1 else None
+
+    def _failed_over(self, agent, targets, n, is_primary, error):
+        """Whether to go on to the next target after `error`."""
+        if n == len(targets) - 1 or not isinstance(error, FAILOVER):
+            return False
+        if is_primary:
+            self._trip(agent, f"down ({type(error).__name__})")
+        return True
+
+    def _served(self, agent, route, target, is_primary, resp, seconds):
+        if is_primary and route.slow_after and seconds > route.slow_after:
+            self._trip(agent, f"slow ({seconds:.1f}s)")
+        return Reply(resp, target.provider, target.model, fallback=not is_primary)
+
+    def send(self, agent, request, lane="default"):
+        """Reply to `request` (messages and agent-specific arguments) from the agent's primary or fallback."""
+        route_ = route(agent)
+        targets = self._targets(agent, route_)
+        for n, (target, is_primary) in enumerate(targets):
+            client = self.client(target.provider)
+            if target.timeout:
+                client = client.with_options(timeout=target.timeout)
+            body = request if is_primary else {**request, **target.params}
+
+            def attempt():
+                t0 = time.perf_counter()
+                try:
+                    resp = client.chat.completions.create(model=target.model, **body)
+                except Exception:
+                    self._observe(agent, target, time.perf_counter() - t0, False, not is_primary)
+                    raise
+                attempt.seconds = time.perf_counter() - t0
+                self._observe(agent, target, attempt.seconds, True, not is_primary)
+                return resp
+
+            try:
+                resp = schedule(target.model, body, attempt, lane, self._attempts(targets, n))
+            except Exception as e:
+                if not self._failed_over(agent, targets, n, is_primary, e):
+                    raise
+                continue
+            return self._served(agent, route_, target, is_primary, resp, attempt.seconds)
+
+    async def asend(self, agent, request, lane="default"):
+        """send() on the async clients."""
+        route_ = route(agent)
+        targets = self._targets(agent, route_)
+        for n, (target, is_primary) in enumerate(targets):
+            client = self.async_client(target.provider)
+            if target.timeout:
+                client = client.with_options(timeout=target.timeout)
+            body = request if is_primary else {**request, **target.params}
+
+            async def attempt():
+                t0 = time.perf_counter()
+                try:
+                    resp = await client.chat.completions.create(model=target.model, **body)
+                except Exception:
+                    self._observe(agent, target, time.perf_counter() - t0, False, not is_primary)
+                    raise
+                attempt.seconds = time.perf_counter() - t0
+                self._observe(agent, target, attempt.seconds, True, not is_primary)
+                return resp
+
+            try:
+                resp = await aschedule(target.model, body, attempt, lane, self._attempts(targets, n))
+            except Exception as e:
+                if not self._failed_over(agent, targets, n, is_primary, e):
+                    raise
+                continue
+            return self._served(agent, route_, target, is_primary, resp, attempt.seconds)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "models": {f"{provider}:{model}": stats.summary()
+                           for (provider, model), stats in sorted(self._latency.items())},
+                "fallback_first": {agent: round(until - now) for agent, until in self._fallback_until.items()
+                                   if until > now},
+            }
+
+
+_gateway = Gateway()
+
+
+def get_gateway():
+    return _gateway
+
+
+def send(agent, request, lane="default"):
+    return _gateway.send(agent, request, lane)
+
+
+async def asend(agent, request, lane="default"):
+    return await _gateway.asend(agent, request, lane)
@@ -0,0 +1,134 @@
+"""
+Token-budgeted payloads for describe_structure / describe_styling.
+
+The stored HTML extract carries the full raw HTML and one outline node per
+element, and the CSS extract every stylesheet's text. build_payload() turns
+both into compact JSON: raw HTML is dropped (after deriving the extract from
+it when only the onboarding form is stored), repeated outline nodes are
+collapsed into one with a count, class lists become class counts and the
+CSS is replaced by summarize_css(). The result is counted in tokens and,
+while it exceeds LLM_PAYLOAD_TOKEN_BUDGET, the outline is halved first, then
+the links, then every CSS top list.
+"""
+import json
+import logging
+from collections import Counter
+
+from django.conf import settings
+
+from Domains.Toolkit.css_analyzer import summarize_css
+from Domains.Toolkit.extractors import extract_html_features
+from Domains.Toolkit.parsers import make_soup
+
+try:
+    import tiktoken
+except ImportError:  # token counts fall back to ~4 characters per token
+    tiktoken = None
+
+log = logging.getLogger("ux_eval")
+
+MAX_CLASSES = 60
+MIN_OUTLINE_NODES = 20
+MIN_LINKS = 10
+CSS_TRIMMABLE = ("media_queries", "component_rules", "duplicate_selectors", "top_colors", "top_font_families",
+                 "top_font_sizes", "top_font_weights", "top_spacing", "top_container_widths", "top_display")
+
+_encoding = None
+
+
+def count_tokens(text):
+    global _encoding
+    if tiktoken is None:
+        if _encoding is None:
+            log.warning("payload | tiktoken is not installed; estimating 4 characters per token")
+            _encoding = False
+        return len(text) // 4 + 1
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding("o200k_base")
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def compact_json(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def full_html_extract(html_extract):
+    """The onboarding artifact only holds raw_html; derive the full extract from it."""
+    if "dom_outline" in html_extract or not html_extract.get("raw_html"):
+        return html_extract
+    extract = extract_html_features(make_soup(html_extract["raw_html"]), html_extract.get("url"))
+    return {**extract, "title": html_extract.get("title") or extract["title"]}
+
+
+def dedupe_outline(outline):
+    """Collapses outline nodes with the same tag, id, classes and style into the first, with a count."""
+    nodes = {}
+    for node in outline:
+        key = (node.get("tag"), node.get("id"), tuple(node.get("classes") or ()), node.get("inline_style"))
+        if key in nodes:
+            nodes[key]["count"] = nodes[key].get("count", 1) + 1
+            continue
+        nodes[key] = {k: v for k, v in node.items() if v not in (None, [], "")}
+    return list(nodes.values())
+
+
+def html_payload(html_extract):
+    class_counts = Counter()
+    for names in html_extract.get("class_names", []):
+        class_counts.update(names if isinstance(names, list) else str(names).split())
+
+    payload = {
+        key: value for key, value in html_extract.items()
+        if key not in ("raw_html", "class_names", "id_names", "links", "dom_outline", "headings")
+    }
+    payload["headings"] = {tag: texts for tag, texts in html_extract.get("headings", {}).items() if texts}
+    payload["class_counts"] = dict(class_counts.most_common(MAX_CLASSES))
+    payload["id_names"] = list(dict.fromkeys(html_extract.get("id_names", [])))
+    payload["links"] = list(dict.fromkeys(html_extract.get("links", [])))
+    payload["dom_outline"] = dedupe_outline(html_extract.get("dom_outline", []))
+    return payload
+
+
+def _shrink(html, css):
+    """
+    Makes one cut, in a fixed order: halves the outline until it is down to
+    MIN_OUTLINE_NODES, then the links down to MIN_LINKS, then every CSS top
+    list at once. False when nothing is left to cut.
+    """
+    if len(html["dom_outline"]) > MIN_OUTLINE_NODES:
+        html["dom_outline"] = html["dom_outline"][:max(MIN_OUTLINE_NODES, len(html["dom_outline"]) // 2)]
+        return True
+    if len(html["links"]) > MIN_LINKS:
+        html["links"] = html["links"][:max(MIN_LINKS, len(html["links"]) // 2)]
+        return True
+    trimmable = [key for key in CSS_TRIMMABLE if len(css.get(key) or ()) > 1]
+    if not trimmable:
+        return False
+    for key in trimmable:
+        value = css[key]
+        if isinstance(value, dict):
+            css[key] = dict(list(value.items())[:len(value) // 2])
+        else:
+            css[key] = value[:len(value) // 2]
+    return True
+
+
+def build_payload(html_extract, css_extract, budget=None):
+    """
+    Returns (html_text, css_text, tokens): compact JSON for the HTML and CSS
+    extracts, cut down until both together fit `budget` tokens
+    (LLM_PAYLOAD_TOKEN_BUDGET by default) or nothing more can be cut.
+    """
+    budget = budget or getattr(settings, "LLM_PAYLOAD_TOKEN_BUDGET", 12_000)
+    html_extract = full_html_extract(html_extract)
+    css = summarize_css(css_extract, html_extract)
+    html = html_payload(html_extract)
+
+    html_text, css_text = compact_json(html), compact_json(css)
+    tokens = count_tokens(html_text) + count_tokens(css_text)
+    while tokens > budget and _shrink(html, css):
+        html_text, css_text = compact_json(html), compact_json(css)
+        tokens = count_tokens(html_text) + count_tokens(css_text)
+    if tokens > budget:
+        log.warning(f"payload | {tokens} tokens still over budget {budget}")
+    return html_text, css_text, tokens
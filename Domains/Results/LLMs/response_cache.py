@@ -0,0 +1,300 @@
+"""
+Content-addressed cache for LLM completions.
+
+Every agent in agents.py sends its request through one cache, keyed by
+the model, the agent's prompt version (prompts.PROMPT_VERSIONS) and a hash
+of everything else in the request (messages, images, sampling params), so
+identical inputs never pay for a second completion. Only responses the
+agent managed to parse are stored; a stored entry the agent can no longer
+parse (written by an older parser) is dropped on the hit that finds it.
+
+LLM_CACHE_BACKEND picks where entries live:
+  "disk"    one file per entry under LLM_CACHE_DIR
+  "sqlite"  one table in LLM_CACHE_SQLITE_PATH
+  "django"  the Django cache named LLM_CACHE_ALIAS
+  "off"     caching off
+Disk and SQLite drop least recently used entries once LLM_CACHE_MAX_BYTES
+is exceeded; the Django cache applies its own eviction policy.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+
+def request_key(model, version, request):
+    """Cache key for a chat completion `request` (create() kwargs without the model)."""
+    input_hash = hashlib.sha256(
+        json.dumps(request, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()
+    return hashlib.sha256(f"{model}|{version}|{input_hash}".encode("utf-8")).hexdigest()
+
+
+class DiskBackend:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes = None  # key -> bytes, read from disk on first use
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _load_sizes(self):
+        if self._sizes is not None:
+            return
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, os.path.splitext(name)[0], stat.st_size))
+        self._sizes = {key: size for _, key, size in sorted(entries)}
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = f.read()
+        except OSError:
+            return None
+        with self._lock:
+            self._load_sizes()
+            if key in self._sizes:
+                self._sizes[key] = self._sizes.pop(key)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # written aside and renamed into place, so a reader never sees half an entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        with self._lock:
+            self._load_sizes()
+            self._sizes.pop(key, None)
+            self._sizes[key] = os.path.getsize(path)
+            return self._evict()
+
+    def _evict(self):
+        evicted = 0
+        total = sum(self._sizes.values())
+        while total > self.max_bytes and len(self._sizes) > 1:
+            key = next(iter(self._sizes))
+            total -= self._sizes.pop(key)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            evicted += 1
+        return evicted
+
+    def delete(self, key):
+        with self._lock:
+            self._load_sizes()
+            self._sizes.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        with self._lock:
+            self._load_sizes()
+            for key in list(self._sizes):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._sizes = {}
+
+    def usage(self):
+        with self._lock:
+            self._load_sizes()
+            return {"entries": len(self._sizes), "bytes": sum(self._sizes.values())}
+
+
+class SQLiteBackend:
+    def __init__(self, path, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)")
+        self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return row[0]
+
+    def set(self, key, value):
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            evicted = 0
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            for old_key, old_size in self._db.execute(
+                "SELECT key, size FROM llm_cache WHERE key != ? ORDER BY last_used", (key,)
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM llm_cache WHERE key = ?", (old_key,))
+                total -= old_size
+                evicted += 1
+            self._db.commit()
+            return evicted
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM llm_cache")
+            self._db.commit()
+
+    def usage(self):
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        return {"entries": entries, "bytes": size}
+
+
+class DjangoCacheBackend:
+    """Entries live under a generation number, so clear() leaves the rest of the cache alone."""
+    PREFIX = "llm_response:"
+
+    def __init__(self, alias):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+
+    def _generation(self):
+        return self.cache.get_or_set(self.PREFIX + "generation", 1, timeout=None)
+
+    def get(self, key):
+        return self.cache.get(self.PREFIX + key, version=self._generation())
+
+    def set(self, key, value):
+        self.cache.set(self.PREFIX + key, value, timeout=None, version=self._generation())
+        return 0
+
+    def delete(self, key):
+        self.cache.delete(self.PREFIX + key, version=self._generation())
+
+    def clear(self):
+        self.cache.set(self.PREFIX + "generation", self._generation() + 1, timeout=None)
+
+    def usage(self):
+        return {}
+
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.by_agent = {}
+
+    def _count(self, agent, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            counts = self.by_agent.setdefault(agent, {"hits": 0, "misses": 0})
+            counts[outcome] += 1
+
+    def get(self, agent, key):
+        value = self.backend.get(key) if self.backend else None
+        self._count(agent, "hits" if value is not None else "misses")
+        return value
+
+    def set(self, key, value):
+        if not self.backend:
+            return
+        evicted = self.backend.set(key, value)
+        with self._lock:
+            self.evictions += evicted
+
+    def discard(self, agent, key):
+        """Drops an entry get() returned that turned out unusable; its hit counts as a miss."""
+        if self.backend:
+            self.backend.delete(key)
+        with self._lock:
+            self.hits -= 1
+            self.misses += 1
+            counts = self.by_agent.setdefault(agent, {"hits": 1, "misses": 0})
+            counts["hits"] -= 1
+            counts["misses"] += 1
+
+    def clear(self):
+        if self.backend:
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "backend": type(self.backend).__name__ if self.backend else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "by_agent": {agent: dict(counts) for agent, counts in self.by_agent.items()},
+            }
+        if self.backend:
+            stats.update(self.backend.usage())
+        return stats
+
+
+def make_backend(name):
+    max_bytes = getattr(settings, "LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+    if name == "disk":
+        return DiskBackend(getattr(settings, "LLM_CACHE_DIR", os.path.join("Records", "LLM-CACHE")), max_bytes)
+    if name == "sqlite":
+        return SQLiteBackend(getattr(settings, "LLM_CACHE_SQLITE_PATH", os.path.join("Records", "llm_cache.sqlite3")),
+                             max_bytes)
+    if name == "django":
+        return DjangoCacheBackend(getattr(settings, "LLM_CACHE_ALIAS", "default"))
+    if name in (None, "off"):
+        return None
+    raise ValueError(f"Unknown LLM_CACHE_BACKEND '{name}'")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(make_backend(getattr(settings, "LLM_CACHE_BACKEND", "disk")))
+    return _cache
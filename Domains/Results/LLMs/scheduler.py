@@ -0,0 +1,327 @@
+"""
+Rate-limit-aware scheduling of LLM calls.
+
+Every chat completion in agents.py is sent through schedule() /
+aschedule(). For each model the scheduler keeps two token buckets sized
+from LLM_RATE_LIMITS: requests per minute and tokens per minute. A call
+first estimates its tokens (prompt text, images and the completion
+allowance, the way the API counts them against TPM) and waits until both
+buckets have room; what the response did not use is given back.
+
+Waiting calls queue per model in priority lanes: "interactive" (chat)
+goes before "default", which goes before "batch" (evaluations, Celery
+jobs); within a lane, first come first served. A call that waits longer
+than LLM_SCHEDULER_MAX_WAIT raises LLMRateLimited (a DRF Throttled: 429).
+
+429s, timeouts, connection errors and 5xx are retried up to
+LLM_RETRY_ATTEMPTS times with full-jitter exponential backoff; a
+Retry-After from the API replaces the backoff and pauses the whole model,
+so queued calls do not run into the same limit. The buckets are per
+process.
+"""
+import asyncio
+import base64
+import heapq
+import io
+import itertools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+
+import openai
+from django.conf import settings
+from PIL import Image
+from rest_framework.exceptions import Throttled
+
+from Domains.Results.LLMs.payloads import count_tokens
+from Domains.Toolkit.screenshots import image_tokens
+
+log = logging.getLogger("ux_eval")
+
+LANES = {"interactive": 0, "default": 1, "batch": 2}
+RETRYABLE = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+POLL = 0.05                 # seconds between checks while queued behind another call
+MESSAGE_OVERHEAD = 4        # tokens the chat format adds per message
+DEFAULT_COMPLETION = 1000   # completion allowance when a request sets no max_tokens
+DEFAULT_IMAGE_TOKENS = 765  # a 1024x1024 high-detail image, when the size cannot be read
+
+_lane = ContextVar("llm_lane", default=None)
+
+
+class LLMRateLimited(Throttled):
+    default_detail = "The LLM rate limit is exhausted."
+    default_code = "llm_rate_limited"
+
+
+@contextmanager
+def lane(name):
+    """Runs the LLM calls made inside the block in lane `name`, whatever their agent asks for."""
+    token = _lane.set(name)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def _image_part_tokens(url):
+    """Tokens of a data-URL image part, from the image size in its header."""
+    try:
+        head = base64.b64decode(url.split(",", 1)[1][:65536])
+        with Image.open(io.BytesIO(head)) as image:
+            return image_tokens(*image.size)
+    except Exception:
+        return DEFAULT_IMAGE_TOKENS
+
+
+def estimate_tokens(request):
+    """Tokens a request counts against the TPM limit: prompt, images and max completion."""
+    tokens = 0
+    for message in request.get("messages", []):
+        tokens += MESSAGE_OVERHEAD
+        content = message.get("content")
+        parts = content if isinstance(content, list) else [{"type": "text", "text": content or ""}]
+        for part in parts:
+            if part.get("type") == "image_url":
+                tokens += _image_part_tokens(part["image_url"]["url"])
+            else:
+                tokens += count_tokens(str(part.get("text", "")))
+    completion = request.get("max_tokens") or request.get("max_completion_tokens") or DEFAULT_COMPLETION
+    return tokens + completion
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` (at most the capacity) is available."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def give(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class ModelLimiter:
+    def __init__(self, model, rpm, tpm):
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+        self.waiting = []           # heap of (lane, seq) tickets
+        self.counts = dict.fromkeys(("calls", "queued", "retries", "rate_limited", "timed_out", "failed"), 0)
+        self.wait_seconds = 0.0
+
+
+class Scheduler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limiters = {}
+        self._seq = itertools.count()
+
+    def _limiter(self, model):
+        with self._lock:
+            limiter = self._limiters.get(model)
+            if limiter is None:
+                limits = getattr(settings, "LLM_RATE_LIMITS", {})
+                config = {"rpm": 500, "tpm": 200_000, **limits.get("default", {}), **limits.get(model, {})}
+                limiter = self._limiters[model] = ModelLimiter(model, config["rpm"], config["tpm"])
+            return limiter
+
+    def _enter(self, limiter, lane_name):
+        ticket = (LANES.get(lane_name, LANES["default"]), next(self._seq))
+        with self._lock:
+            heapq.heappush(limiter.waiting, ticket)
+        return ticket
+
+    def _leave(self, limiter, ticket):
+        with self._lock:
+            if ticket in limiter.waiting:
+                limiter.waiting.remove(ticket)
+                heapq.heapify(limiter.waiting)
+
+    def _try_acquire(self, limiter, ticket, tokens):
+        """0 when the call may go now (its tokens are taken), otherwise seconds to wait before asking again."""
+        with self._lock:
+            if limiter.waiting[0] != ticket:
+                return POLL
+            now = time.monotonic()
+            wait = max(limiter.paused_until - now,
+                       limiter.requests.wait_time(1, now),
+                       limiter.tokens.wait_time(tokens, now))
+            if wait > 0:
+                return wait
+            heapq.heappop(limiter.waiting)
+            limiter.requests.take(1)
+            limiter.tokens.take(tokens)
+            return 0.0
+
+    def _timed_out(self, limiter, ticket):
+        self._leave(limiter, ticket)
+        with self._lock:
+            limiter.counts["timed_out"] += 1
+        log.warning(f"{limiter.model} | rate-limit queue wait exceeded")
+        raise LLMRateLimited(wait=getattr(settings, "LLM_RETRY_BASE_DELAY", 1.0))
+
+    def acquire(self, limiter, tokens, lane_name):
+        ticket = self._enter(limiter, lane_name)
+        started = time.monotonic()
+        deadline = started + getattr(settings, "LLM_SCHEDULER_MAX_WAIT", 120)
+        # the head of the queue sleeps until its capacity is due; the others poll
+        while (wait := self._try_acquire(limiter, ticket, tokens)) > 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._timed_out(limiter, ticket)
+            time.sleep(min(wait, remaining))
+        self._queued(limiter, started)
+
+    async def aacquire(self, limiter, tokens, lane_name):
+        ticket = self._enter(limiter, lane_name)
+        started = time.monotonic()
+        deadline = started + getattr(settings, "LLM_SCHEDULER_MAX_WAIT", 120)
+        try:
+            while (wait := self._try_acquire(limiter, ticket, tokens)) > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timed_out(limiter, ticket)
+                await asyncio.sleep(min(wait, remaining))
+        except asyncio.CancelledError:
+            self._leave(limiter, ticket)
+            raise
+        self._queued(limiter, started)
+
+    def _queued(self, limiter, started):
+        waited = time.monotonic() - started
+        with self._lock:
+            limiter.counts["calls"] += 1
+            limiter.wait_seconds += waited
+            if waited > POLL:
+                limiter.counts["queued"] += 1
+
+    def _settle(self, limiter, estimate, resp):
+        used = getattr(getattr(resp, "usage", None), "total_tokens", None)
+        if used is not None and used < estimate:
+            with self._lock:
+                limiter.tokens.give(estimate - used)
+
+    def _retry_delay(self, limiter, error, attempt, attempts=None):
+        """Seconds before retry `attempt`, or None when `error` is not worth retrying."""
+        if not isinstance(error, RETRYABLE) or attempt >= (attempts or getattr(settings, "LLM_RETRY_ATTEMPTS", 5)) - 1:
+            return None
+        if isinstance(error, openai.RateLimitError) and getattr(error, "code", None) == "insufficient_quota":
+            return None
+        base = getattr(settings, "LLM_RETRY_BASE_DELAY", 1.0)
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, base)
+        else:
+            delay = random.uniform(0, min(getattr(settings, "LLM_RETRY_MAX_DELAY", 30.0), base * 2 ** attempt))
+        with self._lock:
+            limiter.counts["retries"] += 1
+            if isinstance(error, openai.RateLimitError):
+                limiter.counts["rate_limited"] += 1
+                limiter.paused_until = max(limiter.paused_until, time.monotonic() + delay)
+        log.warning(f"{limiter.model} | {type(error).__name__} | retry {attempt + 1} in {delay:.1f}s")
+        return delay
+
+    def _failed(self, limiter):
+        with self._lock:
+            limiter.counts["failed"] += 1
+
+    def schedule(self, model, request, send, lane_name="default", attempts=None):
+        """
+        send() once the model has capacity for `request`, retried on transient
+        errors; `attempts` caps the tries below LLM_RETRY_ATTEMPTS.
+        """
+        limiter = self._limiter(model)
+        tokens = estimate_tokens(request)
+        lane_name = _lane.get() or lane_name
+        for attempt in itertools.count():
+            self.acquire(limiter, tokens, lane_name)
+            try:
+                resp = send()
+            except Exception as e:
+                delay = self._retry_delay(limiter, e, attempt, attempts)
+                if delay is None:
+                    self._failed(limiter)
+                    raise
+                time.sleep(delay)
+                continue
+            self._settle(limiter, tokens, resp)
+            return resp
+
+    async def aschedule(self, model, request, send, lane_name="default", attempts=None):
+        """schedule() for coroutines: `send` returns an awaitable."""
+        limiter = self._limiter(model)
+        tokens = estimate_tokens(request)
+        lane_name = _lane.get() or lane_name
+        for attempt in itertools.count():
+            await self.aacquire(limiter, tokens, lane_name)
+            try:
+                resp = await send()
+            except Exception as e:
+                delay = self._retry_delay(limiter, e, attempt, attempts)
+                if delay is None:
+                    self._failed(limiter)
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._settle(limiter, tokens, resp)
+            return resp
+
+    def stats(self):
+        with self._lock:
+            return {
+                model: {
+                    **limiter.counts,
+                    "waiting": len(limiter.waiting),
+                    "avg_wait_ms": round(limiter.wait_seconds / limiter.counts["calls"] * 1000, 1)
+                    if limiter.counts["calls"] else 0.0,
+                    "requests_available": round(limiter.requests.level, 1),
+                    "tokens_available": round(limiter.tokens.level),
+                }
+                for model, limiter in self._limiters.items()
+            }
+
+
+def _retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_scheduler = Scheduler()
+
+
+def get_scheduler():
+    return _scheduler
+
+
+def schedule(model, request, send, lane_name="default", attempts=None):
+    return _scheduler.schedule(model, request, send, lane_name, attempts)
+
+
+async def aschedule(model, request, send, lane_name="default", attempts=None):
+    return await _scheduler.aschedule(model, request, send, lane_name, attempts)
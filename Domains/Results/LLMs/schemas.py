@@ -0,0 +1,65 @@
+"""
+JSON schemas for structured-output answers.
+
+Agents listed in LLM_STRUCTURED_OUTPUTS send their schema as the
+response_format, and the API constrains the answer to it, so it always
+parses. The schemas follow the output formats documented in prompts.py;
+where a format cannot be written as a strict schema (uba_formulator's
+"observation n" keys), the schema asks for a list and the agent's parser
+turns it back into the documented shape.
+"""
+from django.conf import settings
+
+from Domains.Results.LLMs import criteria
+
+
+def structured(agent):
+    return agent in getattr(settings, "LLM_STRUCTURED_OUTPUTS", ())
+
+
+def response_format(name, schema):
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+
+def _object(**properties):
+    # strict mode: every property required, nothing else allowed
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+def _categories(names):
+    category = _object(
+        name={"type": "string", "enum": names},
+        score={"type": "integer", "minimum": 1, "maximum": 5},
+        evidence={"type": "string"},
+    )
+    return {"type": "array", "items": category, "minItems": len(names), "maxItems": len(names)}
+
+
+def ui_evaluation_schema(page_type):
+    """The evaluation of prompts.BASE_SYSTEM_TEMPLATE, with one entry per global and page-type category."""
+    names = list(criteria.CRITERIA_BY_PAGE_TYPE["global"]) + list(criteria.CRITERIA_BY_PAGE_TYPE[page_type])
+    return _object(
+        page_type={"type": "string", "enum": [page_type]},
+        overall_score={"type": "number"},
+        categories=_categories(names),
+    )
+
+
+def ui_repair_schema(names):
+    """The categories of prompts.REPAIR_SYSTEM_TEMPLATE: one entry for each of `names`."""
+    return _object(categories=_categories(list(names)))
+
+
+WEB_SEARCH_SCHEMA = _object(
+    resources={
+        "type": "array",
+        "items": _object(source={"type": "string"}, summary={"type": "string"}),
+        "minItems": 1,
+        "maxItems": 3,
+    },
+)
+
+# {"observation 1": ..., "observation n": ...} of prompts.uba_formulator_system_message, as a list
+UBA_FORMULATION_SCHEMA = _object(
+    observations={"type": "array", "items": {"type": "string"}, "minItems": 1},
+)
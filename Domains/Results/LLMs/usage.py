@@ -0,0 +1,239 @@
+"""
+Token, latency and cost accounting of LLM calls.
+
+Every agent call, cache hits included, becomes an LLMCall row
+(Domains/Results/models.py) with its model, tokens, latency and cost,
+and its origin: the endpoint or Celery task, the page, and the business.
+LLMUsageMiddleware (proto_api/middleware.py) opens the origin of a
+request; the services that load a page tag it (tag_page()), and a
+request's user stands in for the business when no page is involved.
+
+Rows are buffered in memory and inserted with bulk_create by a background
+thread, every LLM_USAGE_FLUSH_SECONDS or as soon as LLM_USAGE_BATCH_SIZE
+rows wait, so no request waits on the insert. While the database is
+unreachable at most LLM_USAGE_MAX_PENDING rows are kept; rows still
+buffered when a process is killed are lost.
+
+Cost is priced from LLM_PRICES when the call is made. report() groups the
+rows per agent, business, endpoint, model, or agent and output mode
+(structured or not), most expensive first, with parse-failure and retry
+rates and p50/p95 latency of the calls that reached a provider.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from Domains.Onboard.models import Business
+from Domains.Results.models import LLMCall
+
+log = logging.getLogger("ux_eval")
+
+GROUPS = {
+    "agent":    ("agent",),
+    "business": ("business_id", "business__name"),
+    "endpoint": ("endpoint",),
+    "model":    ("provider", "model"),
+    "output":   ("agent", "structured"),     # parse failures with and without a JSON schema
+}
+MICRO_USD = Decimal("0.000001")
+
+_origin = ContextVar("llm_origin", default=None)
+
+
+@contextmanager
+def attribute(endpoint=""):
+    """Attributes the LLM calls made inside the block to `endpoint`; tag_page() and set_origin() add to it."""
+    token = _origin.set({"endpoint": endpoint, "page_id": None, "business_id": None, "user_id": None})
+    try:
+        yield
+    finally:
+        _origin.reset(token)
+
+
+def set_origin(**fields):
+    # the origin is one dict per block, so a field set in a worker thread or a gathered task still counts
+    origin = _origin.get()
+    if origin is not None:
+        origin.update(fields)
+
+
+def tag_page(page):
+    set_origin(page_id=page.id, business_id=page.business_id)
+
+
+def cost(model, prompt_tokens, completion_tokens):
+    """USD of a call from LLM_PRICES (by model name, or its longest listed prefix); None when unpriced."""
+    prices = getattr(settings, "LLM_PRICES", {})
+    key = model if model in prices else max((k for k in prices if model.startswith(k)), key=len, default=None)
+    if key is None:
+        return None
+    prompt_rate, completion_rate = (Decimal(str(rate)) for rate in prices[key])
+    return ((prompt_tokens * prompt_rate + completion_tokens * completion_rate) / 1_000_000).quantize(MICRO_USD)
+
+
+class UsageWriter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = []
+        self._wake = threading.Event()
+        self._pid = None
+        self.counts = dict.fromkeys(("recorded", "written", "dropped", "failed_flushes"), 0)
+
+    def record(self, row):
+        if not getattr(settings, "LLM_USAGE_RECORDING", True):
+            return
+        with self._lock:
+            self._start()
+            self._rows.append(row)
+            self.counts["recorded"] += 1
+            self._trim()
+            full = len(self._rows) >= getattr(settings, "LLM_USAGE_BATCH_SIZE", 100)
+        if full:
+            self._wake.set()
+
+    def _start(self):
+        # started on first use, and again in each forked Celery worker process
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._wake = threading.Event()
+            threading.Thread(target=self._run, name="llm-usage-writer", daemon=True).start()
+
+    def _trim(self):
+        over = len(self._rows) - getattr(settings, "LLM_USAGE_MAX_PENDING", 10_000)
+        if over > 0:
+            del self._rows[:over]
+            self.counts["dropped"] += over
+
+    def _run(self):
+        while True:
+            self._wake.wait(getattr(settings, "LLM_USAGE_FLUSH_SECONDS", 5))
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered rows; returns how many were written."""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+        try:
+            self._write(rows)
+        except Exception as e:
+            log.warning(f"llm usage | {len(rows)} rows not written, kept for the next flush: {e}")
+            with self._lock:
+                self._rows[:0] = rows
+                self.counts["failed_flushes"] += 1
+                self._trim()
+            return 0
+        with self._lock:
+            self.counts["written"] += len(rows)
+        return len(rows)
+
+    def _write(self, rows):
+        close_old_connections()
+        users = {row["user_id"] for row in rows if row["user_id"] and not row["business_id"]}
+        businesses = dict(Business.objects.filter(user_id__in=users).values_list("user_id", "id")) if users else {}
+        LLMCall.objects.bulk_create(
+            [LLMCall(business_id=row["business_id"] or businesses.get(row["user_id"]),
+                     **{k: v for k, v in row.items() if k not in ("business_id", "user_id")})
+             for row in rows],
+            batch_size=getattr(settings, "LLM_USAGE_BATCH_SIZE", 100),
+        )
+
+    def stats(self):
+        with self._lock:
+            return {**self.counts, "pending": len(self._rows)}
+
+
+_writer = UsageWriter()
+atexit.register(_writer.flush)
+
+
+def get_writer():
+    return _writer
+
+
+def record(agent, provider, model, fallback, cached, seconds, prompt_tokens, completion_tokens,
+           structured=False, parse_failed=False, retry=False):
+    """Queues the LLMCall row of one agent call, with the origin of the current block."""
+    origin = _origin.get() or {}
+    _writer.record({
+        "created_at": timezone.now(),
+        "agent": agent,
+        "provider": provider or "",
+        "model": model,
+        "endpoint": (origin.get("endpoint") or "")[:100],
+        "page_id": origin.get("page_id"),
+        "business_id": origin.get("business_id"),
+        "user_id": origin.get("user_id"),
+        "prompt_tokens": prompt_tokens or 0,
+        "completion_tokens": completion_tokens or 0,
+        "latency_ms": round(seconds * 1000),
+        "cached": cached,
+        "fallback": fallback,
+        "structured": structured,
+        "parse_failed": parse_failed,
+        "retry": retry,
+        "cost_usd": cost(model, prompt_tokens or 0, completion_tokens or 0),
+    })
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))] if ordered else None
+
+
+def report(by="agent", days=7):
+    """
+    {"by", "days", "total_cost_usd", "groups": [...]}: per group of `by`
+    (a GROUPS key) over the last `days` days, call and cache-hit counts,
+    parse failures and retries (counts and shares of the calls), tokens,
+    cost in USD, and p50/p95 latency in ms. Most expensive first.
+    """
+    fields = GROUPS[by]
+    calls = LLMCall.objects.filter(created_at__gte=timezone.now() - timedelta(days=days))
+    totals = calls.values(*fields).annotate(
+        n=Count("id"),
+        hits=Count("id", filter=Q(cached=True)),
+        fallbacks=Count("id", filter=Q(fallback=True)),
+        parse_failures=Count("id", filter=Q(parse_failed=True)),
+        retries=Count("id", filter=Q(retry=True)),
+        prompt=Sum("prompt_tokens"),
+        completion=Sum("completion_tokens"),
+        cost=Sum("cost_usd"),
+    ).order_by()
+
+    latencies = defaultdict(list)
+    for *key, ms in calls.filter(cached=False).values_list(*fields, "latency_ms").iterator():
+        latencies[tuple(key)].append(ms)
+
+    groups = []
+    for row in totals:
+        ordered = sorted(latencies.get(tuple(row[f] for f in fields), []))
+        groups.append({
+            **{f: row[f] for f in fields},
+            "calls": row["n"],
+            "cache_hits": row["hits"],
+            "fallbacks": row["fallbacks"],
+            "parse_failures": row["parse_failures"],
+            "parse_failure_rate": round(row["parse_failures"] / row["n"], 4),
+            "retries": row["retries"],
+            "retry_rate": round(row["retries"] / row["n"], 4),
+            "prompt_tokens": row["prompt"] or 0,
+            "completion_tokens": row["completion"] or 0,
+            "cost_usd": float(row["cost"] or 0),
+            "p50_ms": _percentile(ordered, 0.5),
+            "p95_ms": _percentile(ordered, 0.95),
+        })
+    groups.sort(key=lambda group: group["cost_usd"], reverse=True)
+    return {"by": by, "days": days, "total_cost_usd": round(sum(g["cost_usd"] for g in groups), 6), "groups": groups}
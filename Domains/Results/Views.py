@@ -1,125 +1,141 @@
 # views.py
-import json, base64, asyncio, os, requests
-from concurrent.futures import ThreadPoolExecutor
+import json, inspect
+from asgiref.sync import sync_to_async
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework import status
-from Domains.Onboard.models import Page
-from Domains.ManageData.models import Upload
+from rest_framework import permissions, status
 import re, csv
 from django.utils.text import slugify
 from pathlib import Path
 from django.http import HttpResponse
 from rest_framework.response import Response
-from Domains.Results.LLMs.agents import describe_structure, describe_styling, evaluate_ui, evaluate_uba, formulate_ui, evaluate_web_metrics, web_search_agent, uba_formulator
+from Domains.Results.LLMs.agents import describe_structure, describe_styling, evaluate_web_metrics
 import Domains.Results.LLMs.prompts as prompts 
 import Domains.Results.LLMs.agents as agents 
+from Domains.Results.services import (
+    aevaluate_uba_result, aevaluate_ui_result, aformulate_ui_result, aui_report_result, auba_formulation_result,
+    auba_solutions_result, get_page, in_thread, load_page_inputs,
+)
+from Domains.Results.LLMs.response_cache import get_cache as get_llm_cache
+from Domains.Results.LLMs.gateway import get_gateway
+from Domains.Results.LLMs.scheduler import get_scheduler
+from Domains.Results.LLMs import usage
+from Domains.Toolkit.executors import get_executor
+from Domains.Results.pipeline import pipeline_result
+from Domains.Results.tasks import (
+    evaluate_uba_task, evaluate_ui_task, ui_pipeline_task, ui_report_task, uba_formulation_task, uba_solutions_task,
+)
+from celery.result import AsyncResult
+from django.urls import reverse
 
-executor = ThreadPoolExecutor()
-
-def make_dir(*parts):
-    path = os.path.join('Records', *parts)
-    os.makedirs(path, exist_ok=True)
-    return path
+class AsyncAPIView(APIView):
+    """
+    APIView with coroutine handlers. Served through proto_api/asgi.py they
+    run on the server's event loop, so a request waiting on the LLM holds no
+    thread; authentication, permissions and throttling (which may query the
+    database) run in Django's sync thread. Under WSGI each request gets its
+    own loop, as for any async Django view. A request is answered 429 when
+    one of `pools` (Domains/Toolkit/executors.py) has a full queue.
+    """
+    pools = ("parse", "llm")
 
-async def run_async(func, *args):
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(executor, func, *args)
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
 
-class PageStructureAPIView(APIView):
-    def get(self, request):
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            for pool in self.pools:
+                get_executor(pool).check()
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+async def arun_or_queue(request, result_fn, task, pid, *args):
+    """run_or_queue() for async views: `result_fn` is a coroutine function."""
+    if request.query_params.get("async") in ("1", "true"):
+        return await get_executor("fetch").run(queue_job, task, pid, *args)
+    body, status_code = await result_fn(pid, *args)
+    return Response(body, status=status_code)
+
+def run_or_queue(request, result_fn, task, pid, *args):
+    """
+    Answers with result_fn(pid, *args), or with ?async=1 queues the Celery
+    task and answers 202 with a job id to poll at /ask-ai/jobs/<job_id>/.
+    """
+    if request.query_params.get("async") in ("1", "true"):
+        return queue_job(task, pid, *args)
+    body, status_code = result_fn(pid, *args)
+    return Response(body, status=status_code)
+
+def queue_job(task, pid, *args):
+    """202 with the id of the queued Celery job, or 503 when the broker is unreachable."""
+    try:
+        job = task.delay(pid, *args)
+    except Exception as e:
+        return Response({"error": f"Could not queue job: {e}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return Response({"job_id": job.id, "status_url": reverse("job-status", args=[job.id])},
+                    status=status.HTTP_202_ACCEPTED)
+
+class PageStructureAPIView(AsyncAPIView):
+    async def get(self, request):
         pid = request.query_params.get("page_id")
         if not pid: return Response({"error":"page_id missing"}, status=status.HTTP_400_BAD_REQUEST)
-        try: p=Page.objects.get(id=pid)
+        try: p=await get_page(pid)
         except: return Response({"error":"Page not found"}, status=status.HTTP_404_NOT_FOUND)
         try:
-            html=json.load(open(p.html,"r",encoding="utf-8"))
-            css =json.load(open(p.css, "r",encoding="utf-8"))
-            img = base64.b64encode(open(p.screenshot,"rb").read()).decode()
+            html, css, img = await in_thread(load_page_inputs, p)
         except Exception as e:
             return Response({"error":str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         try:
-            rpt=describe_structure(img,html,css)
+            rpt=await describe_structure.aio(img,html,css)
         except Exception as e:
             return Response({"error":str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         return Response({"structure_report":rpt}, status=status.HTTP_200_OK)
 
-class PageStylingAPIView(APIView):
-    def get(self, request):
+class PageStylingAPIView(AsyncAPIView):
+    async def get(self, request):
         pid = request.query_params.get("page_id")
         if not pid:
             return Response({"error":"page_id missing"}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            p = Page.objects.get(id=pid)
+            p = await get_page(pid)
         except:
             return Response({"error":"Page not found"}, status=status.HTTP_404_NOT_FOUND)
         try:
-            html = json.load(open(p.html, "r", encoding="utf-8"))
-            css = json.load(open(p.css, "r", encoding="utf-8"))
-            img = base64.b64encode(open(p.screenshot, "rb").read()).decode()
+            html, css, img = await in_thread(load_page_inputs, p)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         try:
-            rpt = describe_styling(img, html, css)
+            rpt = await describe_styling.aio(img, html, css)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         return Response({"styling_report": rpt}, status=status.HTTP_200_OK)
     
 
-class PageUIReportAPIView(APIView):
-    def get(self, request):
+class PageUIReportAPIView(AsyncAPIView):
+    async def get(self, request):
         pid = request.query_params.get("page_id")
         if not pid:
             return Response({"error": "page_id missing"}, status=status.HTTP_400_BAD_REQUEST)
+        return await arun_or_queue(request, aui_report_result, ui_report_task, pid)
 
-        try:
-            page = Page.objects.get(id=pid)
-        except Page.DoesNotExist:
-            return Response({"error": "Page not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        try:
-            html = json.load(open(page.html, "r", encoding="utf-8"))
-            css = json.load(open(page.css, "r", encoding="utf-8"))
-            image = base64.b64encode(open(page.screenshot, "rb").read()).decode()
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        async def get_reports():
-            structure_task = run_async(describe_structure, image, html, css)
-            styling_task = run_async(describe_styling, image, html, css)
-            structure_report, styling_report = await asyncio.gather(structure_task, styling_task)
-            return {
-                "structure_report": structure_report,
-                "styling_report": styling_report
-            }
-
-        try:
-            report_data = asyncio.run(get_reports())
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        try:
-            page_id = str(page.id)
-            business_id = str(page.business.id)
-            folder_path = make_dir('UI-REPORTS', business_id)
-            file_path = os.path.join(folder_path, f'ui_report_{page_id}.json')
-
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(report_data, f, ensure_ascii=False, indent=2)
-
-            page.ui_report = file_path
-            page.save()
-
-        except Exception as e:
-            return Response({"error": f"Error saving report: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        return Response({
-            "ui_report": report_data,
-            "saved_path": file_path
-        }, status=status.HTTP_200_OK)
 
 # views.py  ─────────────────────────────────────────────────────────
-import os, json, base64, logging, requests
+import json, logging
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -127,229 +143,97 @@ from rest_framework import status
 
 log = logging.getLogger("ux_eval")    
 
-PAGE_TYPE_SLUG = {
-    "landing page":         "landing",
-    "landing":              "landing",
-    "search results page":  "search",
-    "search results":       "search",
-    "search":               "search",
-    "product page":         "product",
-    "product":              "product",
-}
-
-def page_type_slug(raw: str | None) -> str | None:
-    """Normalise DB value to slug key used in criteria.py."""
-    if not raw:
-        return None
-    return PAGE_TYPE_SLUG.get(raw.strip().lower())
+class EvaluateUIAPIView(AsyncAPIView):
+    """GET /ask-ai/evaluate-ui/?page_id=<id>"""
 
+    async def get(self, request):
+        pid = request.query_params.get("page_id")
+        if not pid:
+            return Response({"error": "page_id missing"}, status=status.HTTP_400_BAD_REQUEST)
+        return await arun_or_queue(request, aevaluate_ui_result, evaluate_ui_task, pid)
 
-class EvaluateUIAPIView(APIView):
-    """GET /ask-ai/evaluate-ui/?page_id=<id>"""
 
-    def get(self, request):
+class FormulateUIAPIView(AsyncAPIView):
+    async def get(self, request):
         pid = request.query_params.get("page_id")
         if not pid:
-            return Response({"error": "page_id missing"},
-                            status=status.HTTP_400_BAD_REQUEST)
+            return Response({"error":"page_id missing"}, status=status.HTTP_400_BAD_REQUEST)
+        body, status_code = await aformulate_ui_result(pid)
+        return Response(body, status=status_code)
+    
+    
+class LLMCacheAPIView(APIView):
+    """Hit/miss counters and size of the LLM response cache; DELETE empties it."""
+    permission_classes = [permissions.IsAdminUser]
 
-        try:
-            page = Page.objects.get(id=pid)
-        except Page.DoesNotExist:
-            return Response({"error": "Page not found"},
-                            status=status.HTTP_404_NOT_FOUND)
-
-        # Check if cached UI evaluation exists
-        if page.business:
-            eval_folder = make_dir('UI-EVALUATIONS', str(page.business.id))
-            eval_path = os.path.join(eval_folder, f'ui_evaluation_{pid}.json')
-            
-            if os.path.exists(eval_path):
-                try:
-                    with open(eval_path, "r", encoding="utf-8") as fh:
-                        evaluation = json.load(fh)
-                    log.info(f"page {pid} | evaluation loaded from cache")
-                    return Response({"evaluation": evaluation},
-                                    status=status.HTTP_200_OK)
-                except Exception as e:
-                    log.exception(f"page {pid} | cached evaluation processing error")
-                    # Continue to normal flow if there's an error processing cached evaluation
-
-        # First check if report exists in Records/UI-REPORTS/{business_id}
-        if page.business:
-            report_path = os.path.join('Records', 'UI-REPORTS', str(page.business.id), f'ui_report_{pid}.json')
-            if os.path.exists(report_path):
-                try:
-                    with open(report_path, "r", encoding="utf-8") as fh:
-                        report_data = json.load(fh)
-                    with open(page.screenshot, "rb") as img_fh:
-                        screenshot_b64 = base64.b64encode(img_fh.read()).decode()
-
-                    business_type = getattr(page.business, "category", "unknown")
-                    raw_type = getattr(page, "page_type", "")
-                    page_type = page_type_slug(raw_type)
-
-                    if not page_type:
-                        log.error(f"page {pid} | unknown page_type='{raw_type}'")
-                        return Response({"error": f"Unrecognised page_type '{raw_type}'"},
-                                    status=status.HTTP_400_BAD_REQUEST)
-
-                    evaluation = evaluate_ui(
-                        report_data,
-                        screenshot_b64,
-                        business_type,
-                        page_type,
-                    )
-                    
-                    # Cache the evaluation results
-                    try:
-                        with open(eval_path, "w", encoding="utf-8") as f:
-                            json.dump(evaluation, f, ensure_ascii=False, indent=2)
-                        log.info(f"page {pid} | evaluation cached successfully")
-                    except Exception as e:
-                        log.exception(f"page {pid} | failed to cache evaluation")
-                    
-                    log.info(f"page {pid} | evaluation OK (from cached report)")
-                    return Response({"evaluation": evaluation},
-                                status=status.HTTP_200_OK)
-                except Exception as e:
-                    log.exception(f"page {pid} | cached report processing error")
-                    # Continue to normal flow if there's an error processing cached report
-
-        # Original flow if no cached report exists or there was an error processing it
-        if not page.ui_report or not os.path.exists(page.ui_report):
-            try:
-                r = requests.get(
-                    f"http://proto-api-kg9r.onrender.com/ask-ai/describe-page/?page_id={pid}",
-                    timeout=(5, 180)          
-                )
-                if r.status_code != 200:
-                    log.error(f"page {pid} | report gen failed | {r.status_code}")
-                    return Response({"error": "Failed to generate UI report"},
-                                    status=status.HTTP_502_BAD_GATEWAY)
-                page.refresh_from_db()
-            except Exception as e:
-                log.exception(f"page {pid} | describe-page error")
-                return Response({"error": f"Error generating UI report: {e}"},
-                                status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        # Rest of the original logic
-        try:
-            with open(page.ui_report, "r", encoding="utf-8") as fh:
-                report_data = json.load(fh)
-            with open(page.screenshot, "rb") as img_fh:
-                screenshot_b64 = base64.b64encode(img_fh.read()).decode()
-        except Exception as e:
-            log.exception(f"page {pid} | file load error")
-            return Response({"error": f"File load failed: {e}"},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    def get(self, request):
+        return Response(get_llm_cache().stats(), status=status.HTTP_200_OK)
 
-        business_type = getattr(page.business, "category", "unknown")
-        raw_type = getattr(page, "page_type", "")
-        page_type = page_type_slug(raw_type)
+    def delete(self, request):
+        get_llm_cache().clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-        if not page_type:
-            log.error(f"page {pid} | unknown page_type='{raw_type}'")
-            return Response({"error": f"Unrecognised page_type '{raw_type}'"},
-                            status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            evaluation = evaluate_ui(
-                report_data,
-                screenshot_b64,
-                business_type,
-                page_type,
-            )
-            
-            # Cache the evaluation results
-            if page.business:
-                eval_folder = make_dir('UI-EVALUATIONS', str(page.business.id))
-                eval_path = os.path.join(eval_folder, f'ui_evaluation_{pid}.json')
-                try:
-                    with open(eval_path, "w", encoding="utf-8") as f:
-                        json.dump(evaluation, f, ensure_ascii=False, indent=2)
-                    log.info(f"page {pid} | evaluation cached successfully")
-                except Exception as e:
-                    log.exception(f"page {pid} | failed to cache evaluation")
-                    
-        except ValueError as ve:
-            log.warning(f"page {pid} | validation error | {ve}")
-            return Response({"error": "Evaluation category mismatch",
-                             "detail": str(ve)},
-                            status=status.HTTP_502_BAD_GATEWAY)
-        except Exception as e:
-            log.exception(f"page {pid} | evaluation crash")
-            return Response({"error": "Evaluation failed",
-                             "detail": str(e)},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+class LLMSchedulerAPIView(APIView):
+    """Per-model queue, retry and rate-limit counters of the LLM scheduler, with the capacity left."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(get_scheduler().stats(), status=status.HTTP_200_OK)
 
-        log.info(f"page {pid} | evaluation OK")
-        return Response({"evaluation": evaluation},
-                        status=status.HTTP_200_OK)
 
+class LLMGatewayAPIView(APIView):
+    """Per provider and model call counts and p50/p95 latency, and the agents currently sent to their fallback."""
+    permission_classes = [permissions.IsAdminUser]
 
-class FormulateUIAPIView(APIView):
     def get(self, request):
-        pid = request.query_params.get("page_id")
-        if not pid:
-            return Response({"error":"page_id missing"}, status=status.HTTP_400_BAD_REQUEST)
-        try:
-            page = Page.objects.get(id=pid)
-        except Page.DoesNotExist:
-            return Response({"error":"Page not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(get_gateway().stats(), status=status.HTTP_200_OK)
 
-        try:
-            evaluation = json.load(open(page.ui_report, "r", encoding="utf-8"))
-        except Exception as e:
-            return Response({"error":f"Could not read UI report: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class LLMUsageAPIView(APIView):
+    """
+    GET /ask-ai/llm-usage/?by=agent|business|endpoint|model|output&days=7
+    LLM calls, parse failures and retries, tokens, cost and p50/p95 latency
+    per group, most expensive first, with the state of the usage writer.
+    Admins only: it lists every business and its spend.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        by = request.query_params.get("by", "agent")
+        if by not in usage.GROUPS:
+            return Response({"error": f"by must be one of {', '.join(usage.GROUPS)}"}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            formatted = formulate_ui(evaluation)
-        except Exception as e:
-            return Response({"error":f"Formulation failed: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            days = float(request.query_params.get("days", 7))
+        except ValueError:
+            days = None
+        if days is None or not 0 <= days <= 3650:     # also rejects nan
+            return Response({"error": "days must be a number from 0 to 3650"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({**usage.report(by, days), "writer": usage.get_writer().stats()}, status=status.HTTP_200_OK)
 
-        business_id = str(page.business.id)
-        folder = make_dir('UI-FORMATS', business_id)
-        file_path = os.path.join(folder, f'formatted_report_{pid}.txt')
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(formatted)
-        page.formatted_report = file_path
-        page.save()
 
-        return Response({"formatted_report": formatted, "saved_path": file_path}, status=status.HTTP_200_OK)
-    
-    
-class EvaluateUBAAPIView(APIView):
+class UIPipelineAPIView(APIView):
+    """
+    Runs the whole UI chain for a page (artifacts → UI report → evaluation →
+    formatted report), skipping stages whose inputs did not change, and
+    answers with per-stage status and timings. ?force=1 reruns everything.
+    """
     def get(self, request):
         pid = request.query_params.get("page_id")
         if not pid:
-            return Response({"error":"page_id missing"}, status=400)
-
-        try:
-            up = Upload.objects.get(references_page_id=pid)
-        except Upload.DoesNotExist:
-            return Response({"error":"Upload not found"}, status=404)
-
-        try:
-            result = evaluate_uba(up.path)
-        except Exception as e:
-            return Response({"error":str(e)}, status=500)
+            return Response({"error": "page_id missing"}, status=status.HTTP_400_BAD_REQUEST)
+        force = request.query_params.get("force") in ("1", "true")
+        return run_or_queue(request, pipeline_result, ui_pipeline_task, pid, force)
 
-        # Get the business ID from the page instance
-        page = up.references_page
-        if not page or not page.business:
-            return Response({"error": "Page or business not found"}, status=404)
 
-        folder = make_dir('UBA-REPORTS', str(page.business.id))
-        file_path = os.path.join(folder, f'uba_report_{pid}.json')
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump({"report": result}, f, ensure_ascii=False, indent=2)
+class EvaluateUBAAPIView(AsyncAPIView):
+    async def get(self, request):
+        pid = request.query_params.get("page_id")
+        if not pid:
+            return Response({"error": "page_id missing"}, status=400)
+        return await arun_or_queue(request, aevaluate_uba_result, evaluate_uba_task, pid)
 
-        up.uba_report = file_path
-        up.save()
 
-        return Response({"uba_report": result, "saved_path": file_path}, status=200)
-    
 BULLET_REGEX = re.compile(r'^\d+\.\s*(.+)')
 CONFIG_REGEX = re.compile(r'^\$(\{.*\})$')
 
@@ -371,82 +255,18 @@ def slugify(text: str) -> str:
     return re.sub(r"[-\s]+", "-", text) or "chart"
 
 
-PROBLEM_RE = re.compile(
-    r"(?m)^\s*1\s*-\s*Problem[:;]\s*(.+?)(?=\n\s*\d+\s*-\s*(?:Problem|Analysis|Solution)|\Z)"
-)
-
-class UBAProblemSolutionsAPIView(APIView):
+class UBAProblemSolutionsAPIView(AsyncAPIView):
     """
     GET /api/uba-problem-solutions/?page_id=<page_id>
     """
-    def get(self, request):
+    async def get(self, request):
         pid = request.query_params.get("page_id")
         if not pid:
             return Response({"error": "page_id missing"}, status=400)
+        return await arun_or_queue(request, auba_solutions_result, uba_solutions_task, pid)
 
-        try:
-            up = Upload.objects.get(references_page_id=pid)
-        except Upload.DoesNotExist:
-            return Response({"error": "Upload not found"}, status=404)
-
-        if not up.uba_report or not os.path.exists(up.uba_report):
-            return Response({"error": "No UBA report found"}, status=404)
-
-        # Check if cached solutions exist
-        page = up.references_page
-        if page and page.business:
-            solutions_folder = make_dir('UBA-SOLUTIONS', str(page.business.id))
-            solutions_path = os.path.join(solutions_folder, f'uba_solutions_{pid}.json')
-            
-            if os.path.exists(solutions_path):
-                try:
-                    with open(solutions_path, 'r', encoding='utf-8') as f:
-                        cached_results = json.load(f)
-                    log.info(f"page {pid} | UBA solutions loaded from cache")
-                    return Response({"results": cached_results}, status=200)
-                except Exception as e:
-                    log.exception(f"page {pid} | cached UBA solutions processing error")
-                    # Continue to normal flow if error processing cached solutions
-
-        with open(up.uba_report, encoding="utf-8") as f:
-            report_text = json.load(f).get("report", "")
-
-        problems = PROBLEM_RE.findall(report_text)
-        if not problems:
-            return Response({"error": "No problem clauses found"}, status=400)
-
-        results = []
-        for clause in problems:
-            try:
-                resources = web_search_agent(clause.strip())
-            except Exception as e:
-                resources = [{"source": None, "summary": f"agent error: {e}"}]
-
-            results.append({
-                "problem": clause.strip(),
-                "solutions": resources
-            })
-
-        # Cache the solutions
-        if page and page.business:
-            solutions_folder = make_dir('UBA-SOLUTIONS', str(page.business.id))
-            solutions_path = os.path.join(solutions_folder, f'uba_solutions_{pid}.json')
-            try:
-                with open(solutions_path, 'w', encoding='utf-8') as f:
-                    json.dump(results, f, ensure_ascii=False, indent=2)
-                log.info(f"page {pid} | UBA solutions cached successfully")
-                
-                # Store the path in the Upload model if it has a field for it
-                if hasattr(up, 'uba_solutions'):
-                    up.uba_solutions = solutions_path
-                    up.save()
-            except Exception as e:
-                log.exception(f"page {pid} | failed to cache UBA solutions")
-
-        return Response({"results": results}, status=200)
-
-
-class EvaluateWebMetricsAPIView(APIView):
+
+class EvaluateWebMetricsAPIView(AsyncAPIView):
     """
     Accepts JSON body of the form:
     {
@@ -461,7 +281,7 @@ class EvaluateWebMetricsAPIView(APIView):
     }
     Returns the WebMetricsAdvisor JSON.
     """
-    def post(self, request):
+    async def post(self, request):
         # grab the only metrics object in the body
         try:
             raw_metrics = next(iter(request.data.values()))
@@ -474,7 +294,7 @@ class EvaluateWebMetricsAPIView(APIView):
             )
 
         try:
-            result_text = evaluate_web_metrics(raw_metrics)
+            result_text = await evaluate_web_metrics.aio(raw_metrics)
             result_json = json.loads(result_text)
         except Exception as e:
             return Response(
@@ -485,60 +305,15 @@ class EvaluateWebMetricsAPIView(APIView):
         return Response({"web_metrics_report": result_json}, status=status.HTTP_200_OK)
 
 
-class FormulateUBAAPIView(APIView):
-    def get(self, request):
+class FormulateUBAAPIView(AsyncAPIView):
+    async def get(self, request):
         pid = request.query_params.get("page_id")
         if not pid:
             return Response({"error": "page_id missing"}, status=status.HTTP_400_BAD_REQUEST)
+        return await arun_or_queue(request, auba_formulation_result, uba_formulation_task, pid)
 
-        try:
-            up = Upload.objects.get(references_page_id=pid)
-        except Upload.DoesNotExist:
-            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        if not up.uba_report or not os.path.exists(up.uba_report):
-            return Response({"error": "UBA report not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        # Check if formulation already exists
-        formulation_dir = os.path.join('Records', 'UBA-FORMULATIONS', str(up.references_page.business.id))
-        formulation_path = os.path.join(formulation_dir, f'uba_formulation_{pid}.json')
-        
-        if os.path.exists(formulation_path):
-            try:
-                with open(formulation_path, 'r', encoding='utf-8') as f:
-                    stored_formulation = json.load(f)
-                return Response(
-                    {"uba_formulation": stored_formulation, "saved_path": formulation_path},
-                    status=status.HTTP_200_OK
-                )
-            except json.JSONDecodeError:
-                # If stored file is corrupted, continue to generate new formulation
-                pass
-
-        # If no stored formulation exists or it's corrupted, generate new one
-        with open(up.uba_report, "r", encoding="utf-8") as f:
-            raw = json.load(f).get("report")
-
-        try:
-            formulation = uba_formulator(raw)   # now a dict
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        # save JSON
-        os.makedirs(formulation_dir, exist_ok=True)
-        with open(formulation_path, "w", encoding="utf-8") as f:
-            json.dump(formulation, f, ensure_ascii=False, indent=2)
 
-        # persist path (ensure your model has this field)
-        up.uba_formulation_report = formulation_path
-        up.save()
-
-        return Response(
-            {"uba_formulation": formulation, "saved_path": formulation_path},
-            status=status.HTTP_200_OK
-        )
-    
-class ChatAPIView(APIView):
+class ChatAPIView(AsyncAPIView):
     """
     POST /ask-ai/chat/
     Body JSON:
@@ -550,7 +325,7 @@ class ChatAPIView(APIView):
         ]
       }
     """
-    def post(self, request):
+    async def post(self, request):
         data      = request.data or {}
         user_msgs = data.get("messages", [])
         persona   = (data.get("persona") or "").strip()
@@ -573,9 +348,29 @@ class ChatAPIView(APIView):
         log.debug(f"[ChatAPIView] Payload to agent: {full_msgs}")
 
         try:
-            reply = agents.chat_completion(full_msgs)
+            reply = await agents.chat_completion.aio(full_msgs)
         except Exception as e:
             log.error(f"[ChatAPIView] chat_completion failed: {e}", exc_info=True)
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        return Response({"reply": reply}, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response({"reply": reply}, status=status.HTTP_200_OK)
+
+class JobStatusAPIView(APIView):
+    """
+    GET /ask-ai/jobs/<job_id>/
+    Status of a job queued with ?async=1; once finished, `result` and
+    `result_status` are the body and status the synchronous call returns.
+    Unknown ids report "pending" (the result backend cannot tell them apart).
+    """
+    STATES = {"PENDING": "pending", "RECEIVED": "pending", "STARTED": "running", "RETRY": "running",
+              "SUCCESS": "done", "FAILURE": "failed", "REVOKED": "failed"}
+
+    def get(self, request, job_id):
+        job = AsyncResult(job_id)
+        data = {"job_id": job_id, "status": self.STATES.get(job.state, job.state.lower())}
+        if job.state == "SUCCESS":
+            data["result"] = job.result["body"]
+            data["result_status"] = job.result["status_code"]
+        elif job.state in ("FAILURE", "REVOKED"):
+            data["error"] = str(job.result)
+        return Response(data, status=status.HTTP_200_OK)
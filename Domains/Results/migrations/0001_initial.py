@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('Onboard', '0002_pagebuildjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('agent', models.CharField(max_length=64)),
+                ('provider', models.CharField(blank=True, max_length=32)),
+                ('model', models.CharField(max_length=100)),
+                ('endpoint', models.CharField(blank=True, max_length=100)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('completion_tokens', models.PositiveIntegerField(default=0)),
+                ('latency_ms', models.PositiveIntegerField(default=0)),
+                ('cached', models.BooleanField(default=False)),
+                ('fallback', models.BooleanField(default=False)),
+                ('cost_usd', models.DecimalField(blank=True, decimal_places=6, max_digits=12, null=True)),
+                ('business', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='llm_calls', to='Onboard.business')),
+                ('page', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='llm_calls', to='Onboard.page')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['agent', 'created_at'], name='Results_llm_agent_c9d25e_idx'), models.Index(fields=['business', 'created_at'], name='Results_llm_busines_e4faf2_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Results', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmcall',
+            name='parse_failed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='llmcall',
+            name='retry',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='llmcall',
+            name='structured',
+            field=models.BooleanField(default=False),
+        ),
+    ]
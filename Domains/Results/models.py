@@ -0,0 +1,34 @@
+from django.db import models
+from django.utils import timezone
+
+
+class LLMCall(models.Model):
+    """One LLM agent call: its tokens, latency, cost and origin (Domains/Results/LLMs/usage.py)."""
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    agent = models.CharField(max_length=64)
+    provider = models.CharField(max_length=32, blank=True)
+    model = models.CharField(max_length=100)
+    endpoint = models.CharField(max_length=100, blank=True)
+    # no constraints: rows are inserted in batches after the fact, and accounting outlives deleted pages
+    business = models.ForeignKey("Onboard.Business", null=True, blank=True, on_delete=models.DO_NOTHING,
+                                 db_constraint=False, related_name="llm_calls")
+    page = models.ForeignKey("Onboard.Page", null=True, blank=True, on_delete=models.DO_NOTHING,
+                             db_constraint=False, related_name="llm_calls")
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    latency_ms = models.PositiveIntegerField(default=0)
+    cached = models.BooleanField(default=False)
+    fallback = models.BooleanField(default=False)
+    structured = models.BooleanField(default=False)     # answer constrained to a JSON schema (LLMs/schemas.py)
+    parse_failed = models.BooleanField(default=False)   # the agent could not parse the answer
+    retry = models.BooleanField(default=False)          # re-asked after an unparseable answer
+    cost_usd = models.DecimalField(max_digits=12, decimal_places=6, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["agent", "created_at"]),
+            models.Index(fields=["business", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.agent} ({self.model}) at {self.created_at:%Y-%m-%d %H:%M:%S}"
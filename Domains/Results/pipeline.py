@@ -0,0 +1,299 @@
+"""
+UI pipeline orchestrator.
+
+The UI report chain as a small DAG run in-process:
+
+    page ─┬─ html ───────┬─ structure ─┬─ ui_report ─ evaluate_ui ─ formulate_ui
+          ├─ css ────────┤             │                 │
+          └─ screenshot ─┴─ styling ───┘                 │
+                 └───────────────────────────────────────┘
+
+(with UI_REPORT_MODE = "combined", one "describe" stage replaces
+structure + styling)
+
+Each Stage names the stages it reads from and runs as soon as they are
+done, so independent stages (html/css/screenshot, structure/styling) run
+side by side. A stage's input hash covers its inputs' outputs; when it
+matches the hash recorded in the page's manifest and the stage's stored
+output is still there, the stage is skipped. Source stages that revalidate
+themselves (the page download, the stylesheets) always run. Every run
+returns, and stores in the manifest, per-stage status and timings.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import Callable
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+from rest_framework import status
+
+from Domains.Onboard.models import Page
+from Domains.Results.LLMs.agents import describe_page, describe_structure, describe_styling, evaluate_ui, formulate_ui
+from Domains.Results.LLMs.usage import tag_page
+from Domains.Results.services import (
+    evaluation_screenshot, fingerprint_inputs, formatted_report_path, page_type_slug, save_fingerprint,
+    ui_evaluation_path, ui_report_path,
+)
+from Domains.Toolkit.executors import get_executor
+from Domains.Toolkit.page_cache import fetch_page
+from Domains.Toolkit.screenshots import load_screenshot
+from Domains.Toolkit.services import (
+    build_css_artifact, build_html_artifact, html_artifact_path, load_json, load_text, save_json, save_screenshot,
+    save_text, screenshot_artifact_path,
+)
+
+log = logging.getLogger("ux_eval")
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable                     # run(page, inputs) -> output; inputs maps required stage -> output
+    requires: tuple = ()
+    load: Callable | None = None      # load(page) -> stored output or None; stages without one never skip
+    fingerprint: Callable | None = None  # output -> hash; defaults to output_hash()
+    always: bool = False              # source stages that revalidate themselves on every run
+
+
+def output_hash(value):
+    if isinstance(value, bytes):
+        data = value
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+    else:
+        data = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def input_hash(stage, hashes):
+    key = json.dumps([stage.name, [(name, hashes[name]) for name in stage.requires]])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+# ── artifacts ────────────────────────────────────────────────────────────────
+
+def stage_output_path(page, name):
+    return os.path.join("Records", "PIPELINE", str(page.business.id), str(page.id), f"{name}.json")
+
+
+def manifest_path(page):
+    return os.path.join("Records", "PIPELINE", str(page.business.id), str(page.id), "manifest.json")
+
+
+# ── stages ───────────────────────────────────────────────────────────────────
+
+def _page(page, inputs):
+    snapshot = fetch_page(page.url)
+    snapshot.raise_for_status()
+    return snapshot
+
+
+def _html(page, inputs):
+    return build_html_artifact(page, refresh=True, snapshot=inputs["page"])[0]
+
+
+def _css(page, inputs):
+    return build_css_artifact(page, snapshot=inputs["page"])[0]
+
+
+def _screenshot(page, inputs):
+    return load_screenshot(save_screenshot(page))
+
+
+def _load_screenshot(page):
+    path = screenshot_artifact_path(page)
+    return load_screenshot(path) if os.path.exists(path) else None
+
+
+def _structure(page, inputs):
+    report = describe_structure(inputs["screenshot"], inputs["html"], inputs["css"])
+    save_json(stage_output_path(page, "structure"), report)
+    return report
+
+
+def _styling(page, inputs):
+    report = describe_styling(inputs["screenshot"], inputs["html"], inputs["css"])
+    save_json(stage_output_path(page, "styling"), report)
+    return report
+
+
+def _describe(page, inputs):
+    reports = describe_page(inputs["screenshot"], inputs["html"], inputs["css"])
+    save_json(stage_output_path(page, "describe"), reports)
+    return reports
+
+
+def _ui_report(page, inputs):
+    report_data = inputs.get("describe") or {
+        "structure_report": inputs["structure"],
+        "styling_report": inputs["styling"],
+    }
+    file_path = ui_report_path(page)
+    save_json(file_path, report_data)
+    save_fingerprint(file_path, fingerprint_inputs(inputs["html"], inputs["screenshot"]))
+    page.ui_report = file_path
+    page.save(update_fields=["ui_report"])
+    return report_data
+
+
+def _evaluate_ui(page, inputs):
+    raw_type = getattr(page, "page_type", "")
+    page_type = page_type_slug(raw_type)
+    if not page_type:
+        raise ValueError(f"Unrecognised page_type '{raw_type}'")
+    business_type = getattr(page.business, "category", "unknown")
+    screenshot = evaluation_screenshot(inputs["screenshot"], inputs["html"], page_type)
+    evaluation = evaluate_ui(inputs["ui_report"], screenshot, business_type, page_type)
+    save_json(ui_evaluation_path(page), evaluation)
+    save_fingerprint(ui_evaluation_path(page), fingerprint_inputs(inputs["html"], inputs["screenshot"]))
+    return evaluation
+
+
+def _formulate_ui(page, inputs):
+    formatted = formulate_ui(inputs["evaluate_ui"])
+    save_text(formatted_report_path(page), formatted)
+    return formatted
+
+
+SOURCE_STAGES = (
+    Stage("page", _page, always=True, fingerprint=lambda snapshot: snapshot.content_hash),
+    Stage("html", _html, ("page",), load=lambda page: load_json(html_artifact_path(page))),
+    Stage("css", _css, ("page",), always=True),
+    Stage("screenshot", _screenshot, ("page",), load=_load_screenshot,
+          fingerprint=lambda screenshot: screenshot.content_hash),
+)
+
+SEPARATE_DESCRIBE_STAGES = (
+    Stage("structure", _structure, ("html", "css", "screenshot"),
+          load=lambda page: load_json(stage_output_path(page, "structure"))),
+    Stage("styling", _styling, ("html", "css", "screenshot"),
+          load=lambda page: load_json(stage_output_path(page, "styling"))),
+    Stage("ui_report", _ui_report, ("structure", "styling", "html", "screenshot"),
+          load=lambda page: load_json(ui_report_path(page))),
+)
+
+COMBINED_DESCRIBE_STAGES = (
+    Stage("describe", _describe, ("html", "css", "screenshot"),
+          load=lambda page: load_json(stage_output_path(page, "describe"))),
+    Stage("ui_report", _ui_report, ("describe", "html", "screenshot"),
+          load=lambda page: load_json(ui_report_path(page))),
+)
+
+EVALUATION_STAGES = (
+    Stage("evaluate_ui", _evaluate_ui, ("ui_report", "screenshot", "html"),
+          load=lambda page: load_json(ui_evaluation_path(page))),
+    Stage("formulate_ui", _formulate_ui, ("evaluate_ui",),
+          load=lambda page: load_text(formatted_report_path(page))),
+)
+
+
+def ui_pipeline():
+    """The UI stages, describing the page in one call or two per UI_REPORT_MODE."""
+    combined = getattr(settings, "UI_REPORT_MODE", "separate") == "combined"
+    describe = COMBINED_DESCRIBE_STAGES if combined else SEPARATE_DESCRIBE_STAGES
+    return SOURCE_STAGES + describe + EVALUATION_STAGES
+
+
+# ── engine ───────────────────────────────────────────────────────────────────
+
+def load_manifest(page):
+    return load_json(manifest_path(page)) or {"stages": {}}
+
+
+def _run_stage(stage, page, inputs, previous, force):
+    """Runs or skips one stage; returns (output, input_hash, record)."""
+    close_old_connections()
+    started = time.perf_counter()
+    key = input_hash(stage, {name: value[1] for name, value in inputs.items()})
+    try:
+        if not (force or stage.always) and stage.load and previous.get("input_hash") == key:
+            output = stage.load(page)
+            if output is not None:
+                return output, key, {"status": "skipped", "ms": _elapsed_ms(started)}
+        output = stage.run(page, {name: value[0] for name, value in inputs.items()})
+        return output, key, {"status": "ran", "ms": _elapsed_ms(started)}
+    except Exception as e:
+        log.exception(f"page {page.id} | pipeline stage {stage.name} failed")
+        return None, key, {"status": "failed", "ms": _elapsed_ms(started), "error": str(e)}
+    finally:
+        connection.close()
+
+
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def run_pipeline(page, stages=None, force=False):
+    """
+    Runs `stages` (ui_pipeline() by default) for the page, each as soon as the stages it requires are
+    done, and returns the run record:
+
+        {"page_id", "started_at", "total_ms",
+         "stages": {name: {"status": "ran"|"skipped"|"failed"|"blocked", "ms", "error"?}}}
+
+    force=True reruns every stage regardless of its input hash. Stages
+    downstream of a failure are "blocked".
+    """
+    stages = stages or ui_pipeline()
+    manifest = load_manifest(page)
+    outputs, records = {}, {}
+    pending = list(stages)
+    started, started_at = time.perf_counter(), timezone.now().isoformat()
+
+    # stages run in the shared "llm" pool (Domains/Toolkit/executors.py), at most PIPELINE_WORKERS of this page at a time
+    pool, workers = get_executor("llm"), getattr(settings, "PIPELINE_WORKERS", 4)
+    running = {}
+    while pending or running:
+        for stage in list(pending):
+            if any(name in records and name not in outputs for name in stage.requires):
+                records[stage.name] = {"status": "blocked", "ms": 0}
+                pending.remove(stage)
+            elif all(name in outputs for name in stage.requires) and len(running) < workers:
+                inputs = {name: outputs[name] for name in stage.requires}
+                previous = manifest["stages"].get(stage.name, {})
+                running[pool.submit(_run_stage, stage, page, inputs, previous, force)] = stage
+                pending.remove(stage)
+        if not running:
+            break
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            stage = running.pop(future)
+            output, key, records[stage.name] = future.result()
+            if records[stage.name]["status"] == "failed":
+                continue
+            fingerprint = (stage.fingerprint or output_hash)(output)
+            outputs[stage.name] = (output, fingerprint)
+            manifest["stages"][stage.name] = {"input_hash": key, "output_hash": fingerprint}
+
+    run = {
+        "page_id": page.id,
+        "started_at": started_at,
+        "total_ms": _elapsed_ms(started),
+        "stages": {stage.name: records[stage.name] for stage in stages if stage.name in records},
+    }
+    manifest["last_run"] = run
+    save_json(manifest_path(page), manifest)
+    log.info(f"page {page.id} | pipeline {run['total_ms']}ms | "
+             + ", ".join(f"{name}={r['status']}" for name, r in run["stages"].items()))
+    return run
+
+
+def pipeline_result(pid, force=False):
+    """Runs the UI pipeline for a page; answers like the Results endpoints."""
+    try:
+        page = Page.objects.select_related("business").get(id=pid)
+    except Page.DoesNotExist:
+        return {"error": "Page not found"}, status.HTTP_404_NOT_FOUND
+    if not page.business:
+        return {"error": "Page or business not found"}, status.HTTP_404_NOT_FOUND
+
+    tag_page(page)
+    run = run_pipeline(page, force=force)
+    failed = [name for name, r in run["stages"].items() if r["status"] in ("failed", "blocked")]
+    return {"pipeline": run, "failed_stages": failed}, status.HTTP_200_OK if not failed else status.HTTP_502_BAD_GATEWAY
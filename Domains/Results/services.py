@@ -0,0 +1,534 @@
+"""
+Report services.
+
+The LLM report steps behind the Results endpoints as plain functions, so
+views and background jobs (Domains/Results/tasks.py) call them in-process
+instead of requesting their own public URL. abuild_ui_report() raises on
+failure; the a*_result() coroutines return (payload, status_code) exactly as
+the matching endpoint responds. They await the LLM calls on the async
+client, so the async views hold no thread per call; the *_result()
+functions run them for sync callers such as Celery tasks.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from rest_framework import status
+
+from Domains.ManageData.models import Upload
+from Domains.Onboard.models import Page
+from Domains.Results.LLMs.agents import (
+    UnparseableAnswer, describe_page, describe_structure, describe_styling, evaluate_uba, evaluate_ui, formulate_ui,
+    uba_formulator, web_search_agent,
+)
+from Domains.Results.LLMs import criteria
+from Domains.Results.LLMs.payloads import full_html_extract
+from Domains.Results.LLMs.usage import tag_page
+from Domains.Toolkit.executors import get_executor
+from Domains.Toolkit.fingerprints import page_fingerprint, similarity
+from Domains.Toolkit.page_cache import fingerprint_path, previous_artifact_path
+from Domains.Toolkit.regions import region_screenshot
+from Domains.Toolkit.screenshots import load_screenshot
+from Domains.Toolkit.services import load_json, load_json_strict, save_json, save_text
+
+log = logging.getLogger("ux_eval")
+
+PAGE_TYPE_SLUG = {
+    "landing page":         "landing",
+    "landing":              "landing",
+    "search results page":  "search",
+    "search results":       "search",
+    "search":               "search",
+    "product page":         "product",
+    "product":              "product",
+}
+
+PROBLEM_RE = re.compile(
+    r"(?m)^\s*1\s*-\s*Problem[:;]\s*(.+?)(?=\n\s*\d+\s*-\s*(?:Problem|Analysis|Solution)|\Z)"
+)
+
+def make_dir(*parts):
+    path = os.path.join('Records', *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def page_type_slug(raw: str | None) -> str | None:
+    """Normalise DB value to slug key used in criteria.py."""
+    if not raw:
+        return None
+    return PAGE_TYPE_SLUG.get(raw.strip().lower())
+
+
+def load_page_inputs(page):
+    """Returns (html_extract, css_extract, screenshot) from the page's artifacts."""
+    return load_json_strict(page.html), load_json_strict(page.css), load_screenshot(page.screenshot)
+
+
+def evaluation_screenshot(screenshot, html_extract, page_type):
+    """
+    What evaluate_ui is shown: with EVALUATE_UI_IMAGES = "regions", the
+    crops the page type's criteria look at (criteria.REGIONS_BY_CRITERION);
+    otherwise the whole screenshot.
+    """
+    if getattr(settings, "EVALUATE_UI_IMAGES", "page") != "regions" or not html_extract:
+        return screenshot
+    keys = list(criteria.CRITERIA_BY_PAGE_TYPE["global"]) + list(criteria.CRITERIA_BY_PAGE_TYPE[page_type])
+    names = [name for key in keys for name in criteria.REGIONS_BY_CRITERION.get(key, ())]
+    return region_screenshot(screenshot, full_html_extract(html_extract), names)
+
+
+def _stored_html(page):
+    return load_json(page.html) if page.html else None
+
+
+def ui_report_path(page):
+    return os.path.join('Records', 'UI-REPORTS', str(page.business.id), f'ui_report_{page.id}.json')
+
+
+def ui_evaluation_path(page):
+    return os.path.join('Records', 'UI-EVALUATIONS', str(page.business.id), f'ui_evaluation_{page.id}.json')
+
+
+def formatted_report_path(page):
+    return os.path.join('Records', 'UI-FORMATS', str(page.business.id), f'formatted_report_{page.id}.txt')
+
+
+def fingerprint_inputs(html_extract, screenshot):
+    """page_fingerprint() of the inputs a report is built from, or None if it cannot be computed."""
+    try:
+        return page_fingerprint(full_html_extract(html_extract), screenshot)
+    except Exception:
+        log.exception("page fingerprint failed")
+        return None
+
+
+def current_fingerprint(page):
+    """Fingerprint of the page's stored HTML extract and screenshot, or None when either is missing."""
+    html = _stored_html(page)
+    if html is None or not page.screenshot or not os.path.exists(page.screenshot):
+        return None
+    return fingerprint_inputs(html, load_screenshot(page.screenshot))
+
+
+def save_fingerprint(artifact_path, fingerprint):
+    if fingerprint:
+        save_json(fingerprint_path(artifact_path), fingerprint)
+
+
+def reuse_artifact(path, fingerprint):
+    """
+    (data, similarity) of the JSON artifact at `path`, or of the one
+    invalidate_derived_artifacts set aside, if it was built from a page
+    within the similarity thresholds of `fingerprint`; (None, None)
+    otherwise. A reused previous artifact is moved back into place.
+    """
+    if not fingerprint:
+        return None, None
+    for candidate in (path, previous_artifact_path(path)):
+        data = load_json(candidate)
+        if data is None:
+            continue
+        similar, detail = similarity(load_json(fingerprint_path(candidate)), fingerprint)
+        if not similar:
+            continue
+        if candidate != path:
+            os.replace(candidate, path)
+            os.replace(fingerprint_path(candidate), fingerprint_path(path))
+        return data, detail
+    return None, None
+
+
+def _legacy_artifact(path):
+    """Artifacts written before fingerprints existed are still served as they are."""
+    return load_json(path) if not os.path.exists(fingerprint_path(path)) else None
+
+
+def _reusable_artifact(path, fingerprint):
+    """reuse_artifact(), falling back to an artifact written before fingerprints existed."""
+    data, detail = reuse_artifact(path, fingerprint)
+    if data is None:
+        data = _legacy_artifact(path)
+    return data, detail
+
+
+async def in_thread(fn, *args, pool="parse"):
+    """Runs blocking file or image work off the event loop, in a bounded pool (Domains/Toolkit/executors.py)."""
+    return await get_executor(pool).run(fn, *args)
+
+
+async def get_page(pid):
+    """The page, which the LLM calls of the request are then accounted to (usage.py)."""
+    page = await Page.objects.select_related("business").aget(id=pid)
+    tag_page(page)
+    return page
+
+
+async def adescribe_ui(image, html, css):
+    """
+    {"structure_report", "styling_report"} for the page inputs: one combined
+    call when UI_REPORT_MODE is "combined", otherwise describe_structure and
+    describe_styling concurrently.
+    """
+    if getattr(settings, "UI_REPORT_MODE", "separate") == "combined":
+        return await describe_page.aio(image, html, css)
+    structure, styling = await asyncio.gather(
+        describe_structure.aio(image, html, css),
+        describe_styling.aio(image, html, css),
+    )
+    return {
+        "structure_report": structure,
+        "styling_report": styling
+    }
+
+
+def _save_ui_report(page, report_data, html, image):
+    file_path = ui_report_path(page)
+    save_json(file_path, report_data)
+    save_fingerprint(file_path, fingerprint_inputs(html, image))
+    return file_path
+
+
+async def abuild_ui_report(page):
+    """
+    Describes the page's structure and styling (see adescribe_ui), saves
+    {"structure_report", "styling_report"} to Records/UI-REPORTS/ and points
+    page.ui_report at it. Returns (report_data, file_path).
+    """
+    html, css, image = await in_thread(load_page_inputs, page)
+    report_data = await adescribe_ui(image, html, css)
+    file_path = await in_thread(_save_ui_report, page, report_data, html, image)
+
+    page.ui_report = file_path
+    await page.asave()
+    return report_data, file_path
+
+
+async def aui_report_result(pid):
+    """
+    Builds and saves the UI report (structure + styling) of a page, or
+    reuses the previous one when the page looks the same (see
+    reuse_artifact).
+    """
+    try:
+        page = await get_page(pid)
+    except Page.DoesNotExist:
+        return {"error": "Page not found"}, status.HTTP_404_NOT_FOUND
+
+    if page.business:
+        file_path = ui_report_path(page)
+        fingerprint = await in_thread(current_fingerprint, page)
+        report_data, detail = await in_thread(reuse_artifact, file_path, fingerprint)
+        if report_data is not None:
+            log.info(f"page {pid} | UI report reused | {detail}")
+            page.ui_report = file_path
+            await page.asave(update_fields=["ui_report"])
+            return {
+                "ui_report": report_data,
+                "saved_path": file_path,
+                "reused": True,
+                "similarity": detail,
+            }, status.HTTP_200_OK
+
+    try:
+        report_data, file_path = await abuild_ui_report(page)
+    except Exception as e:
+        return {"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+    return {
+        "ui_report": report_data,
+        "saved_path": file_path,
+        "reused": False
+    }, status.HTTP_200_OK
+
+
+def ui_report_result(pid):
+    """aui_report_result() for sync callers (Celery tasks)."""
+    return async_to_sync(aui_report_result)(pid)
+
+
+def _evaluation_screenshot_of(page, page_type):
+    return evaluation_screenshot(load_screenshot(page.screenshot), _stored_html(page), page_type)
+
+
+def _save_evaluation(pid, eval_path, evaluation, fingerprint):
+    # Cache the evaluation results
+    try:
+        save_json(eval_path, evaluation)
+        save_fingerprint(eval_path, fingerprint)
+        log.info(f"page {pid} | evaluation cached successfully")
+    except Exception as e:
+        log.exception(f"page {pid} | failed to cache evaluation")
+
+
+async def aevaluate_ui_result(pid):
+    """
+    UI evaluation of a page, reusing the stored evaluation or UI report
+    while the page looks the same as when they were built (see
+    reuse_artifact).
+    """
+    try:
+        page = await get_page(pid)
+    except Page.DoesNotExist:
+        return {"error": "Page not found"}, status.HTTP_404_NOT_FOUND
+
+    fingerprint = await in_thread(current_fingerprint, page) if page.business else None
+    stale_report = False
+
+    # Check if a reusable UI evaluation exists
+    if page.business:
+        eval_path = ui_evaluation_path(page)
+
+        evaluation, detail = await in_thread(_reusable_artifact, eval_path, fingerprint)
+        if evaluation is not None:
+            log.info(f"page {pid} | evaluation reused | {detail}")
+            return {"evaluation": evaluation, "reused": True, "similarity": detail}, status.HTTP_200_OK
+
+    business_type = getattr(page.business, "category", "unknown")
+    raw_type = getattr(page, "page_type", "")
+    page_type = page_type_slug(raw_type)
+
+    # First check if a reusable report exists in Records/UI-REPORTS/{business_id}
+    if page.business:
+        report_path = os.path.join('Records', 'UI-REPORTS', str(page.business.id), f'ui_report_{pid}.json')
+        report_data, _ = await in_thread(_reusable_artifact, report_path, fingerprint)
+        stale_report = report_data is None and os.path.exists(report_path)
+        if report_data is not None:
+            try:
+                if not page_type:
+                    log.error(f"page {pid} | unknown page_type='{raw_type}'")
+                    return {"error": f"Unrecognised page_type '{raw_type}'"}, status.HTTP_400_BAD_REQUEST
+
+                screenshot = await in_thread(_evaluation_screenshot_of, page, page_type)
+                evaluation = await evaluate_ui.aio(report_data, screenshot, business_type, page_type)
+                await in_thread(_save_evaluation, pid, eval_path, evaluation, fingerprint)
+
+                log.info(f"page {pid} | evaluation OK (from cached report)")
+                return {"evaluation": evaluation, "reused": False}, status.HTTP_200_OK
+            except UnparseableAnswer as e:
+                # evaluate_ui has already asked again; the flow below would send the same report once more
+                log.warning(f"page {pid} | validation error | {e}")
+                return {"error": "Evaluation category mismatch",
+                        "detail": str(e)}, status.HTTP_502_BAD_GATEWAY
+            except Exception as e:
+                log.exception(f"page {pid} | cached report processing error")
+                # Continue to normal flow if there's an error processing cached report
+
+    # Original flow if no cached report exists or there was an error processing it
+    if stale_report or not page.ui_report or not os.path.exists(page.ui_report):
+        try:
+            await abuild_ui_report(page)
+        except Exception as e:
+            log.exception(f"page {pid} | describe-page error")
+            return {"error": f"Error generating UI report: {e}"}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+    if not page_type:
+        log.error(f"page {pid} | unknown page_type='{raw_type}'")
+        return {"error": f"Unrecognised page_type '{raw_type}'"}, status.HTTP_400_BAD_REQUEST
+
+    # Rest of the original logic
+    try:
+        report_data = await in_thread(load_json_strict, page.ui_report)
+        screenshot = await in_thread(_evaluation_screenshot_of, page, page_type)
+    except Exception as e:
+        log.exception(f"page {pid} | file load error")
+        return {"error": f"File load failed: {e}"}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+    try:
+        evaluation = await evaluate_ui.aio(report_data, screenshot, business_type, page_type)
+        if page.business:
+            await in_thread(_save_evaluation, pid, eval_path, evaluation, fingerprint)
+
+    except ValueError as ve:
+        log.warning(f"page {pid} | validation error | {ve}")
+        return {"error": "Evaluation category mismatch",
+                "detail": str(ve)}, status.HTTP_502_BAD_GATEWAY
+    except Exception as e:
+        log.exception(f"page {pid} | evaluation crash")
+        return {"error": "Evaluation failed",
+                "detail": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+    log.info(f"page {pid} | evaluation OK")
+    return {"evaluation": evaluation, "reused": False}, status.HTTP_200_OK
+
+
+def evaluate_ui_result(pid):
+    """aevaluate_ui_result() for sync callers (Celery tasks)."""
+    return async_to_sync(aevaluate_ui_result)(pid)
+
+
+async def aformulate_ui_result(pid):
+    """Plain-text formulation of the page's UI report, stored in Records/UI-FORMATS."""
+    try:
+        page = await get_page(pid)
+    except Page.DoesNotExist:
+        return {"error": "Page not found"}, status.HTTP_404_NOT_FOUND
+
+    try:
+        evaluation = await in_thread(load_json_strict, page.ui_report)
+    except Exception as e:
+        return {"error": f"Could not read UI report: {e}"}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+    try:
+        formatted = await formulate_ui.aio(evaluation)
+    except Exception as e:
+        return {"error": f"Formulation failed: {e}"}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+    file_path = formatted_report_path(page)
+    await in_thread(save_text, file_path, formatted)
+    page.formatted_report = file_path
+    await page.asave()
+
+    return {"formatted_report": formatted, "saved_path": file_path}, status.HTTP_200_OK
+
+
+async def get_upload(pid):
+    upload = await Upload.objects.select_related("references_page__business").aget(references_page_id=pid)
+    tag_page(upload.references_page)
+    return upload
+
+
+async def aevaluate_uba_result(pid):
+    """UBA report for the upload that references the page."""
+    try:
+        up = await get_upload(pid)
+    except Upload.DoesNotExist:
+        return {"error":"Upload not found"}, 404
+
+    try:
+        result = await evaluate_uba.aio(up.path)
+    except Exception as e:
+        return {"error":str(e)}, 500
+
+    # Get the business ID from the page instance
+    page = up.references_page
+    if not page or not page.business:
+        return {"error": "Page or business not found"}, 404
+
+    file_path = os.path.join('Records', 'UBA-REPORTS', str(page.business.id), f'uba_report_{pid}.json')
+    await in_thread(save_json, file_path, {"report": result})
+
+    up.uba_report = file_path
+    await up.asave()
+
+    return {"uba_report": result, "saved_path": file_path}, 200
+
+
+def evaluate_uba_result(pid):
+    """aevaluate_uba_result() for sync callers (Celery tasks)."""
+    return async_to_sync(aevaluate_uba_result)(pid)
+
+
+async def _search_solutions(clause):
+    try:
+        resources = await web_search_agent.aio(clause.strip())
+    except Exception as e:
+        resources = [{"source": None, "summary": f"agent error: {e}"}]
+
+    return {
+        "problem": clause.strip(),
+        "solutions": resources
+    }
+
+
+async def auba_solutions_result(pid):
+    """Web-search solutions for each problem in the page's UBA report, searched concurrently."""
+    try:
+        up = await get_upload(pid)
+    except Upload.DoesNotExist:
+        return {"error": "Upload not found"}, 404
+
+    if not up.uba_report or not os.path.exists(up.uba_report):
+        return {"error": "No UBA report found"}, 404
+
+    # Check if cached solutions exist
+    page = up.references_page
+    if page and page.business:
+        solutions_path = os.path.join('Records', 'UBA-SOLUTIONS', str(page.business.id), f'uba_solutions_{pid}.json')
+
+        if os.path.exists(solutions_path):
+            try:
+                cached_results = await in_thread(load_json_strict, solutions_path)
+                log.info(f"page {pid} | UBA solutions loaded from cache")
+                return {"results": cached_results}, 200
+            except Exception as e:
+                log.exception(f"page {pid} | cached UBA solutions processing error")
+                # Continue to normal flow if error processing cached solutions
+
+    report_text = (await in_thread(load_json_strict, up.uba_report)).get("report", "")
+
+    problems = PROBLEM_RE.findall(report_text)
+    if not problems:
+        return {"error": "No problem clauses found"}, 400
+
+    results = list(await asyncio.gather(*(_search_solutions(clause) for clause in problems)))
+
+    # Cache the solutions
+    if page and page.business:
+        solutions_path = os.path.join('Records', 'UBA-SOLUTIONS', str(page.business.id), f'uba_solutions_{pid}.json')
+        try:
+            await in_thread(save_json, solutions_path, results)
+            log.info(f"page {pid} | UBA solutions cached successfully")
+
+            # Store the path in the Upload model if it has a field for it
+            if hasattr(up, 'uba_solutions'):
+                up.uba_solutions = solutions_path
+                await up.asave()
+        except Exception as e:
+            log.exception(f"page {pid} | failed to cache UBA solutions")
+
+    return {"results": results}, 200
+
+
+def uba_solutions_result(pid):
+    """auba_solutions_result() for sync callers (Celery tasks)."""
+    return async_to_sync(auba_solutions_result)(pid)
+
+
+async def auba_formulation_result(pid):
+    """Structured formulation of the page's UBA report."""
+    try:
+        up = await get_upload(pid)
+    except Upload.DoesNotExist:
+        return {"error": "Upload not found"}, status.HTTP_404_NOT_FOUND
+
+    if not up.uba_report or not os.path.exists(up.uba_report):
+        return {"error": "UBA report not found"}, status.HTTP_404_NOT_FOUND
+
+    # Check if formulation already exists
+    formulation_dir = os.path.join('Records', 'UBA-FORMULATIONS', str(up.references_page.business.id))
+    formulation_path = os.path.join(formulation_dir, f'uba_formulation_{pid}.json')
+
+    if os.path.exists(formulation_path):
+        try:
+            stored_formulation = await in_thread(load_json_strict, formulation_path)
+            return {"uba_formulation": stored_formulation, "saved_path": formulation_path}, status.HTTP_200_OK
+        except json.JSONDecodeError:
+            # If stored file is corrupted, continue to generate new formulation
+            pass
+
+    # If no stored formulation exists or it's corrupted, generate new one
+    raw = (await in_thread(load_json_strict, up.uba_report)).get("report")
+
+    try:
+        formulation = await uba_formulator.aio(raw)   # now a dict
+    except Exception as e:
+        return {"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+    # save JSON
+    await in_thread(save_json, formulation_path, formulation)
+
+    # persist path (ensure your model has this field)
+    up.uba_formulation_report = formulation_path
+    await up.asave()
+
+    return {"uba_formulation": formulation, "saved_path": formulation_path}, status.HTTP_200_OK
+
+
+def uba_formulation_result(pid):
+    """auba_formulation_result() for sync callers (Celery tasks)."""
+    return async_to_sync(auba_formulation_result)(pid)
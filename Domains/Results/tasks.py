@@ -0,0 +1,54 @@
+"""
+Celery versions of the LLM-backed Results endpoints (?async=1). Each
+returns {"status_code", "body"}: what the synchronous endpoint would have
+answered, read back through JobStatusAPIView. Their LLM calls queue in
+the scheduler's "batch" lane, behind interactive requests, and are
+accounted to the task's name (LLMs/usage.py).
+"""
+from celery import current_task, shared_task
+
+from Domains.Results.LLMs.scheduler import lane
+from Domains.Results.LLMs.usage import attribute
+from Domains.Results.pipeline import pipeline_result
+from Domains.Results.services import (
+    evaluate_uba_result, evaluate_ui_result, ui_report_result, uba_formulation_result, uba_solutions_result,
+)
+
+
+def job_result(body, status_code):
+    return {"status_code": status_code, "body": body}
+
+
+def batch(result_fn, *args):
+    with lane("batch"), attribute(current_task.name if current_task else result_fn.__name__):
+        return job_result(*result_fn(*args))
+
+
+@shared_task(name="results.ui_report")
+def ui_report_task(pid):
+    return batch(ui_report_result, pid)
+
+
+@shared_task(name="results.evaluate_ui")
+def evaluate_ui_task(pid):
+    return batch(evaluate_ui_result, pid)
+
+
+@shared_task(name="results.evaluate_uba")
+def evaluate_uba_task(pid):
+    return batch(evaluate_uba_result, pid)
+
+
+@shared_task(name="results.uba_solutions")
+def uba_solutions_task(pid):
+    return batch(uba_solutions_result, pid)
+
+
+@shared_task(name="results.uba_formulation")
+def uba_formulation_task(pid):
+    return batch(uba_formulation_result, pid)
+
+
+@shared_task(name="results.ui_pipeline")
+def ui_pipeline_task(pid, force=False):
+    return batch(pipeline_result, pid, force)
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from Domains.Results.Views import PageStructureAPIView, PageStylingAPIView, PageUIReportAPIView, EvaluateUIAPIView, EvaluateUBAAPIView, FormulateUIAPIView, EvaluateWebMetricsAPIView, UBAProblemSolutionsAPIView, FormulateUBAAPIView, ChatAPIView
+from Domains.Results.Views import PageStructureAPIView, PageStylingAPIView, PageUIReportAPIView, EvaluateUIAPIView, EvaluateUBAAPIView, FormulateUIAPIView, EvaluateWebMetricsAPIView, UBAProblemSolutionsAPIView, FormulateUBAAPIView, ChatAPIView, JobStatusAPIView, UIPipelineAPIView, LLMCacheAPIView, LLMSchedulerAPIView, LLMGatewayAPIView, LLMUsageAPIView
 
 
 urlpatterns = [
@@ -10,8 +10,14 @@ urlpatterns = [
     path('evaluate-ui/',        EvaluateUIAPIView.as_view(),   name='evaluate-ui'),
     path('evaluate-uba/', EvaluateUBAAPIView.as_view(), name='evaluate-uba'),
     path('formulate-ui/',      FormulateUIAPIView.as_view(),  name='formulate-ui'),
+    path('ui-pipeline/',        UIPipelineAPIView.as_view(),   name='ui-pipeline'),
     path('evaluate-web-metrics/', EvaluateWebMetricsAPIView.as_view(), name='evaluate-web-metrics'),
     path('web-search/', UBAProblemSolutionsAPIView.as_view(), name='web-search'),
     path('formulate-uba-answer/', FormulateUBAAPIView.as_view(), name='formulate-uba'),
     path('chat/', ChatAPIView.as_view(), name='chat'),
+    path('llm-cache/', LLMCacheAPIView.as_view(), name='llm-cache'),
+    path('llm-scheduler/', LLMSchedulerAPIView.as_view(), name='llm-scheduler'),
+    path('llm-gateway/', LLMGatewayAPIView.as_view(), name='llm-gateway'),
+    path('llm-usage/', LLMUsageAPIView.as_view(), name='llm-usage'),
+    path('jobs/<str:job_id>/', JobStatusAPIView.as_view(), name='job-status'),
 ]
\ No newline at end of file
@@ -0,0 +1,355 @@
+"""
+CSS tokenizer and analyzer.
+
+Turns stylesheet text into rules (selectors, declarations, enclosing
+at-rules) and summarises them: selector/declaration counts, media
+queries, custom properties, duplicates, and an estimate of the bytes whose
+selectors cannot match anything in the page's DOM. summarize_css() builds
+the compact payload describe_styling gets instead of the raw CSS.
+"""
+import re
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+
+# At-rules whose block holds more rules; anything else with a block holds
+# declarations (@font-face, @page, @property ...).
+GROUPING_AT_RULES = {"media", "supports", "container", "layer", "document", "-moz-document", "scope", "starting-style"}
+KEYFRAMES_AT_RULES = {"keyframes", "-webkit-keyframes", "-moz-keyframes", "-o-keyframes"}
+
+CLASS_RE = re.compile(r"\.(-?[_a-zA-Z][-\w]*)")
+ID_RE = re.compile(r"#(-?[_a-zA-Z][-\w]*)")
+TYPE_RE = re.compile(r"(?:^|[\s>+~(,])([a-zA-Z][a-zA-Z0-9-]*)")
+PSEUDO_ARGS_RE = re.compile(r"::?[-a-zA-Z]+\((?:[^()]|\([^()]*\))*\)")
+PSEUDO_RE = re.compile(r"::?[-a-zA-Z]+")
+ATTRIBUTE_RE = re.compile(r"\[[^\]]*\]")
+COLOR_RE = re.compile(r"#[0-9a-fA-F]{3,8}\b|\b(?:rgba?|hsla?)\([^)]*\)")
+
+AT_RULE_RE = re.compile(r"@([-\w]+)\s*(.*)", re.S)
+
+COLOR_PROPERTIES = {"color", "background", "background-color", "border-color", "fill", "stroke"}
+SPACING_PROPERTIES = {"margin", "padding", "gap", "row-gap", "column-gap"}
+COMPONENT_RE = re.compile(r"btn|button|nav|header|footer|card|product|price|cart|search|hero|banner|menu", re.I)
+
+SUMMARY_TOP_N = 10
+COMPONENT_RULE_CHARS = 200
+
+
+@dataclass(frozen=True)
+class Rule:
+    selectors: tuple
+    declarations: tuple      # ((property, value), ...)
+    at_rules: tuple          # enclosing at-rule preludes, outermost first
+    size: int                # bytes of the rule text, selector through "}"
+
+
+@dataclass(frozen=True)
+class AtRule:
+    name: str
+    prelude: str
+
+
+@dataclass(frozen=True)
+class ParsedStylesheet:
+    rules: tuple
+    at_rules: tuple
+    size: int
+
+
+def _strip_comments(css_text):
+    # Comments are replaced by nothing, strings are kept verbatim.
+    out, i, n = [], 0, len(css_text)
+    while i < n:
+        ch = css_text[i]
+        if ch == "/" and css_text.startswith("/*", i):
+            end = css_text.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            continue
+        if ch in "\"'":
+            j = i + 1
+            while j < n and css_text[j] != ch:
+                j += 2 if css_text[j] == "\\" else 1
+            out.append(css_text[i:j + 1])
+            i = j + 1
+            continue
+        out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+def _split_top_level(text, sep=","):
+    parts, depth, start, quote = [], 0, 0, None
+    for i, ch in enumerate(text):
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "\"'":
+            quote = ch
+        elif ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth = max(depth - 1, 0)
+        elif ch == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _declaration(text):
+    prop, sep, value = text.partition(":")
+    prop = prop.strip()
+    if not sep or not prop:
+        return None
+    return prop if prop.startswith("--") else prop.lower(), " ".join(value.split())
+
+
+def _at_rule(text):
+    match = AT_RULE_RE.match(text)
+    if not match:
+        return AtRule("", "")
+    return AtRule(match.group(1).lower(), " ".join(match.group(2).split()))
+
+
+def tokenize(css_text):
+    """
+    Yields (kind, text, start, end) tokens: "open" for a block prelude,
+    "decl" for a declaration or block-less statement, "close" for "}".
+    Strings, parentheses and brackets are respected; comments are dropped.
+    """
+    css_text = _strip_comments(css_text)
+    start, depth, quote, n = 0, 0, None, len(css_text)
+    i = 0
+    while i < n:
+        ch = css_text[i]
+        if quote:
+            if ch == "\\":
+                i += 2
+                continue
+            if ch == quote:
+                quote = None
+        elif ch in "\"'":
+            quote = ch
+        elif ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth = max(depth - 1, 0)
+        elif depth == 0 and ch in "{;}":
+            text = css_text[start:i].strip()
+            if ch == "{":
+                yield "open", text, start, i
+            else:
+                if text:
+                    yield "decl", text, start, i
+                if ch == "}":
+                    yield "close", "", i, i + 1
+            start = i + 1
+        i += 1
+    text = css_text[start:].strip()
+    if text:
+        yield "decl", text, start, n
+
+
+@lru_cache(maxsize=256)
+def parse_stylesheet(css_text):
+    """Parses stylesheet text into a ParsedStylesheet. Results are memoised."""
+    rules, at_rules = [], []
+    # frame: [kind, selectors, declarations, at-rule preludes, start offset]
+    stack = [["root", (), [], (), 0]]
+    for kind, text, start, end in tokenize(css_text):
+        parent = stack[-1]
+        if kind == "open":
+            if text.startswith("@"):
+                at_rule = _at_rule(text)
+                name = at_rule.name
+                at_rules.append(at_rule)
+                if name in GROUPING_AT_RULES:
+                    frame_kind = "group"
+                elif name in KEYFRAMES_AT_RULES:
+                    frame_kind = "keyframes"
+                else:
+                    frame_kind = "block"
+                stack.append([frame_kind, (), [], parent[3] + (text,), start])
+            elif parent[0] == "keyframes":
+                stack.append(["frame", (), [], parent[3], start])
+            else:
+                stack.append(["rule", tuple(_split_top_level(text)), [], parent[3], start])
+        elif kind == "decl":
+            if text.startswith("@"):
+                at_rules.append(_at_rule(text))
+            elif parent[0] != "root":
+                declaration = _declaration(text)
+                if declaration:
+                    parent[2].append(declaration)
+        elif kind == "close" and len(stack) > 1:
+            frame = stack.pop()
+            if frame[0] in ("rule", "block", "frame"):
+                rules.append(Rule(
+                    selectors=frame[1],
+                    declarations=tuple(frame[2]),
+                    at_rules=frame[3],
+                    size=end - frame[4],
+                ))
+    return ParsedStylesheet(rules=tuple(rules), at_rules=tuple(at_rules), size=len(css_text))
+
+
+def rule_count(css_text):
+    """Number of style rules (blocks with selectors) in the text."""
+    return sum(1 for rule in parse_stylesheet(css_text).rules if rule.selectors)
+
+
+def dom_index(html_extract):
+    """Class, id and tag sets of a stored HTML extract (PageHTMLAPIView)."""
+    classes, ids, tags = set(), set(), set()
+    for names in (html_extract or {}).get("class_names", []):
+        classes.update(names if isinstance(names, list) else str(names).split())
+    ids.update(i for i in (html_extract or {}).get("id_names", []) if i)
+    tags.update((html_extract or {}).get("tag_counts", {}))
+    for node in (html_extract or {}).get("dom_outline", []):
+        tags.add(node.get("tag"))
+        classes.update(node.get("classes") or [])
+        if node.get("id"):
+            ids.add(node["id"])
+    return {"classes": classes, "ids": ids, "tags": {t.lower() for t in tags if t}}
+
+
+def selector_can_match(selector, dom):
+    """
+    False only when the selector names a class, id or element that is not
+    in the DOM. Pseudo-classes, attributes and combinators are ignored, so
+    this errs towards "used".
+    """
+    simple = PSEUDO_ARGS_RE.sub("", selector)
+    simple = ATTRIBUTE_RE.sub("", simple)
+    simple = PSEUDO_RE.sub("", simple)
+    if any(name not in dom["classes"] for name in CLASS_RE.findall(simple)):
+        return False
+    if any(name not in dom["ids"] for name in ID_RE.findall(simple)):
+        return False
+    without_names = CLASS_RE.sub("", ID_RE.sub("", simple))
+    tags = {t.lower() for t in TYPE_RE.findall(without_names)}
+    return tags <= dom["tags"] | {"html", "body", "head"}
+
+
+def analyze_css(css_text, dom=None):
+    """
+    Stats for one stylesheet. With `dom` (from dom_index()) style rules
+    whose selectors all fail selector_can_match() count as unused.
+    """
+    parsed = parse_stylesheet(css_text)
+    style_rules = [rule for rule in parsed.rules if rule.selectors]
+    selector_counts = Counter(s for rule in style_rules for s in rule.selectors)
+    declaration_counts = Counter(
+        f"{prop}: {value}" for rule in style_rules for prop, value in rule.declarations
+    )
+    media = Counter(a.prelude for a in parsed.at_rules if a.name == "media")
+    custom_properties = Counter(
+        prop for rule in parsed.rules for prop, _ in rule.declarations if prop.startswith("--")
+    )
+
+    analysis = {
+        "bytes": parsed.size,
+        "rule_count": len(style_rules),
+        "selector_count": sum(selector_counts.values()),
+        "declaration_count": sum(len(rule.declarations) for rule in parsed.rules),
+        "media_queries": dict(media.most_common()),
+        "at_rules": dict(Counter(a.name for a in parsed.at_rules)),
+        "custom_properties": sorted(custom_properties),
+        "duplicate_selectors": {s: n for s, n in selector_counts.most_common() if n > 1},
+        "duplicate_declarations": sum(n - 1 for n in declaration_counts.values() if n > 1),
+    }
+    if dom is not None:
+        unused = [
+            rule for rule in style_rules
+            if not any(selector_can_match(s, dom) for s in rule.selectors)
+        ]
+        analysis["unused_rule_count"] = len(unused)
+        analysis["unused_bytes"] = sum(rule.size for rule in unused)
+    return analysis
+
+
+def _top(counter):
+    return [value for value, _ in counter.most_common(SUMMARY_TOP_N)]
+
+
+def _component_rule(rule, selector):
+    declarations = "; ".join(f"{prop}: {value}" for prop, value in rule.declarations)
+    return {"selector": selector, "rules": declarations[:COMPONENT_RULE_CHARS]}
+
+
+def summarize_css(css_extract, html_extract=None):
+    """
+    Compact stand-in for a stored CSS extract (PageCSSAPIView): per-sheet
+    counts, page-wide media queries and custom properties, the most used
+    colours, fonts, spacing and layout values, a few component rules, the
+    duplicate selectors and, with the HTML extract, estimated unused bytes.
+    """
+    dom = dom_index(html_extract) if html_extract else None
+    sheets, totals = [], Counter()
+    media, custom_properties, duplicates = Counter(), Counter(), Counter()
+    values = {key: Counter() for key in (
+        "colors", "font_families", "font_sizes", "font_weights", "spacing", "container_widths", "display"
+    )}
+    components = {}
+
+    sources = [(entry.get("href"), entry) for entry in css_extract.get("external_stylesheets", [])]
+    sources += [("inline", entry) for entry in css_extract.get("inline_styles", [])]
+    for href, entry in sources:
+        if entry.get("error") or not entry.get("content"):
+            sheets.append({"href": href, "error": entry.get("error", "empty")})
+            continue
+        analysis = analyze_css(entry["content"], dom)
+        sheets.append({
+            "href": href,
+            "bytes": analysis["bytes"],
+            "rules": analysis["rule_count"],
+            "selectors": analysis["selector_count"],
+            "declarations": analysis["declaration_count"],
+            "is_minified": entry.get("is_minified"),
+            **({"unused_bytes": analysis["unused_bytes"]} if dom is not None else {}),
+        })
+        for key in ("bytes", "rule_count", "selector_count", "declaration_count",
+                    "duplicate_declarations", "unused_bytes", "unused_rule_count"):
+            totals[key] += analysis.get(key, 0)
+        media.update(analysis["media_queries"])
+        custom_properties.update(analysis["custom_properties"])
+        duplicates.update(analysis["duplicate_selectors"])
+
+        for rule in parse_stylesheet(entry["content"]).rules:
+            for prop, value in rule.declarations:
+                if prop in COLOR_PROPERTIES or prop.startswith("--"):
+                    values["colors"].update(c.lower() for c in COLOR_RE.findall(value))
+                if prop == "font-family":
+                    values["font_families"][value.split(",")[0].strip("\"' ")] += 1
+                elif prop == "font-size":
+                    values["font_sizes"][value] += 1
+                elif prop == "font-weight":
+                    values["font_weights"][value] += 1
+                elif prop in SPACING_PROPERTIES:
+                    values["spacing"].update(v for v in value.split() if v[0].isdigit() and v != "0")
+                elif prop == "max-width":
+                    values["container_widths"][value] += 1
+                elif prop == "display":
+                    values["display"][value] += 1
+            if len(components) >= SUMMARY_TOP_N or not rule.declarations:
+                continue
+            for selector in rule.selectors:
+                if selector not in components and COMPONENT_RE.search(selector) and (
+                    dom is None or selector_can_match(selector, dom)
+                ):
+                    components[selector] = _component_rule(rule, selector)
+                    break
+
+    summary = {
+        "stylesheets": sheets,
+        "totals": dict(totals),
+        "minified_sheets": sum(1 for sheet in sheets if sheet.get("is_minified")),
+        "media_queries": _top(media),
+        "custom_properties": {"count": len(custom_properties), "sample": sorted(custom_properties)[:SUMMARY_TOP_N]},
+        **{f"top_{key}": _top(counter) for key, counter in values.items()},
+        "component_rules": list(components.values()),
+        "duplicate_selectors": dict(duplicates.most_common(SUMMARY_TOP_N)),
+    }
+    if dom is not None and totals["bytes"]:
+        summary["unused_ratio"] = round(totals["unused_bytes"] / totals["bytes"], 3)
+    return summary
@@ -0,0 +1,168 @@
+"""
+Named, bounded worker pools.
+
+  fetch   outbound network calls: stylesheets, web metrics, job queueing
+  parse   local CPU and disk work: payloads, screenshot variants, hashing,
+          artifact files
+  llm     pipeline stages and the work around LLM calls (cache lookups and
+          writes, parsing answers)
+
+Each pool has EXECUTOR_POOLS[name] = {"workers", "queue", "wait"}: at most
+`workers` tasks run and `queue` more wait for a thread. A submit beyond
+that blocks for up to `wait` seconds and then raises PoolSaturated, a DRF
+Throttled, so a view that lets it through answers 429 with Retry-After.
+Views check a pool before starting work (check()) and reject at once
+when its queue is full. stats() has per-pool counters and timings.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+
+DEFAULT_POOLS = {
+    "fetch": {"workers": 16, "queue": 64, "wait": 10},
+    "parse": {"workers": 4, "queue": 32, "wait": 5},
+    "llm":   {"workers": 16, "queue": 128, "wait": 5},
+}
+RETRY_AFTER = 1         # seconds suggested to a rejected client
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+class PoolSaturated(Throttled):
+    default_detail = "The server is busy."
+    default_code = "pool_saturated"
+
+    def __init__(self, pool):
+        super().__init__(wait=RETRY_AFTER, detail=f"The {pool} worker pool is saturated.")
+        self.pool = pool
+
+
+class BoundedExecutor:
+    def __init__(self, name, workers, queue, wait):
+        self.name = name
+        self.workers = workers
+        self.queue = queue
+        self.wait = wait
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-pool")
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(
+            ("submitted", "completed", "failed", "cancelled", "rejected", "active", "queued", "peak_queued"), 0)
+        self._wait_seconds = self._run_seconds = 0.0
+
+    def saturated(self):
+        with self._lock:
+            return self._counts["queued"] >= self.queue
+
+    def check(self):
+        """Raises PoolSaturated when the queue is full, before any work is started for a request."""
+        if self.saturated():
+            self._reject()
+
+    def _reject(self):
+        with self._lock:
+            self._counts["rejected"] += 1
+        raise PoolSaturated(self.name)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Future of fn(*args, **kwargs), run in the caller's context (so
+        ContextVars such as record_calls() carry over). Blocks up to `wait`
+        seconds for a slot.
+        """
+        if not self._slots.acquire(timeout=self.wait):
+            self._reject()
+        return self._submit(fn, args, kwargs)
+
+    async def run(self, fn, *args, **kwargs):
+        """submit() for coroutines: waits for a slot without blocking the event loop."""
+        deadline = time.monotonic() + self.wait
+        while not self._slots.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                self._reject()
+            await asyncio.sleep(0.05)
+        return await asyncio.wrap_future(self._submit(fn, args, kwargs))
+
+    def _submit(self, fn, args, kwargs):
+        context = contextvars.copy_context()
+        queued_at = time.perf_counter()
+        with self._lock:
+            self._counts["submitted"] += 1
+            self._counts["queued"] += 1
+            self._counts["peak_queued"] = max(self._counts["peak_queued"], self._counts["queued"])
+
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self._counts["queued"] -= 1
+                self._counts["active"] += 1
+                self._wait_seconds += started - queued_at
+            failed = False
+            try:
+                return context.run(fn, *args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                with self._lock:
+                    self._counts["active"] -= 1
+                    self._counts["failed" if failed else "completed"] += 1
+                    self._run_seconds += time.perf_counter() - started
+
+        try:
+            future = self._pool.submit(task)
+        except BaseException:
+            with self._lock:
+                self._counts["queued"] -= 1
+            self._slots.release()
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        if future.cancelled():
+            with self._lock:
+                self._counts["queued"] -= 1
+                self._counts["cancelled"] += 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            started = counts["completed"] + counts["failed"] + counts["active"]
+            finished = counts["completed"] + counts["failed"]
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue,
+                **counts,
+                "avg_wait_ms": round(self._wait_seconds / started * 1000, 1) if started else 0.0,
+                "avg_run_ms": round(self._run_seconds / finished * 1000, 1) if finished else 0.0,
+            }
+
+
+def _pool_settings():
+    configured = getattr(settings, "EXECUTOR_POOLS", {})
+    return {name: {**DEFAULT_POOLS.get(name, DEFAULT_POOLS["parse"]), **configured.get(name, {})}
+            for name in {**DEFAULT_POOLS, **configured}}
+
+
+def get_executor(name):
+    """The process-wide BoundedExecutor called `name` (see EXECUTOR_POOLS)."""
+    executor = _executors.get(name)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                config = _pool_settings()[name]
+                executor = _executors[name] = BoundedExecutor(name, config["workers"], config["queue"], config["wait"])
+    return executor
+
+
+def stats():
+    return {name: get_executor(name).stats() for name in sorted(_pool_settings())}
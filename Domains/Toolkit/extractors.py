@@ -0,0 +1,241 @@
+import re
+from collections import Counter
+from urllib.parse import urljoin
+
+import requests
+from bs4.element import CData, NavigableString, PreformattedString, Tag
+
+from Domains.Toolkit.stylesheets import css_stats, fetch_stylesheets
+
+META_DESCRIPTION_RE = re.compile("^description$", re.I)
+STRIPPED_TAGS = {"script", "style", "noscript"}
+HEADING_TAGS = ("h1", "h2", "h3")
+STRUCTURAL_TAGS = {"section", "article", "nav", "aside", "main"}
+MAX_LINKS = 20
+
+_MAIN_STRINGS = frozenset({NavigableString, CData})
+
+
+def _string_group(string_type):
+    # get_text() only keeps strings whose exact type is one of the tag's
+    # interesting_string_types, so <template>/<rt>/<rp> text is bucketed apart.
+    if string_type in _MAIN_STRINGS:
+        return _MAIN_STRINGS
+    return frozenset((string_type,))
+
+
+def _tag_group(tag):
+    types = tag.interesting_string_types
+    return frozenset(types) if types else _MAIN_STRINGS
+
+
+def _merge_text(buckets, group, text, limit):
+    current = buckets.get(group, "")
+    if limit is not None and len(current) >= limit:
+        return
+    current += text
+    buckets[group] = current if limit is None else current[:limit]
+
+
+def extract_html_features(soup, url, text_limit=50):
+    """
+    Builds the `html_extract` payload of PageHTMLAPIView in a single walk of
+    the tree. script/style/noscript subtrees are skipped during the walk and
+    decomposed afterwards, so `soup.prettify()` matches the old output.
+    Returns every field except `raw_html`, in the original key order.
+    """
+    title_tag = None
+    meta_desc = None
+    headings = {name: [] for name in HEADING_TAGS}
+    links = []
+    tag_counter = Counter()
+    structural_tags = []
+    class_names = []
+    id_names = []
+    text_length = 0
+    outline_nodes = []
+    stripped = []
+
+    # frame: [tag, outline node, text buckets, text limit, child iterator]
+    root = [soup, None, {}, text_limit, iter(soup.contents)]
+    stack = [root]
+    while stack:
+        frame = stack[-1]
+        child = next(frame[4], None)
+
+        if child is None:
+            stack.pop()
+            tag, node, buckets, limit = frame[0], frame[1], frame[2], frame[3]
+            if node is None:
+                continue
+            text = buckets.get(_tag_group(tag), "")
+            if tag.name in headings:
+                headings[tag.name][node["heading"]] = text
+            node["text"] = text
+            parent_buckets, parent_limit = stack[-1][2], stack[-1][3]
+            for group, value in buckets.items():
+                _merge_text(parent_buckets, group, value, parent_limit)
+            continue
+
+        if isinstance(child, NavigableString):
+            if isinstance(child, PreformattedString) and type(child) is not CData:
+                continue
+            group = _string_group(type(child))
+            value = child.strip()
+            if not value:
+                continue
+            if group is _MAIN_STRINGS:
+                text_length += len(value)
+            _merge_text(frame[2], group, value, frame[3])
+            continue
+
+        if not isinstance(child, Tag):
+            continue
+
+        name = child.name
+        if name in STRIPPED_TAGS:
+            stripped.append(child)
+            continue
+
+        tag_counter[name] += 1
+        if name in STRUCTURAL_TAGS:
+            structural_tags.append(name)
+
+        classes = child.get("class")
+        if classes:
+            class_names.append(classes)
+        ident = child.get("id")
+        if ident:
+            id_names.append(ident)
+
+        if title_tag is None and name == "title":
+            title_tag = child
+        elif meta_desc is None and name == "meta":
+            meta_name = child.get("name")
+            if meta_name is not None and META_DESCRIPTION_RE.search(meta_name) and child.get("content"):
+                meta_desc = child.get("content")
+        elif name == "a" and len(links) < MAX_LINKS:
+            href = child.get("href")
+            if href and not href.lower().startswith("javascript"):
+                links.append(urljoin(url, href))
+
+        node = {"tag": child, "text": ""}
+        limit = frame[3]
+        if name in headings:
+            node["heading"] = len(headings[name])
+            headings[name].append(None)
+            limit = None
+        outline_nodes.append(node)
+        stack.append([child, node, {}, limit, iter(child.contents)])
+
+    for tag in stripped:
+        tag.decompose()
+
+    title = title_tag.string.strip() if title_tag and title_tag.string else None
+
+    outline, sig_counter = [], Counter()
+    for node in outline_nodes:
+        el, text = node["tag"], node["text"]
+        ident = el.get("id")
+        classes = el.get("class", [])
+        if not (ident or classes or text):
+            continue
+
+        sig_key = f"{el.name}|{' '.join(classes)}|{ident or ''}"
+        sig_counter[sig_key] += 1
+
+        outline.append({
+            "tag"         : el.name,
+            "id"          : ident,
+            "classes"     : classes,
+            "text_sample" : text[:text_limit] or None,
+            "inline_style": el.get("style")
+        })
+
+    repeated = {}
+    for k, v in sig_counter.items():
+        tag, classes, _ = k.split("|", 2)
+        compact = f"{tag}|{classes}".strip("|")
+        if v > 1:
+            repeated[compact] = v
+
+    return {
+        "url": url,
+        "title": title,
+        "meta_description": meta_desc,
+        "headings": headings,
+        "links": links,
+        "tag_counts": dict(tag_counter),
+        "structural_tags": structural_tags,
+        "class_names": class_names,
+        "id_names": id_names,
+        "text_length": text_length,
+        "num_tags": sum(tag_counter.values()),
+        "dom_outline": outline,
+        "repeated_signatures": repeated,
+    }
+
+
+def _previous_stylesheets(stored, validators):
+    # {href: {"entry", "validators"}} for the sheets that have validators
+    sheet_validators = (validators or {}).get("stylesheets", {})
+    return {
+        entry["href"]: {"entry": entry, "validators": sheet_validators[entry["href"]]}
+        for entry in (stored or {}).get("external_stylesheets", [])
+        if sheet_validators.get(entry["href"])
+    }
+
+
+def extract_css_features(soup, url, stored=None, validators=None):
+    """
+    Downloads the page's external stylesheets (content, rule count, minified
+    status) and collects its inline <style> blocks. `soup` must still
+    contain the <style> tags, i.e. not have gone through
+    extract_html_features().
+
+    Pass the previously stored extract and its validators to revalidate
+    stylesheets with conditional requests. Returns (css_extract,
+    stylesheet_validators).
+    """
+    css_urls = []
+    for link_tag in soup.find_all("link", rel="stylesheet"):
+        href = link_tag.get("href")
+        if href:
+            css_urls.append(href if href.startswith("http") else requests.compat.urljoin(url, href))
+    stylesheet_links, sheet_validators = fetch_stylesheets(
+        css_urls, _previous_stylesheets(stored, validators)
+    )
+
+    inline_styles = []
+    for style_tag in soup.find_all("style"):
+        css = style_tag.get_text(strip=True)
+        rule_count, is_minified = css_stats(css)
+        inline_styles.append({
+            "content": css,
+            "css_rule_count": rule_count,
+            "is_minified": is_minified
+        })
+
+    return {
+        "url": url,
+        "external_stylesheets": stylesheet_links,
+        "inline_styles": inline_styles[:3]
+    }, sheet_validators
+
+
+def refresh_css_features(stored, validators):
+    """
+    Revalidates the stylesheets of a stored CSS extract whose page HTML
+    has not changed, so the page does not need to be parsed again.
+    Returns (css_extract, stylesheet_validators).
+    """
+    stylesheet_links, sheet_validators = fetch_stylesheets(
+        [entry["href"] for entry in stored.get("external_stylesheets", [])],
+        _previous_stylesheets(stored, validators),
+    )
+
+    return {
+        "url": stored.get("url"),
+        "external_stylesheets": stylesheet_links,
+        "inline_styles": stored.get("inline_styles", [])
+    }, sheet_validators
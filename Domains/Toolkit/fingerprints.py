@@ -0,0 +1,98 @@
+"""
+Similarity fingerprints of page artifacts.
+
+  perceptual_hash(image)   difference hash (dHash) of each colour channel of
+                           each of 8 horizontal bands of a screenshot, so a
+                           change anywhere on a tall page, or in colour
+                           only, shows up in its band
+  dom_features(extract)    32-bit hashes of the page's element signatures,
+                           headings and title, with digits folded, so
+                           generated ids and counters do not count as changes
+
+similarity() compares two fingerprints band by band: a page is treated as
+unchanged, and keeps its previous LLM reports, when its most changed band
+is within SCREENSHOT_HASH_MAX_DISTANCE and at most DOM_MAX_CHANGED_FEATURES
+features were added or removed.
+"""
+import hashlib
+import re
+from collections import Counter
+
+from django.conf import settings
+from PIL import Image
+
+BANDS = 8
+HASH_SIZE = 8           # dHash of HASH_SIZE x HASH_SIZE bits per band and channel
+BAND_BITS = 3 * HASH_SIZE * HASH_SIZE
+DIGITS_RE = re.compile(r"\d+")
+
+
+def perceptual_hash(path):
+    """Hex dHash of the screenshot at `path`: BANDS x BAND_BITS bits (R, G, B per band), top to bottom."""
+    with Image.open(path) as image:
+        image.draft("RGB", (256, 256 * image.height // max(image.width, 1)))
+        rgb = image.convert("RGB")
+    if rgb.width > 256:
+        rgb = rgb.resize((256, max(BANDS, rgb.height * 256 // rgb.width)), Image.BILINEAR)
+
+    bits = []
+    band_height = rgb.height / BANDS
+    for n in range(BANDS):
+        top = round(n * band_height)
+        band = rgb.crop((0, top, rgb.width, max(round((n + 1) * band_height), top + 1)))
+        for channel in band.resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR).split():
+            pixels = list(channel.getdata())
+            for row in range(HASH_SIZE):
+                offset = row * (HASH_SIZE + 1)
+                bits.extend(pixels[offset + col] > pixels[offset + col + 1] for col in range(HASH_SIZE))
+    return f"{int(''.join('1' if b else '0' for b in bits), 2):0{len(bits) // 4}x}"
+
+
+def _dom_features(html_extract):
+    for node in html_extract.get("dom_outline", []):
+        classes = " ".join(sorted(node.get("classes") or []))
+        yield DIGITS_RE.sub("0", f"{node.get('tag')}|{classes}|{node.get('id') or ''}")
+    for tag, texts in (html_extract.get("headings") or {}).items():
+        for text in texts:
+            yield f"{tag}:{DIGITS_RE.sub('0', (text or '').strip().lower())}"
+    yield f"title:{(html_extract.get('title') or '').strip().lower()}"
+
+
+def dom_features(html_extract):
+    """Sorted hex 32-bit hashes of the extract's normalised element signatures, headings and title, repeats kept."""
+    return sorted(hashlib.blake2b(feature.encode("utf-8"), digest_size=4).hexdigest()
+                  for feature in _dom_features(html_extract or {}))
+
+
+def hamming(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def band_distances(a, b):
+    """Share of differing bits of each band of two perceptual hashes; None when they do not line up."""
+    width = BAND_BITS // 4
+    if len(a) != len(b) or len(a) != BANDS * width:
+        return None
+    return [hamming(a[i:i + width], b[i:i + width]) / BAND_BITS for i in range(0, len(a), width)]
+
+
+def page_fingerprint(html_extract, screenshot):
+    """{"screenshot_hash", "dom_features"} for a page's HTML extract and Screenshot."""
+    return {"screenshot_hash": screenshot.perceptual_hash(), "dom_features": dom_features(html_extract)}
+
+
+def similarity(previous, current):
+    """
+    (similar, detail): whether two page fingerprints are within the
+    thresholds, with the screenshot distance (share of differing bits in
+    the most changed band) and the DOM distance (features added or removed).
+    """
+    if not previous or not current or set(previous) != set(current):
+        return False, None
+    bands = band_distances(previous["screenshot_hash"], current["screenshot_hash"])
+    screenshot_distance = max(bands) if bands else 1.0
+    before, after = Counter(previous["dom_features"]), Counter(current["dom_features"])
+    dom_distance = sum(((before - after) + (after - before)).values())
+    similar = (screenshot_distance <= getattr(settings, "SCREENSHOT_HASH_MAX_DISTANCE", 0.02)
+               and dom_distance <= getattr(settings, "DOM_MAX_CHANGED_FEATURES", 2))
+    return similar, {"screenshot_distance": round(screenshot_distance, 4), "dom_distance": dom_distance}
@@ -0,0 +1,92 @@
+"""
+Shared outbound HTTP client.
+
+One requests.Session for the whole process: connections are pooled and
+kept alive per host, idempotent requests are retried with exponential
+backoff (honouring Retry-After), every call gets a default timeout and
+the number of in-flight requests per host is capped.
+"""
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HostBusyError(requests.exceptions.ConnectionError):
+    """Raised when a host's concurrency slot did not free up in time."""
+
+
+_session = None
+_session_lock = threading.Lock()
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+
+def _build_session():
+    retry = Retry(
+        total=getattr(settings, "HTTP_CLIENT_RETRIES", 2),
+        backoff_factor=getattr(settings, "HTTP_CLIENT_BACKOFF_FACTOR", 0.5),
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=getattr(settings, "HTTP_CLIENT_POOL_CONNECTIONS", 20),
+        pool_maxsize=getattr(settings, "HTTP_CLIENT_POOL_MAXSIZE", 20),
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def _host_slot(url):
+    host = urlsplit(url).netloc.lower()
+    slot = _host_slots.get(host)
+    if slot is None:
+        with _host_slots_lock:
+            slot = _host_slots.setdefault(
+                host, threading.BoundedSemaphore(getattr(settings, "HTTP_CLIENT_MAX_PER_HOST", 8))
+            )
+    return slot
+
+
+def request(method, url, **kwargs):
+    """
+    Same signature as requests.request(). Responses are read before the
+    host slot is released unless stream=True is passed.
+    """
+    kwargs.setdefault("timeout", getattr(settings, "HTTP_CLIENT_TIMEOUT", (5, 30)))
+    slot = _host_slot(url)
+    if not slot.acquire(timeout=getattr(settings, "HTTP_CLIENT_HOST_WAIT", 30)):
+        raise HostBusyError(f"Too many concurrent requests to {urlsplit(url).netloc}")
+    try:
+        return get_session().request(method, url, **kwargs)
+    finally:
+        slot.release()
+
+
+def get(url, **kwargs):
+    kwargs.setdefault("allow_redirects", True)
+    return request("GET", url, **kwargs)
+
+
+def head(url, **kwargs):
+    kwargs.setdefault("allow_redirects", False)
+    return request("HEAD", url, **kwargs)
@@ -0,0 +1,247 @@
+"""
+Page-fetch cache.
+
+A page is downloaded once and the snapshot is shared by everything that
+needs the document (reachability check, HTML extraction, CSS extraction)
+until PAGE_SNAPSHOT_TTL expires. Metadata is keyed by URL and points at
+the body, which is stored once per content hash. Snapshots live in the
+Django cache named PAGE_SNAPSHOT_CACHE, which must be shared (Redis) for
+a page fetched by a Celery worker to be reused by the web process.
+"""
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+
+import requests
+from django.conf import settings
+from requests.structures import CaseInsensitiveDict
+from django.core.cache import caches
+
+from Domains.Toolkit import http_client
+
+PAGE_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+
+@dataclass
+class PageSnapshot:
+    url: str
+    status_code: int
+    headers: dict
+    content: bytes
+    content_hash: str
+    fetched_at: float = field(default_factory=time.time)
+    _apparent_encoding: str | None = field(default=None, repr=False)
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def not_modified(self):
+        return self.status_code == 304
+
+    @property
+    def age(self):
+        return time.time() - self.fetched_at
+
+    @property
+    def apparent_encoding(self):
+        if self._apparent_encoding is None:
+            detected = requests.compat.chardet.detect(self.content)["encoding"]
+            self._apparent_encoding = detected or "utf-8"
+        return self._apparent_encoding
+
+    @property
+    def text(self):
+        """Body decoded with the sniffed encoding, like resp.apparent_encoding."""
+        try:
+            return self.content.decode(self.apparent_encoding, errors="replace")
+        except LookupError:
+            return self.content.decode("utf-8", errors="replace")
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def _meta_key(url):
+    return f"page_snapshot:{hashlib.sha256(url.encode()).hexdigest()}"
+
+
+def _body_key(digest):
+    return f"page_body:{digest}"
+
+
+def _cache():
+    return caches[getattr(settings, "PAGE_SNAPSHOT_CACHE", "default")]
+
+
+def _ttl():
+    return getattr(settings, "PAGE_SNAPSHOT_TTL", 15 * 60)
+
+
+def get_cached(url, max_age=None):
+    """Returns the stored snapshot for `url` if it is younger than max_age."""
+    meta = _cache().get(_meta_key(url))
+    if not meta:
+        return None
+    max_age = _ttl() if max_age is None else max_age
+    if time.time() - meta["fetched_at"] > max_age:
+        return None
+    body = _cache().get(_body_key(meta["content_hash"]))
+    if body is None:
+        return None
+    return PageSnapshot(content=body, **meta)
+
+
+def store(snapshot):
+    ttl = _ttl()
+    _cache().set(_body_key(snapshot.content_hash), snapshot.content, timeout=ttl)
+    _cache().set(_meta_key(snapshot.url), {
+        "url": snapshot.url,
+        "status_code": snapshot.status_code,
+        "headers": snapshot.headers,
+        "content_hash": snapshot.content_hash,
+        "fetched_at": snapshot.fetched_at,
+    }, timeout=ttl)
+
+
+def invalidate(url):
+    _cache().delete(_meta_key(url))
+
+
+def response_validators(resp, digest):
+    return {
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "content_hash": digest,
+    }
+
+
+def conditional_headers(validators):
+    headers = {}
+    if validators and validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators and validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def is_unchanged(snapshot, validators):
+    """True when a refresh got a 304 or the same body as last time."""
+    if not validators:
+        return False
+    return snapshot.not_modified or snapshot.content_hash == validators.get("content_hash")
+
+
+def validators_path(artifact_path):
+    return f"{os.path.splitext(artifact_path)[0]}.validators.json"
+
+
+def load_validators(artifact_path):
+    """Reads the validators stored next to an artifact, or None."""
+    try:
+        with open(validators_path(artifact_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def save_validators(artifact_path, validators):
+    with open(validators_path(artifact_path), "w", encoding="utf-8") as f:
+        json.dump(validators, f, ensure_ascii=False, indent=2)
+
+
+def fetch_page(url, max_age=None, refresh=False, timeout=10, validators=None):
+    """
+    Returns a PageSnapshot for `url`, downloading it only when there is no
+    cached copy younger than max_age (PAGE_SNAPSHOT_TTL by default) or when
+    refresh=True. Error responses are returned but never cached; network
+    failures raise requests exceptions.
+
+    With `validators` (as stored by save_validators) the download is a
+    conditional GET. A 304 snapshot carries the previous content hash and,
+    if it is still cached, the previous body.
+    """
+    if not refresh:
+        snapshot = get_cached(url, max_age)
+        if snapshot is not None:
+            return snapshot
+
+    headers = {**PAGE_HEADERS, **conditional_headers(validators)}
+    resp = http_client.get(url, headers=headers, timeout=timeout)
+
+    if resp.status_code == 304 and validators:
+        digest = validators.get("content_hash")
+        snapshot = PageSnapshot(
+            url=url,
+            status_code=304,
+            headers=CaseInsensitiveDict(resp.headers),
+            content=_cache().get(_body_key(digest)) or b"",
+            content_hash=digest,
+        )
+        if snapshot.content:
+            store(PageSnapshot(url=url, status_code=200, headers=snapshot.headers,
+                               content=snapshot.content, content_hash=digest))
+        return snapshot
+
+    snapshot = PageSnapshot(
+        url=url,
+        status_code=resp.status_code,
+        headers=CaseInsensitiveDict(resp.headers),
+        content=resp.content,
+        content_hash=content_hash(resp.content),
+    )
+    if snapshot.ok:
+        store(snapshot)
+    return snapshot
+
+
+def snapshot_validators(snapshot, previous=None):
+    """Validators for a snapshot; a 304 without them keeps the previous ones."""
+    current = response_validators(snapshot, snapshot.content_hash)
+    if previous:
+        current = {k: v if v is not None else previous.get(k) for k, v in current.items()}
+    return current
+
+
+def previous_artifact_path(path):
+    base, ext = os.path.splitext(path)
+    return f"{base}.previous{ext}"
+
+
+def fingerprint_path(path):
+    return f"{os.path.splitext(path)[0]}.fingerprint.json"
+
+
+def invalidate_derived_artifacts(page):
+    """
+    Drops the LLM outputs built from a page's HTML/CSS so they are
+    regenerated on the next request. Called only when a refresh found
+    changed content; unchanged pages keep them. The UI report and
+    evaluation are kept as *.previous.json, with their fingerprints, so
+    they can be reused if the new content turns out visually the same.
+    """
+    if not page.business:
+        return
+    business_id, page_id = str(page.business.id), str(page.id)
+    for path in (
+        os.path.join("Records", "UI-REPORTS", business_id, f"ui_report_{page_id}.json"),
+        os.path.join("Records", "UI-EVALUATIONS", business_id, f"ui_evaluation_{page_id}.json"),
+    ):
+        if os.path.exists(path):
+            os.replace(path, previous_artifact_path(path))
+            if os.path.exists(fingerprint_path(path)):
+                os.replace(fingerprint_path(path), fingerprint_path(previous_artifact_path(path)))
+    formatted = os.path.join("Records", "UI-FORMATS", business_id, f"formatted_report_{page_id}.txt")
+    if os.path.exists(formatted):
+        os.remove(formatted)
+    if page.ui_report:
+        page.ui_report = None
+        page.save(update_fields=["ui_report"])
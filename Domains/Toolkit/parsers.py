@@ -0,0 +1,46 @@
+import logging
+
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+# Fastest first; html.parser ships with Python so it is always available.
+PARSER_BACKENDS = ("lxml", "html5lib", "html.parser")
+DEFAULT_PARSER = "html.parser"
+
+_resolved = {}
+
+
+def available_backends():
+    return [name for name in PARSER_BACKENDS if builder_registry.lookup(name) is not None]
+
+
+def resolve_backend(name=None):
+    """
+    Returns the BeautifulSoup tree builder to use for `name` (defaults to
+    settings.HTML_PARSER). Falls back to the next installed backend in
+    PARSER_BACKENDS when the requested one is missing.
+    """
+    name = name or getattr(settings, "HTML_PARSER", DEFAULT_PARSER)
+    if name in _resolved:
+        return _resolved[name]
+
+    if builder_registry.lookup(name) is not None:
+        backend = name
+    else:
+        start = PARSER_BACKENDS.index(name) + 1 if name in PARSER_BACKENDS else 0
+        backend = next(
+            (b for b in PARSER_BACKENDS[start:] if builder_registry.lookup(b) is not None),
+            DEFAULT_PARSER,
+        )
+        log.warning(f"HTML parser '{name}' is not installed, falling back to '{backend}'")
+
+    _resolved[name] = backend
+    return backend
+
+
+def make_soup(markup, backend=None):
+    """Parses page markup with the configured backend."""
+    return BeautifulSoup(markup, resolve_backend(backend))
@@ -0,0 +1,111 @@
+"""
+DOM-guided screenshot regions.
+
+Maps parts of a page (header/nav, hero, product grid, filters, gallery,
+product details, footer) to horizontal bands of its full-page screenshot,
+so an evaluator can send the crops its criteria look at instead of the
+whole page.
+
+The screenshot API returns no layout boxes, so positions are estimated
+from the HTML extract: dom_outline is in document order, and a node's
+index in it, as a fraction of the outline, stands in for its vertical
+position. Bands are padded, so a crop errs towards showing more.
+"""
+import re
+
+REGION_PATTERNS = {
+    "header":          (("header", "nav"), re.compile(r"header|navbar|nav|menu|topbar|masthead|logo", re.I)),
+    "hero":            ((), re.compile(r"hero|banner|carousel|slider|slideshow|jumbotron|promo", re.I)),
+    "product_grid":    ((), re.compile(r"product|grid|card|listing|results|tile|catalog|item", re.I)),
+    "filters":         (("aside",), re.compile(r"filter|facet|sort|refine|sidebar", re.I)),
+    "gallery":         ((), re.compile(r"gallery|thumbnail|thumb|zoom|media|swiper|lightbox", re.I)),
+    "product_details": ((), re.compile(r"price|add-?to-?cart|buy|checkout|product-?info|details|description|"
+                                       r"stock|availability|variant|quantity", re.I)),
+    "footer":          (("footer",), re.compile(r"footer", re.I)),
+}
+
+PAD = 0.02          # fraction of the page added above and below a band
+MIN_BAND = 0.05     # thinnest band returned
+MAX_BAND = 0.5      # a band wider than this is cut to its top part
+
+
+def _matches(node, tags, pattern):
+    if node.get("tag") in tags:
+        return True
+    names = " ".join(node.get("classes") or []) + " " + (node.get("id") or "")
+    return bool(names.strip()) and bool(pattern.search(names))
+
+
+def locate_regions(html_extract):
+    """
+    {region: (top, bottom)} as fractions of the page height, for the
+    regions found in html_extract["dom_outline"].
+    """
+    outline = (html_extract or {}).get("dom_outline") or []
+    if not outline:
+        return {}
+    last = len(outline) - 1 or 1
+
+    # nodes of the header and footer ("nav-item", "footer-links") do not count for the other regions
+    edges = {
+        i for i, node in enumerate(outline)
+        if any(_matches(node, *REGION_PATTERNS[edge]) for edge in ("header", "footer"))
+    }
+    regions = {}
+    for name, (tags, pattern) in REGION_PATTERNS.items():
+        hits = [
+            i for i, node in enumerate(outline)
+            if _matches(node, tags, pattern) and (name in ("header", "footer") or i not in edges)
+        ]
+        if not hits:
+            continue
+        top, bottom = hits[0] / last, hits[-1] / last
+        if name == "header":
+            top, bottom = 0.0, min(bottom, 0.15)    # a header is the top of the page, its menus nest below
+        elif name == "footer":
+            top, bottom = max(top, 0.7), 1.0
+        top, bottom = max(0.0, top - PAD), min(1.0, bottom + PAD)
+        if bottom - top < MIN_BAND:
+            bottom = min(1.0, top + MIN_BAND)
+        if bottom - top > MAX_BAND:
+            bottom = top + MAX_BAND
+        regions[name] = (round(top, 3), round(bottom, 3))
+    return regions
+
+
+class RegionScreenshot:
+    """
+    A Screenshot (Domains/Toolkit/screenshots.py) narrowed to named regions.
+    pick() returns the region crops, in the given order, that fit the
+    budget; without any located region it falls back to the whole page.
+    """
+
+    def __init__(self, screenshot, regions):
+        self.screenshot = screenshot
+        self.regions = regions          # [(name, top, bottom)]
+        self.content_hash = screenshot.content_hash
+
+    def pick(self, budget):
+        chosen, used = [], 0
+        for name, top, bottom in self.regions:
+            crop = self.screenshot.fold() if name == "fold" else self.screenshot.crop(name, top, bottom)
+            if used + crop.tokens > budget:
+                continue
+            chosen.append(crop)
+            used += crop.tokens
+        return chosen or self.screenshot.pick(budget)
+
+    def b64(self, variant):
+        return self.screenshot.b64(variant)
+
+
+def region_screenshot(screenshot, html_extract, names):
+    """RegionScreenshot with the crops for `names` ("fold" is the first viewport) found on the page."""
+    located = locate_regions(html_extract)
+    regions = []
+    for name in dict.fromkeys(names):
+        if name == "fold":
+            regions.append(("fold", 0.0, 0.0))
+        elif name in located:
+            regions.append((name, *located[name]))
+    return RegionScreenshot(screenshot, regions)
@@ -0,0 +1,232 @@
+"""
+LLM-ready screenshot variants.
+
+Full-page captures are often 5-20 MB PNGs, and the vision models shrink
+anything taller than 2048 px until it is unreadable. Each screenshot is
+turned once into smaller re-encodes (WebP, or JPEG where Pillow lacks
+WebP support):
+
+  downscaled   whole page at SCREENSHOT_MAX_WIDTH
+  fold         the first viewport, at a lower width
+  tile_<n>     vertical bands of the downscaled page, top to bottom
+
+The variants and their base64 text are stored under Records/SS-VARIANTS/
+by content hash of the source, so a re-captured screenshot gets new
+variants and identical ones share them. pick() returns the variants that
+fit a token budget; crop() cuts a band of the page (see regions.py).
+"""
+import base64
+import hashlib
+import io
+import json
+import math
+import os
+import threading
+from dataclasses import asdict, dataclass, replace
+from functools import lru_cache
+
+from django.conf import settings
+from PIL import Image, features
+
+from Domains.Toolkit.fingerprints import perceptual_hash
+
+VARIANTS_ROOT = os.path.join("Records", "SS-VARIANTS")
+FOLD_ASPECT = 10 / 16          # first viewport of a 16:10 desktop window
+FOLD_WIDTH = 768
+READABLE_SCALE = 0.5           # below this the model's own resize loses small text
+
+
+def image_tokens(width, height):
+    """Input tokens of a high-detail image, after the API fits it to 2048 px and 768 px on the short side."""
+    scale = model_scale(width, height)
+    w, h = width * scale, height * scale
+    return 85 + 170 * math.ceil(w / 512) * math.ceil(h / 512)
+
+
+def model_scale(width, height):
+    """Factor the vision API resizes an image by before reading it."""
+    scale = min(1.0, 2048 / max(width, height))
+    return scale * min(1.0, 768 / (min(width, height) * scale))
+
+
+@dataclass
+class Variant:
+    name: str
+    file: str
+    mime: str
+    width: int
+    height: int
+    bytes: int
+    tokens: int
+    label: str = ""
+
+    @property
+    def readable(self):
+        return model_scale(self.width, self.height) >= READABLE_SCALE
+
+
+def _image_format():
+    fmt = getattr(settings, "SCREENSHOT_VARIANT_FORMAT", "webp")
+    if fmt == "webp" and not features.check("webp"):
+        fmt = "jpeg"
+    return fmt
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == "webp":
+        image.save(buffer, "WEBP", quality=80, method=4)
+    else:
+        image.convert("RGB").save(buffer, "JPEG", quality=80, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+class Screenshot:
+    def __init__(self, path, content_hash):
+        self.path = path
+        self.content_hash = content_hash
+        self.directory = os.path.join(VARIANTS_ROOT, content_hash)
+        self._variants = None
+        self._b64 = {}
+        self._lock = threading.Lock()
+
+    def _build(self):
+        fmt = _image_format()
+        ext, mime = ("webp", "image/webp") if fmt == "webp" else ("jpg", "image/jpeg")
+        max_width = getattr(settings, "SCREENSHOT_MAX_WIDTH", 1024)
+        tile_height = getattr(settings, "SCREENSHOT_TILE_HEIGHT", 1024)
+        max_tiles = getattr(settings, "SCREENSHOT_MAX_TILES", 8)
+
+        with Image.open(self.path) as source:
+            source.load()
+            page = source.convert("RGB") if source.mode not in ("RGB", "RGBA") else source.copy()
+        if page.width > max_width:
+            page = page.resize((max_width, round(page.height * max_width / page.width)), Image.LANCZOS)
+
+        images = {"downscaled": page}
+        fold = page.crop((0, 0, page.width, min(page.height, round(page.width * FOLD_ASPECT))))
+        if fold.width > FOLD_WIDTH:
+            fold = fold.resize((FOLD_WIDTH, round(fold.height * FOLD_WIDTH / fold.width)), Image.LANCZOS)
+        images["fold"] = fold
+        for n, top in enumerate(range(0, page.height, tile_height)[:max_tiles], start=1):
+            images[f"tile_{n}"] = page.crop((0, top, page.width, min(page.height, top + tile_height)))
+
+        os.makedirs(self.directory, exist_ok=True)
+        variants = {}
+        for name, image in images.items():
+            data = _encode(image, fmt)
+            file = f"{name}.{ext}"
+            with open(os.path.join(self.directory, file), "wb") as f:
+                f.write(data)
+            with open(os.path.join(self.directory, f"{name}.b64"), "w", encoding="ascii") as f:
+                f.write(base64.b64encode(data).decode())
+            variants[name] = Variant(name, file, mime, image.width, image.height, len(data),
+                                     image_tokens(image.width, image.height))
+        with open(os.path.join(self.directory, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({name: asdict(v) for name, v in variants.items()}, f, indent=2)
+        return variants
+
+    def variants(self):
+        """{name: Variant}, built on first use and read back from disk afterwards."""
+        if self._variants is None:
+            with self._lock:
+                manifest = os.path.join(self.directory, "manifest.json")
+                try:
+                    with open(manifest, "r", encoding="utf-8") as f:
+                        self._variants = {name: Variant(**v) for name, v in json.load(f).items()}
+                except (OSError, ValueError, TypeError):
+                    self._variants = self._build()
+        return self._variants
+
+    def fold(self):
+        return replace(self.variants()["fold"], label="above the fold (first viewport)")
+
+    def crop(self, name, top, bottom):
+        """
+        Variant of the band between `top` and `bottom` (fractions of the page
+        height) of the downscaled page, capped at two tiles tall. Crops are
+        stored next to the other variants and reused.
+        """
+        downscaled = self.variants()["downscaled"]
+        ext = os.path.splitext(downscaled.file)[1]
+        key = f"region_{name}_{top:.3f}_{bottom:.3f}"
+        file = f"{key}{ext}"
+        path = os.path.join(self.directory, file)
+        label = f"{name.replace('_', ' ')} (from {top:.0%} to {bottom:.0%} of the page height)"
+
+        if os.path.exists(path) and os.path.exists(os.path.join(self.directory, f"{key}.b64")):
+            with Image.open(path) as image:
+                width, height = image.size
+            return Variant(key, file, downscaled.mime, width, height, os.path.getsize(path),
+                           image_tokens(width, height), label)
+
+        max_height = 2 * getattr(settings, "SCREENSHOT_TILE_HEIGHT", 1024)
+        with Image.open(os.path.join(self.directory, downscaled.file)) as page:
+            y0 = round(top * page.height)
+            y1 = min(round(bottom * page.height), y0 + max_height, page.height)
+            image = page.crop((0, y0, page.width, max(y1, y0 + 1)))
+        data = _encode(image, "webp" if ext == ".webp" else "jpeg")
+        with open(path, "wb") as f:
+            f.write(data)
+        with open(os.path.join(self.directory, f"{key}.b64"), "w", encoding="ascii") as f:
+            f.write(base64.b64encode(data).decode())
+        return Variant(key, file, downscaled.mime, image.width, image.height, len(data),
+                       image_tokens(image.width, image.height), label)
+
+    def tiles(self):
+        return [v for name, v in self.variants().items() if name.startswith("tile_")]
+
+    def b64(self, variant):
+        if variant.name not in self._b64:
+            with open(os.path.join(self.directory, f"{variant.name}.b64"), "r", encoding="ascii") as f:
+                self._b64[variant.name] = f.read()
+        return self._b64[variant.name]
+
+    def perceptual_hash(self):
+        """fingerprints.perceptual_hash() of the source, stored with the variants."""
+        path = os.path.join(self.directory, "perceptual_hash.txt")
+        try:
+            with open(path, "r", encoding="ascii") as f:
+                return f.read().strip()
+        except OSError:
+            pass
+        value = perceptual_hash(self.path)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path, "w", encoding="ascii") as f:
+            f.write(value)
+        return value
+
+    def original_b64(self):
+        with open(self.path, "rb") as f:
+            return base64.b64encode(f.read()).decode()
+
+    def pick(self, budget):
+        """
+        Variants to send within `budget` image tokens: the whole downscaled
+        page when the model can still read it, otherwise as many tiles from
+        the top as fit, otherwise the above-the-fold crop.
+        """
+        variants = self.variants()
+        downscaled = variants["downscaled"]
+        if downscaled.readable and downscaled.tokens <= budget:
+            return [downscaled]
+        chosen, used = [], 0
+        for tile in self.tiles():
+            if used + tile.tokens > budget:
+                break
+            chosen.append(tile)
+            used += tile.tokens
+        return chosen or [variants["fold"]]
+
+
+@lru_cache(maxsize=32)
+def _load(path, mtime_ns, size):
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return Screenshot(path, digest)
+
+
+def load_screenshot(path):
+    """Screenshot for the PNG at `path`; reused while the file is unchanged."""
+    stat = os.stat(path)
+    return _load(path, stat.st_mtime_ns, stat.st_size)
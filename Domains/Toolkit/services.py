@@ -0,0 +1,231 @@
+"""
+Page artifact services.
+
+The steps behind the Toolkit endpoints (HTML extract, CSS extract,
+screenshot) as plain functions, so onboarding, the Results views and
+background jobs call them in-process instead of going through the public
+URL. Each takes a Page, writes its artifact under Records/ and updates the
+page; failures raise and the caller decides on the response.
+"""
+import json
+import os
+
+import requests
+
+from Domains.Toolkit import http_client
+from Domains.Toolkit.extractors import extract_css_features, extract_html_features, refresh_css_features
+from Domains.Toolkit.page_cache import (
+    fetch_page, invalidate_derived_artifacts, is_unchanged, load_validators, save_validators, snapshot_validators,
+)
+from Domains.Toolkit.parsers import make_soup
+from Domains.Toolkit.stylesheets import without_latency
+
+SCREENSHOT_API_URL = "https://shot.screenshotapi.net/screenshot"
+MIN_SCREENSHOT_BYTES = 100_000
+
+
+class ScreenshotError(Exception):
+    """Screenshot could not be captured; `status_code` is the HTTP status to report."""
+
+    def __init__(self, message, status_code=502, response_text=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response_text = response_text
+
+
+def html_artifact_path(page):
+    return os.path.join('Records', 'html_data', str(page.business.id), f'{page.id}.json')
+
+
+def css_artifact_path(page):
+    return page.css or os.path.join('Records', 'CSS', str(page.business.id), str(page.id), 'business_css.json')
+
+
+def screenshot_artifact_path(page):
+    return os.path.join('Records', 'SS', str(page.business.id), f'screenshot_{page.id}.png')
+
+
+def load_json_strict(path):
+    """The JSON artifact at `path`; raises when it is missing or unreadable."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_json(path):
+    """The JSON artifact at `path`, or None when it is missing or unreadable."""
+    try:
+        return load_json_strict(path)
+    except (OSError, ValueError):
+        return None
+
+
+def save_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def load_text(path):
+    """The text artifact at `path`, or None when it does not exist."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def save_text(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def build_html_artifact(page, refresh=False, snapshot=None):
+    """
+    Returns (html_extract, artifact_status) for the page, where status is
+    "stored", "unchanged" or "updated". A stored extract is returned as is
+    unless refresh=True, which revalidates it with a conditional GET. The
+    light form saved at onboarding is never revalidated: a refresh always
+    downloads the page and replaces it with the full extract.
+    """
+    html_path = html_artifact_path(page)
+    stored_html_data = load_json(html_path)
+    if stored_html_data is not None:
+        page.html = os.path.relpath(html_path)
+        page.save(update_fields=["html"])
+        if not refresh:
+            return stored_html_data, "stored"
+
+    full_extract = bool(stored_html_data) and "dom_outline" in stored_html_data
+    validators = load_validators(html_path) if full_extract else None
+    if snapshot is None:
+        snapshot = fetch_page(page.url, refresh=refresh, validators=validators)
+    if full_extract and is_unchanged(snapshot, validators):
+        save_validators(html_path, snapshot_validators(snapshot, validators))
+        return stored_html_data, "unchanged"
+    snapshot.raise_for_status()
+    soup = make_soup(snapshot.text)
+
+    html_extract = extract_html_features(soup, page.url)
+    html_extract["raw_html"] = soup.prettify()  # Store the prettified HTML
+
+    save_json(html_path, html_extract)
+    save_validators(html_path, snapshot_validators(snapshot))
+    if stored_html_data:
+        invalidate_derived_artifacts(page)
+
+    page.html = os.path.relpath(html_path)
+    page.save(update_fields=["html"])
+    return html_extract, "updated"
+
+
+def save_raw_html_artifact(page, snapshot, soup):
+    """
+    Stores the page's title and raw HTML as its HTML artifact, the light
+    form written at onboarding; build_html_artifact(refresh=True) later
+    replaces it with the full extract.
+    """
+    html_path = html_artifact_path(page)
+    html_extract = {
+        "url": page.url,
+        "title": soup.title.string.strip() if soup.title and soup.title.string else None,
+        "raw_html": snapshot.text,
+    }
+    save_json(html_path, html_extract)
+    save_validators(html_path, snapshot_validators(snapshot))
+
+    page.html = os.path.relpath(html_path)
+    page.save(update_fields=["html"])
+    return html_extract
+
+
+def build_css_artifact(page, snapshot=None, soup=None):
+    """
+    Builds or revalidates the page's CSS extract and returns (css_extract,
+    changed). A stored extract is refreshed with conditional requests for
+    the page and each stylesheet; pass `snapshot`/`soup` when the caller
+    already downloaded or parsed the page.
+    """
+    css_path = css_artifact_path(page)
+    stored_css = load_json(css_path)
+    validators = load_validators(css_path) if stored_css else None
+
+    page_validators = (validators or {}).get("page") if stored_css else None
+    if snapshot is None:
+        snapshot = fetch_page(page.url, refresh=bool(page_validators), validators=page_validators)
+    if stored_css and is_unchanged(snapshot, page_validators):
+        css_data, sheet_validators = refresh_css_features(stored_css, validators)
+    else:
+        snapshot.raise_for_status()
+        if soup is None:
+            soup = make_soup(snapshot.content)
+        css_data, sheet_validators = extract_css_features(soup, page.url, stored_css, validators)
+
+    changed = without_latency(css_data) != without_latency(stored_css)
+    os.makedirs(os.path.dirname(css_path), exist_ok=True)
+    if changed:
+        save_json(css_path, css_data)
+        if stored_css:
+            invalidate_derived_artifacts(page)
+    save_validators(css_path, {
+        "page": snapshot_validators(snapshot, page_validators),
+        "stylesheets": sheet_validators,
+    })
+    page.css = css_path
+    page.save(update_fields=["css"])
+    return css_data, changed
+
+
+def capture_screenshot(url):
+    """
+    Asks the screenshot API for a full-page PNG of `url` and returns the
+    image URL. Raises ScreenshotError for API failures and placeholder
+    images, requests exceptions for network errors.
+    """
+    params = {
+        "token": "",
+        "url": url,
+        "file_type": "png",
+        "full_page": "true",
+        "lazy_load": "true",
+        "wait_for_event": "networkidle",
+        "delay": "2000",
+        "no_cookie_banners": "true",
+        "output": "json",
+    }
+
+    resp = http_client.get(SCREENSHOT_API_URL, params=params, timeout=150)
+    try:
+        resp.raise_for_status()
+    except requests.exceptions.HTTPError as e:
+        raise ScreenshotError(f"Screenshot API error: {e}", response_text=resp.text)
+    shot_url = resp.json().get("screenshot")
+    if not shot_url:
+        raise ScreenshotError("Screenshot URL not returned.")
+
+    head = http_client.head(shot_url, timeout=10)
+    content_type = head.headers.get("Content-Type", "")
+    content_length = int(head.headers.get("Content-Length", 0))
+
+    if head.status_code != 200 or not content_type.startswith("image/"):
+        raise ScreenshotError("Screenshot failed—got non-image response.")
+    if content_length < MIN_SCREENSHOT_BYTES:
+        raise ScreenshotError("Screenshot empty or placeholder image (too small).")
+    return shot_url
+
+
+def save_screenshot(page, shot_url=None):
+    """
+    Captures (unless `shot_url` is given) and downloads the page's
+    screenshot to Records/SS/ and stores the path on the page.
+    """
+    shot_url = shot_url or capture_screenshot(page.url)
+    down = http_client.get(shot_url, timeout=120)
+    down.raise_for_status()
+
+    ss_path = screenshot_artifact_path(page)
+    os.makedirs(os.path.dirname(ss_path), exist_ok=True)
+    with open(ss_path, 'wb') as f:
+        f.write(down.content)
+    page.screenshot = ss_path
+    page.save(update_fields=["screenshot"])
+    return ss_path
@@ -0,0 +1,157 @@
+"""
+Content-addressed stylesheet cache.
+
+CDN and theme stylesheets are shared by many pages and businesses, so the
+CSS text and its stats are stored once per content hash and every URL that
+served that body points at the same entry. A URL seen within
+STYLESHEET_CACHE_URL_TTL is served without a request; after that its
+validators make the next download conditional. Bodies are dropped least
+recently used first once STYLESHEET_CACHE_MAX_BYTES is exceeded, and when
+unused for STYLESHEET_CACHE_MAX_AGE.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+
+@dataclass
+class CachedStylesheet:
+    content_hash: str
+    content: str
+    css_rule_count: int
+    is_minified: bool
+    last_used: float = field(default_factory=time.time)
+
+    @property
+    def size(self):
+        return len(self.content)
+
+    def entry(self, href):
+        return {
+            "href": href,
+            "content": self.content,
+            "css_rule_count": self.css_rule_count,
+            "is_minified": self.is_minified
+        }
+
+
+@dataclass
+class UrlRecord:
+    validators: dict
+    checked_at: float = field(default_factory=time.time)
+
+    @property
+    def content_hash(self):
+        return self.validators.get("content_hash")
+
+
+class StylesheetCache:
+    def __init__(self, max_bytes, max_age, url_ttl):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.url_ttl = url_ttl
+        self._bodies = OrderedDict()
+        self._urls = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _drop(self, digest):
+        body = self._bodies.pop(digest, None)
+        if body is not None:
+            self._bytes -= body.size
+
+    def _evict(self, now):
+        while self._bodies:
+            digest, oldest = next(iter(self._bodies.items()))
+            if self._bytes <= self.max_bytes and now - oldest.last_used <= self.max_age:
+                break
+            self._drop(digest)
+
+    def get_body(self, digest):
+        with self._lock:
+            body = self._bodies.get(digest)
+            now = time.time()
+            if body is not None and now - body.last_used > self.max_age:
+                self._drop(digest)
+                body = None
+            if body is None:
+                self.misses += 1
+                return None
+            body.last_used = now
+            self._bodies.move_to_end(digest)
+            self.hits += 1
+            return body
+
+    def lookup(self, url):
+        """
+        Returns (record, body, fresh) for `url`. `fresh` means the URL was
+        checked within url_ttl and body can be used without a request.
+        """
+        with self._lock:
+            record = self._urls.get(url)
+        if record is None:
+            return None, None, False
+        body = self.get_body(record.content_hash)
+        if body is None:
+            with self._lock:
+                self._urls.pop(url, None)
+            return None, None, False
+        return record, body, time.time() - record.checked_at <= self.url_ttl
+
+    def remember_url(self, url, validators):
+        with self._lock:
+            self._urls[url] = UrlRecord(validators=validators)
+
+    def put(self, url, validators, content, css_rule_count, is_minified):
+        body = CachedStylesheet(
+            content_hash=validators["content_hash"],
+            content=content,
+            css_rule_count=css_rule_count,
+            is_minified=is_minified,
+        )
+        with self._lock:
+            if body.size <= self.max_bytes:
+                self._drop(body.content_hash)
+                self._bodies[body.content_hash] = body
+                self._bytes += body.size
+                self._evict(time.time())
+            self._urls[url] = UrlRecord(validators=validators)
+        return body
+
+    def clear(self):
+        with self._lock:
+            self._bodies.clear()
+            self._urls.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._bodies),
+                "urls": len(self._urls),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = StylesheetCache(
+                    max_bytes=getattr(settings, "STYLESHEET_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+                    max_age=getattr(settings, "STYLESHEET_CACHE_MAX_AGE", 24 * 60 * 60),
+                    url_ttl=getattr(settings, "STYLESHEET_CACHE_URL_TTL", 60 * 60),
+                )
+    return _cache
@@ -0,0 +1,185 @@
+"""
+Concurrent stylesheet retrieval for the CSS extract.
+
+Stylesheets are downloaded in parallel with a cap on concurrent requests
+per host, a byte cap per file and one overall deadline for the page, so a
+page with many (or slow) stylesheets cannot hold a worker for minutes.
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+
+from Domains.Toolkit import http_client
+from Domains.Toolkit.css_analyzer import rule_count
+from Domains.Toolkit.executors import get_executor
+from Domains.Toolkit.page_cache import conditional_headers, content_hash, response_validators
+from Domains.Toolkit.stylesheet_cache import get_cache
+
+MAX_CSS_CHARS = 100000
+
+
+def css_stats(css_text):
+    rules = rule_count(css_text)
+    is_minified = (
+        css_text.count('\n') < 5 or
+        max((len(line) for line in css_text.splitlines()), default=0) > 500
+    )
+    return rules, is_minified
+
+
+def without_latency(css_extract):
+    """
+    The extract minus per-fetch timings, for change detection. A failed
+    sheet counts as failed whatever the error said, which varies between
+    attempts.
+    """
+    if not css_extract:
+        return css_extract
+    return {
+        **css_extract,
+        "external_stylesheets": [
+            {"href": entry["href"], "error": True} if "error" in entry else
+            {k: v for k, v in entry.items() if k != "fetch_ms"}
+            for entry in css_extract.get("external_stylesheets", [])
+        ],
+    }
+
+
+def _read_capped(resp, max_bytes):
+    chunks, size = [], 0
+    for chunk in resp.iter_content(64 * 1024):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_bytes:
+            break
+    resp.close()
+    return b"".join(chunks)[:max_bytes]
+
+
+def fetch_stylesheet(css_url, previous=None):
+    """
+    Downloads one stylesheet and returns (entry, validators). `previous`
+    is {"entry": ..., "validators": ...} from the last run; it makes the
+    request conditional and a 304 or identical body returns the old entry
+    without re-analysing it. Every entry reports its fetch_ms.
+
+    The shared stylesheet cache is consulted first: a recently checked URL
+    is served without a request, and a body already analysed for another
+    URL or page is reused by content hash.
+    """
+    validators = previous.get("validators") if previous else None
+    sheet_cache = get_cache()
+    t0 = time.perf_counter()
+
+    def timed(entry):
+        return {**entry, "fetch_ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+    try:
+        record, cached, fresh = sheet_cache.lookup(css_url)
+        if fresh:
+            return timed(cached.entry(css_url)), record.validators
+
+        sent_validators = record.validators if record else validators
+        css_response = http_client.get(
+            css_url, headers=conditional_headers(sent_validators), timeout=5, stream=True
+        )
+        if sent_validators and css_response.status_code == 304:
+            css_response.close()
+            if record:
+                sheet_cache.remember_url(css_url, record.validators)
+                return timed(cached.entry(css_url)), record.validators
+            return timed(previous["entry"]), validators
+        css_response.raise_for_status()
+
+        body = _read_capped(css_response, getattr(settings, "CSS_FETCH_MAX_BYTES", 1024 * 1024))
+        new_validators = response_validators(css_response, content_hash(body))
+        cached = sheet_cache.get_body(new_validators["content_hash"])
+        if cached:
+            sheet_cache.remember_url(css_url, new_validators)
+            return timed(cached.entry(css_url)), new_validators
+        if validators and new_validators["content_hash"] == validators.get("content_hash"):
+            entry = previous["entry"]
+            sheet_cache.put(css_url, new_validators, entry["content"],
+                            entry["css_rule_count"], entry["is_minified"])
+            return timed(entry), new_validators
+
+        encoding = css_response.encoding or requests.compat.chardet.detect(body)["encoding"] or "utf-8"
+        try:
+            css_text = body.decode(encoding, errors="replace")[:MAX_CSS_CHARS]
+        except LookupError:
+            css_text = body.decode("utf-8", errors="replace")[:MAX_CSS_CHARS]
+        rules, is_minified = css_stats(css_text)
+        cached = sheet_cache.put(css_url, new_validators, css_text, rules, is_minified)
+        return timed(cached.entry(css_url)), new_validators
+    except Exception as e:
+        return timed({
+            "href": css_url,
+            "error": str(e)
+        }), None
+
+
+def fetch_stylesheets(css_urls, previous=None):
+    """
+    Fetches `css_urls` concurrently and returns (entries, validators) with
+    entries in the original order. Sheets still running when
+    CSS_FETCH_DEADLINE passes are reported as errors; a sheet in `previous`
+    whose refetch fails keeps its previous entry and validators.
+    """
+    previous = previous or {}
+    if not css_urls:
+        return [], {}
+
+    per_host = getattr(settings, "CSS_FETCH_PER_HOST", 4)
+    host_slots = {}
+    lock = threading.Lock()
+
+    def run(css_url):
+        host = urlsplit(css_url).netloc.lower()
+        with lock:
+            slot = host_slots.setdefault(host, threading.Semaphore(per_host))
+        with slot:
+            return fetch_stylesheet(css_url, previous.get(css_url))
+
+    # at most CSS_FETCH_WORKERS sheets of this page in the shared fetch pool at a time
+    started = time.monotonic()
+    deadline = started + getattr(settings, "CSS_FETCH_DEADLINE", 15)
+    executor, window = get_executor("fetch"), getattr(settings, "CSS_FETCH_WORKERS", 8)
+    futures, pending, queue = {}, set(), list(enumerate(css_urls))
+    while queue or pending:
+        while queue and len(pending) < window:
+            i, css_url = queue.pop(0)
+            future = executor.submit(run, css_url)
+            futures[future] = i
+            pending.add(future)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        _, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+    for future in pending:
+        future.cancel()
+
+    entries, sheet_validators = [None] * len(css_urls), {}
+    late = {i for i, _ in queue} | {futures[future] for future in pending}
+    for i in sorted(late):
+        entries[i] = {
+            "href": css_urls[i],
+            "error": "Stylesheet fetch deadline exceeded",
+            "fetch_ms": round((time.monotonic() - started) * 1000, 1),
+        }
+    for future, i in futures.items():
+        css_url = css_urls[i]
+        if i in late:
+            continue
+        entries[i], entry_validators = future.result()
+        if entry_validators:
+            sheet_validators[css_url] = entry_validators
+    # a timeout is no reason to replace a sheet already fetched (and invalidate what was built from it)
+    for i, css_url in enumerate(css_urls):
+        if "error" in entries[i] and css_url in previous:
+            entries[i] = {**previous[css_url]["entry"], "fetch_ms": entries[i]["fetch_ms"]}
+            sheet_validators[css_url] = previous[css_url]["validators"]
+    return entries, sheet_validators
@@ -0,0 +1,90 @@
+import os
+import random
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+from PIL import Image, ImageDraw
+
+from Domains.Toolkit.fingerprints import dom_features, perceptual_hash, similarity
+
+
+def _page_image(hero_seed=7, cta=(220, 40, 40)):
+    """A 1280 x 9000 product listing with a hero and a CTA at the top."""
+    image = Image.new("RGB", (1280, 9000), "white")
+    draw = ImageDraw.Draw(image)
+    for y in range(0, 9000, 300):
+        rnd = random.Random(y)
+        draw.rectangle((40, y + 20, 1240, y + 280), fill=(rnd.randrange(200, 250),) * 3)
+        for k in range(6):
+            x = 60 + k * 200
+            draw.rectangle((x, y + 40, x + 160, y + 200), fill=tuple(rnd.randrange(256) for _ in range(3)))
+            draw.text((x, y + 220), f"Product {y}-{k}", fill="black")
+    rnd = random.Random(hero_seed)
+    draw.rectangle((0, 0, 1280, 1000), fill=tuple(rnd.randrange(256) for _ in range(3)))
+    for _ in range(8):
+        x, y = rnd.randrange(1000), rnd.randrange(700)
+        draw.ellipse((x, y, x + rnd.randrange(80, 280), y + rnd.randrange(80, 300)),
+                     fill=tuple(rnd.randrange(256) for _ in range(3)))
+    draw.rectangle((100, 600, 400, 680), fill=cta)
+    return image
+
+
+def _extract(sections=10, extra=()):
+    outline = [{"tag": "header", "classes": ["site-header"], "id": None}]
+    for n in range(sections):
+        outline += [{"tag": "section", "classes": ["products", f"row-{n}"], "id": f"s{n}"},
+                    {"tag": "div", "classes": ["card"], "id": None},
+                    {"tag": "a", "classes": ["btn"], "id": None}]
+    return {"title": "Shop", "dom_outline": outline + list(extra), "headings": {"h1": ["Summer sale"]}}
+
+
+@override_settings(SCREENSHOT_HASH_MAX_DISTANCE=0.02, DOM_MAX_CHANGED_FEATURES=2)
+class SimilarityTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def fingerprint(self, image, extract):
+        path = os.path.join(self.tmp.name, f"{len(os.listdir(self.tmp.name))}.png")
+        image.save(path)
+        return {"screenshot_hash": perceptual_hash(path), "dom_features": dom_features(extract)}
+
+    def test_same_page_is_reused(self):
+        before = self.fingerprint(_page_image(), _extract())
+        after = self.fingerprint(_page_image(), _extract())
+        self.assertEqual(similarity(before, after), (True, {"screenshot_distance": 0.0, "dom_distance": 0}))
+
+    def test_changed_hero_is_not_reused(self):
+        before = self.fingerprint(_page_image(), _extract())
+        after = self.fingerprint(_page_image(hero_seed=8), _extract())
+        similar, detail = similarity(before, after)
+        self.assertFalse(similar)
+        self.assertGreater(detail["screenshot_distance"], 0.2)
+
+    def test_changed_cta_colour_is_not_reused(self):
+        before = self.fingerprint(_page_image(), _extract())
+        after = self.fingerprint(_page_image(cta=(40, 40, 220)), _extract())
+        self.assertFalse(similarity(before, after)[0])
+
+    def test_added_section_is_not_reused(self):
+        image = _page_image()
+        before = self.fingerprint(image, _extract())
+        promo = [{"tag": "section", "classes": ["promo"], "id": None},
+                 {"tag": "h2", "classes": [], "id": None},
+                 {"tag": "a", "classes": ["btn"], "id": None}]
+        after = self.fingerprint(image, _extract(extra=promo))
+        similar, detail = similarity(before, after)
+        self.assertFalse(similar)
+        self.assertEqual(detail["dom_distance"], 3)
+
+    def test_removed_nodes_are_not_reused(self):
+        image = _page_image()
+        self.assertFalse(similarity(self.fingerprint(image, _extract()),
+                                    self.fingerprint(image, _extract(sections=5)))[0])
+
+    def test_ids_differing_in_digits_only_are_reused(self):
+        image = _page_image()
+        extract = _extract()
+        renumbered = {**extract, "dom_outline": [{**node, "id": node["id"] and node["id"] + "0"}
+                                                 for node in extract["dom_outline"]]}
+        self.assertTrue(similarity(self.fingerprint(image, extract), self.fingerprint(image, renumbered))[0])
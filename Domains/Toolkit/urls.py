@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import WebMetricsAPIView, PageHTMLAPIView, PageCSSAPIView, RoleModelWebMetricsAPIView, UserPagesView, TakeScreenshotAPIView, QuickChartAPIView, UserNameAPIView, ListChartConfigsAPIView
+from .views import WebMetricsAPIView, PageHTMLAPIView, PageCSSAPIView, RoleModelWebMetricsAPIView, UserPagesView, TakeScreenshotAPIView, QuickChartAPIView, UserNameAPIView, ListChartConfigsAPIView, ExecutorStatsAPIView
 
 urlpatterns = [
     path('web-metrics/role-model/', RoleModelWebMetricsAPIView.as_view(), name='web-metrics'),
@@ -11,5 +11,6 @@ urlpatterns = [
     path('plot-chart/', QuickChartAPIView.as_view()),
     path('user-name/', UserNameAPIView.as_view(), name='user-name'),
     path('list-plots/<int:page_id>/', ListChartConfigsAPIView.as_view(), name='get-plots'),
+    path('executors/', ExecutorStatsAPIView.as_view(), name='executor-stats'),
 ]
 
@@ -1,16 +1,11 @@
 import os
-import re
 import jwt
 import os
 import json
 import base64
 import requests
-import concurrent.futures
 import xml.etree.ElementTree as ET
 
-from collections import Counter
-from urllib.parse import urljoin
-from bs4 import BeautifulSoup
 from django.conf import settings
 from django.http import HttpResponse
 from django.utils.text import slugify
@@ -18,9 +13,11 @@ from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import permissions, status
 from pathlib import Path
 from Domains.Onboard.models import Business, Page, RoleModelPage
+from Domains.Toolkit import executors, http_client
+from Domains.Toolkit.services import ScreenshotError, build_css_artifact, build_html_artifact, capture_screenshot
 
 User = get_user_model()
 
@@ -50,7 +47,7 @@ def get_web_performance(url):
 
     api_url = f"https://www.googleapis.com/pagespeedonline/v5/runPagespeed?url={url}&strategy=mobile&key={api_key}"
     try:
-        response = requests.get(api_url, timeout=300)
+        response = http_client.get(api_url, timeout=300)
         response.raise_for_status()
         data = response.json()
         
@@ -143,10 +140,8 @@ class WebMetricsAPIView(APIView):
                 pass
 
         try:
-            # If no stored metrics or corrupted, fetch new ones
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future_metrics = executor.submit(get_web_performance, target_url)
-                metrics_result = future_metrics.result()
+            # If no stored metrics or corrupted, fetch new ones (in the shared fetch pool; 429 when it is full)
+            metrics_result = executors.get_executor("fetch").submit(get_web_performance, target_url).result()
 
             # Save metrics to file
             os.makedirs(metrics_dir, exist_ok=True)
@@ -162,6 +157,8 @@ class WebMetricsAPIView(APIView):
             page.save()
 
             return Response(metrics_data, status=status.HTTP_200_OK)
+        except executors.PoolSaturated:
+            raise
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_502_BAD_GATEWAY)
         except Exception as e:
@@ -231,7 +228,7 @@ class RoleModelWebMetricsAPIView(APIView):
                 pass
 
         # If no stored metrics or corrupted, fetch new ones
-        metrics_result = get_web_performance(role_model_url)
+        metrics_result = executors.get_executor("fetch").submit(get_web_performance, role_model_url).result()
 
         # Save metrics to file
         os.makedirs(metrics_dir, exist_ok=True)
@@ -248,36 +245,6 @@ class RoleModelWebMetricsAPIView(APIView):
 
 
 class PageHTMLAPIView(APIView):
-    def _build_dom_outline(self, soup, text_limit=50):
-        outline, sig_counter = [], Counter()
-
-        for el in soup.find_all():
-            ident   = el.get("id")
-            classes = el.get("class", [])
-            text    = el.get_text(strip=True)
-
-            if not (ident or classes or text):
-                continue
-
-            sig_key = f"{el.name}|{' '.join(classes)}|{ident or ''}"
-            sig_counter[sig_key] += 1
-
-            outline.append({
-                "tag"         : el.name,
-                "id"          : ident,
-                "classes"     : classes,
-                "text_sample" : text[:text_limit] or None,
-                "inline_style": el.get("style")
-            })
-
-        repeated = {}
-        for k, v in sig_counter.items():
-            tag, classes, _ = k.split("|", 2)
-            compact = f"{tag}|{classes}".strip("|")
-            if v > 1:
-                repeated[compact] = v
-        return outline, repeated
-
     def get(self, request, format=None):
         page_id = request.query_params.get("page_id")
         if not page_id:
@@ -296,104 +263,28 @@ class PageHTMLAPIView(APIView):
             return Response({"error": "Page does not have a URL set."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        # Check if HTML data already exists
-        html_dir = os.path.join('Records', 'html_data', str(page.business.id))
-        html_path = os.path.join(html_dir, f'{page_id}.json')
-        
-        if os.path.exists(html_path):
-            try:
-                with open(html_path, 'r', encoding='utf-8') as f:
-                    stored_html_data = json.load(f)
-                    # Store the relative path in the html field
-                    page.html = os.path.relpath(html_path)
-                    page.save()
-                return Response(stored_html_data, status=status.HTTP_200_OK)
-            except json.JSONDecodeError:
-                pass
-
+        refresh = request.query_params.get("refresh") in ("1", "true")
         try:
-            resp = requests.get(
-                page.url,
-                headers={"User-Agent": "Mozilla/5.0"},
-                timeout=10,
-            )
-            resp.raise_for_status()
-            resp.encoding = resp.apparent_encoding
-            soup = BeautifulSoup(resp.text, "html.parser")
-
-            for t in soup(["script", "style", "noscript"]):
-                t.decompose()
-
-            title = soup.title.string.strip() if soup.title and soup.title.string else None
-            meta_desc = next(
-                (m.get("content") for m in soup.find_all(
-                    "meta", attrs={"name": re.compile("^description$", re.I)})
-                 if m.get("content")),
-                None,
-            )
-
-            headings = {
-                "h1": [h.get_text(strip=True) for h in soup.find_all("h1")],
-                "h2": [h.get_text(strip=True) for h in soup.find_all("h2")],
-                "h3": [h.get_text(strip=True) for h in soup.find_all("h3")],
-            }
-            links = []
-            for a in soup.find_all("a", href=True):
-                href = a["href"]
-                if href and not href.lower().startswith("javascript"):
-                    links.append(urljoin(page.url, href))
-                    if len(links) == 20:
-                        break
-
-            tag_counter      = Counter(tag.name for tag in soup.find_all())
-            structural_tags  = [tag.name for tag in soup.find_all(
-                                   ["section", "article", "nav", "aside", "main"])]
-            class_names      = [tag.get("class")
-                                for tag in soup.find_all() if tag.get("class")]
-            id_names         = [tag.get("id")
-                                for tag in soup.find_all() if tag.get("id")]
-            text_length      = len(soup.get_text(strip=True))
-            num_tags         = len(soup.find_all())
-
-            dom_outline, repeated = self._build_dom_outline(soup)
-
-            html_extract = {
-                "url": page.url,
-                "title": title,
-                "meta_description": meta_desc,
-                "headings": headings,
-                "links": links,
-                "tag_counts": dict(tag_counter),
-                "structural_tags": structural_tags,
-                "class_names": class_names,
-                "id_names": id_names,
-                "text_length": text_length,
-                "num_tags": num_tags,
-                "dom_outline": dom_outline,
-                "repeated_signatures": repeated,
-                "raw_html": soup.prettify()  # Store the prettified HTML
-            }
-
-            # Save HTML data to file
-            os.makedirs(html_dir, exist_ok=True)
-            with open(html_path, 'w', encoding='utf-8') as f:
-                json.dump(html_extract, f, ensure_ascii=False, indent=2)
-            
-            # Store the relative path in the html field
-            page.html = os.path.relpath(html_path)
-            page.save()
-
-            # Remove raw_html from response to keep it lightweight
-            response_data = html_extract.copy()
-            del response_data['raw_html']
-            return Response(response_data, status=status.HTTP_200_OK)
-
+            # ?refresh=1 revalidates the stored extract with a conditional GET
+            html_extract, artifact_status = build_html_artifact(page, refresh=refresh)
         except Exception as exc:
             return Response(
                 {"error": f"Could not retrieve HTML from {page.url}: {exc}"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        if artifact_status == "stored":
+            return Response(html_extract, status=status.HTTP_200_OK)
+        if artifact_status == "unchanged":
+            return Response(html_extract, status=status.HTTP_200_OK,
+                            headers={"X-Artifact-Status": "unchanged"})
+
+        # Remove raw_html from response to keep it lightweight
+        response_data = html_extract.copy()
+        del response_data['raw_html']
+        return Response(response_data, status=status.HTTP_200_OK,
+                        headers={"X-Artifact-Status": "updated"})
+
 
 class PageCSSAPIView(APIView):
     """
@@ -414,58 +305,11 @@ class PageCSSAPIView(APIView):
             return Response({"error": "Page does not have a URL set."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            response = requests.get(page.url, headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, "html.parser")
-
-            stylesheet_links = []
-            for link_tag in soup.find_all("link", rel="stylesheet"):
-                href = link_tag.get("href")
-                if href:
-                    css_url = href if href.startswith("http") else requests.compat.urljoin(page.url, href)
-                    try:
-                        css_response = requests.get(css_url, timeout=5)
-                        css_response.raise_for_status()
-                        css_text = css_response.text[:100000]  
-
-                        rule_count = css_text.count('}')
-                        
-                        is_minified = (
-                            css_text.count('\n') < 5 or
-                            max((len(line) for line in css_text.splitlines()), default=0) > 500
-                        )
-
-                        stylesheet_links.append({
-                            "href": css_url,
-                            "content": css_text,
-                            "css_rule_count": rule_count,
-                            "is_minified": is_minified
-                        })
-                    except Exception as e:
-                        stylesheet_links.append({
-                            "href": css_url,
-                            "error": str(e)
-                        })
-
-            inline_styles = []
-            for style_tag in soup.find_all("style"):
-                css = style_tag.get_text(strip=True)
-                rule_count = css.count('}')
-                is_minified = (
-                    css.count('\n') < 5 or
-                    max((len(line) for line in css.splitlines()), default=0) > 500
-                )
-                inline_styles.append({
-                    "content": css,
-                    "css_rule_count": rule_count,
-                    "is_minified": is_minified
-                })
-
-            return Response({
-                "url": page.url,
-                "external_stylesheets": stylesheet_links,
-                "inline_styles": inline_styles[:3]  
-            }, status=status.HTTP_200_OK)
+            # A stored extract is revalidated with conditional requests for
+            # the page and each stylesheet instead of being rebuilt.
+            css_data, changed = build_css_artifact(page)
+            return Response(css_data, status=status.HTTP_200_OK,
+                            headers={"X-Artifact-Status": "updated" if changed else "unchanged"})
 
         except Exception as e:
             return Response({"error": f"Could not retrieve CSS from {page.url}: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
@@ -511,53 +355,17 @@ class TakeScreenshotAPIView(APIView):
             return Response({"error": "This page does not have a URL set."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        api_url = "https://shot.screenshotapi.net/screenshot"
-        params = {
-            "token": "",
-            "url": page.url,
-            "file_type": "png",
-            "full_page": "true",
-            "lazy_load": "true",   
-            "wait_for_event": "networkidle",
-            "delay": "2000",          
-            "no_cookie_banners": "true", 
-            "output": "json",
-        }
-
         try:
-            resp = requests.get(api_url, params=params, timeout=150)
-            resp.raise_for_status()
-            shot_url = resp.json().get("screenshot")
-            if not shot_url:
-                return Response({"error": "Screenshot URL not returned."},
-                                status=status.HTTP_502_BAD_GATEWAY)
-
-            head = requests.head(shot_url, timeout=10)
-            content_type = head.headers.get("Content-Type", "")
-            content_length = int(head.headers.get("Content-Length", 0))
-
-            if head.status_code != 200 or not content_type.startswith("image/"):
-                return Response(
-                    {"error": "Screenshot failed—got non-image response."},
-                    status=status.HTTP_502_BAD_GATEWAY,
-                )
-
-            if content_length < 100_000:   
-                return Response(
-                    {"error": "Screenshot empty or placeholder image (too small)."},
-                    status=status.HTTP_502_BAD_GATEWAY,
-                )
-            # -------------------------
-
+            shot_url = capture_screenshot(page.url)
             return Response(
                 {"success": "Screenshot captured successfully.", "screenshot_url": shot_url}
             )
 
-        except requests.exceptions.HTTPError as e:
-            return Response(
-                {"error": f"Screenshot API error: {e}", "response_text": resp.text},
-                status=status.HTTP_502_BAD_GATEWAY,
-            )
+        except ScreenshotError as e:
+            body = {"error": str(e)}
+            if e.response_text is not None:
+                body["response_text"] = e.response_text
+            return Response(body, status=e.status_code)
         except requests.exceptions.RequestException as e:
             return Response(
                 {"error": f"Failed to take screenshot: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -573,7 +381,7 @@ class QuickChartAPIView(APIView):
             json.loads(config)
         except ValueError:
             return Response({'error': 'Invalid JSON in config'}, status=status.HTTP_400_BAD_REQUEST)
-        resp = requests.get('https://quickchart.io/chart', params={'c': config})
+        resp = http_client.get('https://quickchart.io/chart', params={'c': config})
         if resp.status_code == 200:
             return HttpResponse(resp.content, content_type='image/png')
         return Response({'error': 'Chart generation failed'}, status=status.HTTP_502_BAD_GATEWAY)
@@ -642,5 +450,11 @@ class ListChartConfigsAPIView(APIView):
                 continue
 
         return Response({"configs": configs}, status=status.HTTP_200_OK)
-    
 
+
+class ExecutorStatsAPIView(APIView):
+    """GET /toolkit/executors/ : per-pool counters and timings of the shared worker pools."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(executors.stats(), status=status.HTTP_200_OK)
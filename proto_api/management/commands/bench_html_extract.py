@@ -0,0 +1,162 @@
+import gc
+import json
+import random
+import re
+import time
+from collections import Counter
+from pathlib import Path
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+from django.core.management.base import BaseCommand, CommandError
+
+from Domains.Toolkit.extractors import extract_html_features
+
+
+def legacy_extract(soup, url, text_limit=50):
+    """The multi-pass extraction PageHTMLAPIView used before extractors.py."""
+    for t in soup(["script", "style", "noscript"]):
+        t.decompose()
+
+    title = soup.title.string.strip() if soup.title and soup.title.string else None
+    meta_desc = next(
+        (m.get("content") for m in soup.find_all(
+            "meta", attrs={"name": re.compile("^description$", re.I)})
+         if m.get("content")),
+        None,
+    )
+
+    headings = {
+        "h1": [h.get_text(strip=True) for h in soup.find_all("h1")],
+        "h2": [h.get_text(strip=True) for h in soup.find_all("h2")],
+        "h3": [h.get_text(strip=True) for h in soup.find_all("h3")],
+    }
+    links = []
+    for a in soup.find_all("a", href=True):
+        href = a["href"]
+        if href and not href.lower().startswith("javascript"):
+            links.append(urljoin(url, href))
+            if len(links) == 20:
+                break
+
+    outline, sig_counter = [], Counter()
+    for el in soup.find_all():
+        ident = el.get("id")
+        classes = el.get("class", [])
+        text = el.get_text(strip=True)
+        if not (ident or classes or text):
+            continue
+        sig_counter[f"{el.name}|{' '.join(classes)}|{ident or ''}"] += 1
+        outline.append({
+            "tag"         : el.name,
+            "id"          : ident,
+            "classes"     : classes,
+            "text_sample" : text[:text_limit] or None,
+            "inline_style": el.get("style")
+        })
+    repeated = {}
+    for k, v in sig_counter.items():
+        tag, classes, _ = k.split("|", 2)
+        compact = f"{tag}|{classes}".strip("|")
+        if v > 1:
+            repeated[compact] = v
+
+    return {
+        "url": url,
+        "title": title,
+        "meta_description": meta_desc,
+        "headings": headings,
+        "links": links,
+        "tag_counts": dict(Counter(tag.name for tag in soup.find_all())),
+        "structural_tags": [tag.name for tag in soup.find_all(
+                               ["section", "article", "nav", "aside", "main"])],
+        "class_names": [tag.get("class") for tag in soup.find_all() if tag.get("class")],
+        "id_names": [tag.get("id") for tag in soup.find_all() if tag.get("id")],
+        "text_length": len(soup.get_text(strip=True)),
+        "num_tags": len(soup.find_all()),
+        "dom_outline": outline,
+        "repeated_signatures": repeated,
+    }
+
+
+def synthetic_product_page(target_bytes, seed=0):
+    """Product-listing markup with nav, nested grids, scripts and inline styles."""
+    rng = random.Random(seed)
+    head = (
+        "<!DOCTYPE html><html><head><title> Bench Store </title>"
+        '<meta name="Description" content="Synthetic catalogue page">'
+        "<style>.card{display:flex}</style><script>window.dataLayer=[];</script></head>"
+        '<body><header id="top"><nav class="main-nav"><ul>'
+        + "".join(f'<li class="nav-item"><a href="/c/{i}">Category {i}</a></li>' for i in range(12))
+        + '</ul></nav><form class="search"><input name="q"></form></header><main id="content">'
+        "<h1>All products</h1><noscript><p>Enable JavaScript</p></noscript>"
+    )
+    tail = '</main><footer class="site-footer"><p>&copy; Bench</p></footer></body></html>'
+    parts, size, i = [head], len(head) + len(tail), 0
+    while size < target_bytes:
+        block = (
+            f'<section class="grid row-{i % 7}"><h2>Collection {i}</h2>'
+            + "".join(
+                f'<article class="card product" data-sku="{i}-{j}">'
+                f'<div class="card__media"><img src="/img/{i}/{j}.jpg" alt="Item {j}"></div>'
+                f'<div class="card__body"><h3 class="card__title">Product {i}-{j} '
+                f'{"".join(rng.choice("abcdefghij") for _ in range(12))}</h3>'
+                f'<span class="price" style="color:#c00">${rng.randint(5, 500)}.99</span>'
+                f'<a class="btn" href="/p/{i}/{j}">View</a>'
+                f'<a href="javascript:void(0)">Quick view</a></div><!-- card --></article>'
+                for j in range(8)
+            )
+            + "<script>track();</script></section>"
+        )
+        parts.append(block)
+        size += len(block)
+        i += 1
+    parts.append(tail)
+    return "".join(parts)
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the single-pass HTML extractor against the legacy multi-pass one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help='Saved HTML pages to benchmark')
+        parser.add_argument('--sizes', default='1,2,5',
+                            help='Synthetic page sizes in MB when no files are given')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def _timed(self, extract, markup):
+        soup = BeautifulSoup(markup, "html.parser")
+        gc.collect()
+        t0 = time.perf_counter()
+        result = extract(soup, "https://bench.example/")
+        elapsed = time.perf_counter() - t0
+        # Serialise to plain JSON so the tree can be freed before the next run.
+        return json.loads(json.dumps(result)), soup.prettify(), elapsed
+
+    def handle(self, *args, **options):
+        if options['files']:
+            pages = [(path, Path(path).read_text(encoding='utf-8', errors='replace'))
+                     for path in options['files']]
+        else:
+            pages = [(f'synthetic-{mb}MB', synthetic_product_page(int(float(mb) * 1024 * 1024)))
+                     for mb in options['sizes'].split(',')]
+
+        for label, markup in pages:
+            legacy_times, single_times = [], []
+            for _ in range(options['repeat']):
+                legacy, legacy_html, elapsed = self._timed(legacy_extract, markup)
+                legacy_times.append(elapsed)
+                single, single_html, elapsed = self._timed(extract_html_features, markup)
+                single_times.append(elapsed)
+
+                if (json.dumps(legacy, ensure_ascii=False, indent=2)
+                        != json.dumps(single, ensure_ascii=False, indent=2)
+                        or legacy_html != single_html):
+                    raise CommandError(f'{label}: single-pass output differs from legacy output')
+
+            legacy_best, single_best = min(legacy_times), min(single_times)
+            self.stdout.write(self.style.SUCCESS(
+                f'{label} ({len(markup) / 1024 / 1024:.1f} MB): '
+                f'legacy {legacy_best:.3f}s | single-pass {single_best:.3f}s | '
+                f'{legacy_best / single_best:.1f}x faster, output identical'
+            ))
@@ -0,0 +1,88 @@
+import gc
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from urllib.parse import urlparse
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.text import slugify
+
+from Domains.Toolkit.extractors import extract_html_features
+from Domains.Toolkit.parsers import PARSER_BACKENDS, available_backends, make_soup
+
+
+class Command(BaseCommand):
+    help = 'Compares parse time, extract time and peak memory of the installed HTML parser backends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', help='Pages to download and add to the corpus')
+        parser.add_argument('--corpus', help='Directory of saved .html pages')
+        parser.add_argument('--save', help='Directory to store downloaded pages for later runs')
+        parser.add_argument('--backends', default=','.join(PARSER_BACKENDS))
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def _load_corpus(self, options):
+        pages = []
+        if options['corpus']:
+            for path in sorted(Path(options['corpus']).glob('*.html')):
+                pages.append((path.name, path.read_bytes()))
+
+        for url in options['urls']:
+            resp = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=20)
+            resp.raise_for_status()
+            name = slugify(urlparse(url).netloc + urlparse(url).path) or 'page'
+            pages.append((name, resp.content))
+            if options['save']:
+                save_dir = Path(options['save'])
+                save_dir.mkdir(parents=True, exist_ok=True)
+                (save_dir / f'{name}.html').write_bytes(resp.content)
+
+        if not pages:
+            raise CommandError('Pass page URLs or --corpus <dir> with saved .html files')
+        return pages
+
+    def _measure(self, backend, markup):
+        gc.collect()
+        t0 = time.perf_counter()
+        soup = make_soup(markup, backend)
+        t1 = time.perf_counter()
+        extract = extract_html_features(soup, "https://bench.example/")
+        t2 = time.perf_counter()
+        return t1 - t0, t2 - t1, extract["num_tags"]
+
+    def _peak_memory(self, backend, markup):
+        # Separate run: tracemalloc slows allocation-heavy parsing down a lot.
+        gc.collect()
+        tracemalloc.start()
+        extract_html_features(make_soup(markup, backend), "https://bench.example/")
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+
+    def handle(self, *args, **options):
+        pages = self._load_corpus(options)
+        installed = available_backends()
+        backends = [b for b in options['backends'].split(',') if b in installed]
+        skipped = [b for b in options['backends'].split(',') if b not in installed]
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'Not installed, skipped: {", ".join(skipped)}'))
+
+        totals = {b: [] for b in backends}
+        for name, markup in pages:
+            self.stdout.write(f'{name} ({len(markup) / 1024:.0f} KB)')
+            for backend in backends:
+                runs = [self._measure(backend, markup) for _ in range(options['repeat'])]
+                parse = min(r[0] for r in runs)
+                extract = min(r[1] for r in runs)
+                peak = self._peak_memory(backend, markup)
+                totals[backend].append(parse + extract)
+                self.stdout.write(
+                    f'  {backend:<12} parse {parse * 1000:8.1f} ms | extract {extract * 1000:8.1f} ms | '
+                    f'peak {peak / 1024 / 1024:7.1f} MB | {runs[0][2]} tags'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Median parse+extract per page:'))
+        for backend, values in totals.items():
+            self.stdout.write(self.style.SUCCESS(f'  {backend:<12} {statistics.median(values) * 1000:8.1f} ms'))
@@ -0,0 +1,75 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Domains.Onboard.models import Page
+from Domains.Results.LLMs.agents import describe_page, describe_structure, describe_styling, record_calls
+from Domains.Results.services import load_page_inputs
+
+
+def _recorded(fn, *args):
+    with record_calls(use_cache=False) as calls:
+        fn(*args)
+    return calls
+
+
+def separate_mode(image, html, css):
+    """Two calls side by side, as abuild_ui_report does in "separate" mode."""
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        structure = pool.submit(_recorded, describe_structure, image, html, css)
+        styling = pool.submit(_recorded, describe_styling, image, html, css)
+        return structure.result() + styling.result()
+
+
+def combined_mode(image, html, css):
+    return _recorded(describe_page, image, html, css)
+
+
+class Command(BaseCommand):
+    help = 'Compares latency and tokens of the two-call and the combined UI report (UI_REPORT_MODE)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('page_ids', nargs='+', type=int, help='Pages with HTML, CSS and screenshot artifacts')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        modes = (("separate", separate_mode), ("combined", combined_mode))
+        totals = {name: {"seconds": [], "prompt": 0, "completion": 0} for name, _ in modes}
+
+        for pid in options['page_ids']:
+            try:
+                page = Page.objects.get(id=pid)
+                html, css, image = load_page_inputs(page)
+            except Page.DoesNotExist:
+                raise CommandError(f'Page {pid} not found')
+            except (OSError, TypeError, ValueError) as e:
+                raise CommandError(f'Page {pid}: artifacts missing ({e})')
+
+            self.stdout.write(f'page {pid} ({page.url})')
+            for name, run in modes:
+                seconds, prompt, completion = [], [], []
+                for _ in range(options['repeat']):
+                    t0 = time.perf_counter()
+                    calls = run(image, html, css)
+                    seconds.append(time.perf_counter() - t0)
+                    prompt.append(sum(c["prompt_tokens"] for c in calls))
+                    completion.append(sum(c["completion_tokens"] for c in calls))
+
+                totals[name]["seconds"].append(statistics.median(seconds))
+                totals[name]["prompt"] += statistics.median(prompt)
+                totals[name]["completion"] += statistics.median(completion)
+                self.stdout.write(
+                    f'  {name:<9} median {statistics.median(seconds):6.2f}s | best {min(seconds):6.2f}s | '
+                    f'prompt {statistics.median(prompt):7.0f} | completion {statistics.median(completion):6.0f} tokens'
+                )
+
+        separate, combined = totals["separate"], totals["combined"]
+        self.stdout.write(self.style.SUCCESS(
+            f'combined vs separate over {len(options["page_ids"])} page(s): '
+            f'latency {statistics.median(combined["seconds"]):.2f}s vs {statistics.median(separate["seconds"]):.2f}s | '
+            f'prompt tokens {combined["prompt"]:.0f} vs {separate["prompt"]:.0f} '
+            f'({1 - combined["prompt"] / max(separate["prompt"], 1):.0%} fewer) | '
+            f'completion tokens {combined["completion"]:.0f} vs {separate["completion"]:.0f}'
+        ))
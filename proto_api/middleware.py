@@ -1,7 +1,12 @@
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
 from django.db import connection
 from django.db.utils import DatabaseError, IntegrityError, OperationalError
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
 import logging
 
+from Domains.Results.LLMs.usage import attribute, set_origin
+
 logger = logging.getLogger(__name__)
 
 class SqlExplorerMiddleware:
@@ -11,15 +16,31 @@ class SqlExplorerMiddleware:
     in the explorer_querylog table.
     """
     
+    async_capable = True
+    sync_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
-        
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.handle(request, self.get_response)
+
+    async def __acall__(self, request):
+        # Under ASGI only SQL Explorer requests (which need the table fix below) go through the sync thread
+        if not request.path.startswith('/explorer/'):
+            return await self.get_response(request)
+        return await sync_to_async(self.handle)(request, async_to_sync(self.get_response))
+
+    def handle(self, request, get_response):
         # Only apply the middleware for SQL Explorer URLs
         if request.path.startswith('/explorer/'):
             try:
                 # Try to execute the request normally
-                return self.get_response(request)
+                return get_response(request)
             except (DatabaseError, IntegrityError, OperationalError) as e:
                 error_str = str(e)
                 logger.warning(f"SQL Explorer error: {error_str}")
@@ -43,7 +64,7 @@ class SqlExplorerMiddleware:
                         
                         # Try again after fixing
                         logger.info("Retrying request after fixing explorer_querylog table")
-                        return self.get_response(request)
+                        return get_response(request)
                     except Exception as fix_error:
                         logger.error(f"Failed to fix explorer_querylog table: {fix_error}")
                         raise e  # Re-raise the original error
@@ -52,4 +73,63 @@ class SqlExplorerMiddleware:
                     raise
         else:
             # For non-SQL Explorer URLs, just proceed normally
-            return self.get_response(request) 
\ No newline at end of file
+            return get_response(request)
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    """
+    WhiteNoise's middleware is sync-only, which makes Django run every
+    request under ASGI through its single sync thread and serializes the
+    async Results views. This one looks static files up on the event loop
+    and only serves a hit from a worker thread.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
+
+
+class LLMUsageMiddleware:
+    """
+    Accounts the LLM calls of a request (Domains/Results/LLMs/usage.py) to
+    its URL name and user; the services add the page and business.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with attribute(request.path):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with attribute(request.path):
+            return await self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        user = getattr(request, "user", None)
+        set_origin(endpoint=request.resolver_match.url_name or request.path,
+                   user_id=user.id if user is not None and user.is_authenticated else None)
@@ -67,6 +67,7 @@ INSTALLED_APPS = [
     "Domains.Auth",
     "Domains.ManageData",
     "Domains.Onboard",
+    "Domains.Results",
     "Domains",
     
     # Proto API itself
@@ -81,7 +82,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",             # ← must be at the very top
     "django.middleware.security.SecurityMiddleware",     # Security middleware comes next
-    "whitenoise.middleware.WhiteNoiseMiddleware",        # Then whitenoise
+    "proto_api.middleware.WhiteNoiseMiddleware",         # Then whitenoise (async-capable, see middleware.py)
     "proto_api.middleware.SqlExplorerMiddleware",        # Custom middleware after Django's security
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -89,6 +90,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "proto_api.middleware.LLMUsageMiddleware",           # LLM calls accounted to the endpoint and user
 ]
 
 # CORS configuration
@@ -219,13 +221,132 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # PageSpeed (if someone still calls it)
 PAGESPEED_API_KEY = os.getenv("PAGESPEED_API_KEY", "")
 
+# HTML parsing backend for the Toolkit/Onboard scrapers: "lxml", "html5lib"
+# or "html.parser". Missing backends fall back to the next one available.
+HTML_PARSER = os.getenv("HTML_PARSER", "html.parser")
+
+# Outbound HTTP client (Domains/Toolkit/http_client.py)
+HTTP_CLIENT_TIMEOUT = (5, 30)          # (connect, read) seconds when a call passes none
+HTTP_CLIENT_RETRIES = 2                # retries for GET/HEAD on connection errors and 429/5xx
+HTTP_CLIENT_BACKOFF_FACTOR = 0.5       # 0.5s, 1s, 2s ... between retries
+HTTP_CLIENT_POOL_CONNECTIONS = 20      # hosts kept in the pool
+HTTP_CLIENT_POOL_MAXSIZE = 20          # keep-alive connections per host
+HTTP_CLIENT_MAX_PER_HOST = 8           # concurrent in-flight requests per host
+HTTP_CLIENT_HOST_WAIT = 30             # seconds to wait for a free per-host slot
+
+# Fetched page documents are shared by onboarding and the HTML/CSS views for this long,
+# through the "pages" cache (Redis when REDIS_URL is set, so Celery workers share it too)
+PAGE_SNAPSHOT_TTL = 15 * 60
+PAGE_SNAPSHOT_CACHE = "pages"
+
+# Stylesheet downloads for the CSS extract (Domains/Toolkit/stylesheets.py)
+CSS_FETCH_WORKERS = 8                  # stylesheets downloaded in parallel per page
+CSS_FETCH_PER_HOST = 4                 # of those, at most this many against one host
+CSS_FETCH_DEADLINE = 15                # seconds for all stylesheets of a page
+CSS_FETCH_MAX_BYTES = 1024 * 1024      # bytes read per stylesheet
+
+# Stylesheets shared across pages and businesses (Domains/Toolkit/stylesheet_cache.py)
+STYLESHEET_CACHE_MAX_BYTES = 64 * 1024 * 1024  # CSS kept per process, least recently used dropped first
+STYLESHEET_CACHE_MAX_AGE = 24 * 60 * 60        # drop bodies unused for this long
+STYLESHEET_CACHE_URL_TTL = 60 * 60             # reuse a URL without revalidating for this long
+
+# UI pipeline DAG (Domains/Results/pipeline.py)
+PIPELINE_WORKERS = 4                   # stages of one page run at the same time
+
+# Shared worker pools (Domains/Toolkit/executors.py): threads, tasks that may wait
+# for a thread, and seconds a submit waits for room before the request gets a 429
+EXECUTOR_POOLS = {
+    "fetch": {"workers": 16, "queue": 64, "wait": 10},     # outbound HTTP
+    "parse": {"workers": 4, "queue": 32, "wait": 5},       # CPU / disk: payloads, screenshots, artifacts
+    "llm":   {"workers": 16, "queue": 128, "wait": 5},     # pipeline stages, LLM cache and answer handling
+}
+
+# LLM response cache (Domains/Results/LLMs/response_cache.py)
+LLM_CACHE_BACKEND = os.getenv('LLM_CACHE_BACKEND', 'disk')  # "disk", "sqlite", "django" or "off"
+LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024        # disk/sqlite: least recently used answers dropped past this
+LLM_CACHE_DIR = os.path.join('Records', 'LLM-CACHE')
+LLM_CACHE_SQLITE_PATH = os.path.join('Records', 'llm_cache.sqlite3')
+LLM_CACHE_ALIAS = 'default'                    # Django cache used by the "django" backend
+LLM_PAYLOAD_TOKEN_BUDGET = 12_000              # HTML + CSS tokens sent to describe_structure/describe_styling
+
+# "separate": describe_structure + describe_styling in parallel; "combined": one
+# describe_page call (compare with `manage.py bench_ui_report <page_id>`)
+UI_REPORT_MODE = os.getenv('UI_REPORT_MODE', 'separate')
+
+# Screenshot variants sent to the vision models (Domains/Toolkit/screenshots.py)
+SCREENSHOT_VARIANT_FORMAT = 'webp'             # "webp" or "jpeg"
+SCREENSHOT_MAX_WIDTH = 1024                    # px; the full page is downscaled to this width
+SCREENSHOT_TILE_HEIGHT = 1024                  # px per vertical tile of the downscaled page
+SCREENSHOT_MAX_TILES = 8
+LLM_IMAGE_TOKEN_BUDGET = {                     # image tokens per call, by agent
+    "default": 1600,
+    "evaluate_ui": 3200,
+}
+# "page": evaluate_ui sees the whole screenshot; "regions": only the crops its
+# criteria concern (Domains/Toolkit/regions.py)
+EVALUATE_UI_IMAGES = os.getenv('EVALUATE_UI_IMAGES', 'page')
+
+# A page within both distances of the one a UI report/evaluation was built
+# from gets that report back instead of new LLM calls (Domains/Toolkit/fingerprints.py)
+SCREENSHOT_HASH_MAX_DISTANCE = 0.02            # share of differing perceptual-hash bits in the most changed band
+DOM_MAX_CHANGED_FEATURES = 2                   # element signatures/headings added or removed
+
+# LLM rate-limit scheduler (Domains/Results/LLMs/scheduler.py). Limits are per
+# process: divide the account's limits by the number of web + worker processes.
+LLM_RATE_LIMITS = {                            # requests / tokens per minute, by model
+    "default": {"rpm": 500, "tpm": 200_000},
+    "gpt-4o-mini-search-preview": {"rpm": 100, "tpm": 60_000},
+}
+LLM_RETRY_ATTEMPTS = 5                         # tries per call on 429, timeouts and 5xx
+LLM_RETRY_BASE_DELAY = 1.0                     # seconds; doubled per retry, with full jitter
+LLM_RETRY_MAX_DELAY = 30.0
+LLM_SCHEDULER_MAX_WAIT = 120                   # seconds a call may queue for capacity before a 429
+
+# LLM gateway (Domains/Results/LLMs/gateway.py): OpenAI-compatible providers,
+# and per-agent overrides of its MODEL_REGISTRY, e.g.
+# {"chat_completion": {"model": "gpt-4.1-mini", "params": {"temperature": 0.5}}}
+LLM_PROVIDERS = {
+    "openai": {"api_key_env": "OPENAI_API_KEY"},
+    "groq":   {"api_key_env": "GROQ_API_KEY", "base_url": "https://api.groq.com/openai/v1"},
+}
+LLM_MODELS = {}
+LLM_FALLBACK_ATTEMPTS = 2                      # tries on the primary before its fallback answers
+LLM_FALLBACK_COOLDOWN = 60                     # seconds an agent goes to its fallback first once tripped
+
+# Agents whose answers are constrained to a JSON schema (Domains/Results/LLMs/schemas.py);
+# compare parse failures with and without at ask-ai/llm-usage/?by=output
+LLM_STRUCTURED_OUTPUTS = ("evaluate_ui", "repair_ui_evaluation", "uba_formulator", "web_search_agent")
+LLM_PARSE_RETRIES = 1                          # re-asks, with the parse error, before an answer is given up on
+
+# LLM usage accounting (Domains/Results/LLMs/usage.py): one LLMCall row per agent
+# call, inserted in batches by a background thread; reports at ask-ai/llm-usage/
+LLM_USAGE_RECORDING = True
+LLM_USAGE_BATCH_SIZE = 100                     # rows per insert; a full batch is written at once
+LLM_USAGE_FLUSH_SECONDS = 5                    # otherwise the buffer is written this often
+LLM_USAGE_MAX_PENDING = 10_000                 # rows kept while the database is unreachable
+LLM_PRICES = {                                 # USD per million prompt / completion tokens, by model or prefix
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o-mini-search-preview": (0.15, 0.60),  # web search calls are billed on top
+    "o3-mini": (1.10, 4.40),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+}
+
 
 # Caching & Logging
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": "unique-snowflake",
-    }
+    },
+    "pages": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv('REDIS_URL'),
+        "KEY_PREFIX": "proto",
+    } if os.getenv('REDIS_URL') else {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "page-snapshots",
+    },
 }
 
 # Celery Configuration
@@ -236,3 +357,9 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+CELERY_TASK_TRACK_STARTED = True       # report "running" for ?async=1 jobs
+CELERY_RESULT_EXPIRES = 24 * 60 * 60   # job results kept for polling this long
+
+# Page onboarding builds its artifacts on a Celery worker when a broker is
+# configured; otherwise inside the request.
+ONBOARDING_ASYNC = CELERY_BROKER_URL is not None